@@ -1,11 +1,11 @@
 import asyncio
 import logging
 import os
+from io import BytesIO
 from typing import Dict
 
 from aiogram import Bot, Dispatcher, executor
 from aiogram.dispatcher.storage import FSMContext
-from aiogram.contrib.fsm_storage.redis import RedisStorage2
 from aiogram.types import (
     CallbackQuery,
     ContentType,
@@ -17,28 +17,40 @@ from aiogram.types import (
 from dotenv import load_dotenv
 load_dotenv()
 
+from bot.database.engine import SQLITE, dialect
 from bot.exceptions import (
-    DataAlreadyExistsInDBError,
     DataNotFoundError,
     CantSaveToDBError,
+    InvalidUserInputError,
     ServiceOperationFailedError
 )
+from bot.metrics import METRICS_PORT, start_metrics_server
+from bot import scraper
 from bot.services import user_service, product_service
 from bot.states import MonitorProducts
+from bot.tasks import importing
+from bot.tasks.adding import process_add_jobs
+from bot.tasks.digest import send_digests
 from bot.tasks.monitoring import monitor_products
-from bot.utils.common import MESSAGES, BUTTONS
+from bot.tasks.outbox import send_outbox
+from bot.tasks.removing import compact_option_history, remove_orphaned_products
+from bot.utils.common import MESSAGES, BUTTONS, extract_urls
+from bot.utils.fsm_storage import RedisHashStorage
 from bot.utils.handlers import (
+    change_page,
     monitor_menu_handlers,
-    get_pages,
+    select_product,
     send_products_info,
     get_ui_for_monitor_command
 )
+from bot.utils.job_queue import add_job_queue
 from bot.utils.keyboard import (
-    get_keyboard_for_page,
+    page_keyboards,
     select_cb,
     navigation_cb,
     confirm_cb
 )
+from bot.views.add_jobs import render_add_jobs
 
 
 logging.basicConfig(
@@ -47,9 +59,14 @@ logging.basicConfig(
 )
 
 TOKEN = os.getenv('TOKEN')
+# Start background tasks after bot starts answering updates
+FAST_START = os.getenv('FAST_START', '').lower() in ('1', 'true', 'yes')
+FAST_START_DELAY = float(os.getenv('FAST_START_DELAY', 10))
+# Products are monitored by separate `python -m bot.worker` processes
+MONITORING_IN_WORKERS = os.getenv('MONITORING_IN_WORKERS', '').lower() in ('1', 'true', 'yes')
 
 bot = Bot(token=TOKEN)
-storage = RedisStorage2()
+storage = RedisHashStorage()
 dp = Dispatcher(bot, storage=storage)
 
 monitor_menu_buttons = (*BUTTONS.values(),)
@@ -91,6 +108,102 @@ async def cmd_monitor(message: Message, state: FSMContext):
     await MonitorProducts.on_monitor_cmd.set()
 
 
+@dp.message_handler(commands='alert', state='*')
+async def cmd_alert(message: Message):
+    try:
+        product = product_service.set_alert(
+            message.from_user.id, message.get_args() or ''
+        )
+    except InvalidUserInputError as e:
+        logging.info(e)
+        return await message.answer(
+            MESSAGES['alert_usage'], parse_mode=ParseMode.HTML
+        )
+    except ServiceOperationFailedError:
+        return await message.answer(MESSAGES['alert_error'])
+
+    await message.answer(MESSAGES['alert_success'].format(product.title))
+
+
+@dp.message_handler(commands='delivery', state='*')
+async def cmd_delivery(message: Message):
+    delivery_mode = message.get_args() or ''
+    try:
+        user_service.set_delivery_mode(message.from_user.id, delivery_mode)
+    except InvalidUserInputError as e:
+        logging.info(e)
+        return await message.answer(
+            MESSAGES['delivery_usage'], parse_mode=ParseMode.HTML
+        )
+    except ServiceOperationFailedError:
+        return await message.answer(MESSAGES['delivery_error'])
+
+    await message.answer(
+        MESSAGES['delivery_success'].format(delivery_mode.strip().lower())
+    )
+
+
+@dp.message_handler(commands='import', state='*')
+async def cmd_import(message: Message, state: FSMContext):
+    args = message.get_args() or ''
+    user_id = message.from_user.id
+
+    # Admins can import to list of other user: /import USER_ID
+    first_arg, _, rest = args.strip().partition(' ')
+    if first_arg.isdigit() and importing.is_admin(user_id):
+        user_id, args = int(first_arg), rest
+
+    if extract_urls(args):
+        return await _start_import(message, user_id, args)
+
+    await state.update_data(import_user_id=user_id)
+    await message.answer(MESSAGES['import_start'])
+    await MonitorProducts.on_importing_products.set()
+
+
+@dp.message_handler(content_types=[ContentType.TEXT], state=MonitorProducts.on_importing_products)
+async def import_from_text(message: Message, state: FSMContext):
+    user_id = (await state.get_data()).get('import_user_id', message.from_user.id)
+    await state.reset_state(with_data=False)
+    await _start_import(message, user_id, message.text)
+
+
+@dp.message_handler(content_types=[ContentType.DOCUMENT], state=MonitorProducts.on_importing_products)
+async def import_from_file(message: Message, state: FSMContext):
+    document = message.document
+    if (
+        document.file_size > importing.MAX_IMPORT_FILE_SIZE or
+        not (document.file_name or '').lower().endswith(importing.IMPORT_FILE_EXTENSIONS)
+    ):
+        return await message.answer(MESSAGES['import_file_error'])
+
+    file = await document.download(destination_file=BytesIO())
+    user_id = (await state.get_data()).get('import_user_id', message.from_user.id)
+    await state.reset_state(with_data=False)
+    await _start_import(
+        message, user_id, file.getvalue().decode('utf-8', errors='replace')
+    )
+
+
+async def _start_import(message: Message, user_id: int, text: str):
+    urls = extract_urls(text)
+    if not urls:
+        return await message.answer(MESSAGES['import_no_urls'])
+
+    if (
+        len(urls) > importing.MAX_IMPORT_URLS and
+        not importing.is_admin(message.from_user.id)
+    ):
+        return await message.answer(
+            MESSAGES['import_too_many'].format(importing.MAX_IMPORT_URLS)
+        )
+
+    progress_message = await message.answer(
+        importing.ImportProgress(len(urls)).render()
+    )
+    importing.start_import(progress_message, user_id, urls)
+
+
 @dp.message_handler(lambda m: m.text in monitor_menu_buttons, state=MonitorProducts.on_monitor_cmd)
 async def monitor_menu_handler(message: Message, state: FSMContext):
     text = message.text
@@ -101,16 +214,8 @@ async def monitor_menu_handler(message: Message, state: FSMContext):
 @dp.callback_query_handler(select_cb.filter(), state='*')
 async def callback_select(call: CallbackQuery, callback_data: Dict, state: FSMContext):
     product_id = int(callback_data['product_id'])
-    await product_service.add_to_checked_ids(product_id, state)
-
-    async with state.proxy() as data:
-        current_page = data['current_page']
-        checked_ids = data['checked_products']
-
-    pages = await get_pages(state)
-    await call.message.edit_reply_markup(
-        get_keyboard_for_page(pages, current_page, checked_ids)
-    )
+    keyboard = await select_product(call.from_user.id, product_id, state)
+    await call.message.edit_reply_markup(keyboard)
     await call.answer()
 
 
@@ -126,6 +231,7 @@ async def info_callback_confirm(call: CallbackQuery, callback_data: Dict, state:
         await send_products_info(call, products)
     finally:
         await state.update_data(checked_products=[])
+        page_keyboards.clear(call.from_user.id)
         await state.reset_state(with_data=False)
         await call.answer()
 
@@ -134,38 +240,41 @@ async def info_callback_confirm(call: CallbackQuery, callback_data: Dict, state:
 async def callback_navigation(call: CallbackQuery, callback_data: Dict, state: FSMContext):
     # Handles both forward and back buttons
     page_num = int(callback_data['page_num'])
-    pages = await get_pages(state)
-
-    async with state.proxy() as data:
-        data['current_page'] = page_num
-        checked_ids = data['checked_products']
-
-    await call.message.edit_reply_markup(
-        get_keyboard_for_page(pages, page_num, checked_ids)
-    )
+    keyboard = await change_page(call.from_user.id, page_num, state)
+    await call.message.edit_reply_markup(keyboard)
     await call.answer()
 
 
 @dp.message_handler(content_types=[ContentType.TEXT], state=MonitorProducts.on_adding_product)
 async def add_product(message: Message, state: FSMContext):
-    await message.answer(MESSAGES['add_wait'])
     url = message.text
     user_id = message.from_user.id
 
+    # Product is added in background, user is notified when it's done
     try:
-        await product_service.add(url, user_id)
-    except DataAlreadyExistsInDBError:
-        return await message.answer(MESSAGES['add_same_product'])
+        await product_service.enqueue_add(url, user_id)
     except Exception as e:
         logging.exception(e)
-        return await message.answer(MESSAGES['add_error'])
+        return await message.answer(MESSAGES['add_error'].format(url))
 
     await message.answer(
-        MESSAGES['add_success'], reply_markup=ReplyKeyboardRemove()
+        MESSAGES['add_queued'], reply_markup=ReplyKeyboardRemove()
     )
     await state.reset_state(with_data=False)
 
 
+@dp.message_handler(commands='jobs', state='*')
+async def cmd_jobs(message: Message):
+    jobs = await product_service.find_add_jobs(message.from_user.id)
+    if not jobs:
+        return await message.answer(MESSAGES['jobs_empty'])
+
+    await message.answer(
+        MESSAGES['jobs_list'].format(render_add_jobs(jobs)),
+        parse_mode=ParseMode.HTML, disable_web_page_preview=True
+    )
+
+
 @dp.callback_query_handler(confirm_cb.filter(), state=MonitorProducts.on_removing_product)
 async def remove_callback_confirm(call: CallbackQuery, callback_data: Dict, state: FSMContext):
     try:
@@ -179,17 +288,43 @@ async def remove_callback_confirm(call: CallbackQuery, callback_data: Dict, stat
         await call.message.answer(MESSAGES['remove_success'])
     finally:
         await state.update_data(checked_products=[])
+        page_keyboards.clear(call.from_user.id)
         await state.reset_state(with_data=False)
         await call.answer()
 
 
 async def startup(dp: Dispatcher):
-    asyncio.create_task(monitor_products(dp.bot))
+    if METRICS_PORT:
+        dp['metrics_runner'] = await start_metrics_server()
+
+    if FAST_START:
+        # Updates are handled while background tasks wait and parsing
+        # modules are imported in executor
+        asyncio.create_task(start_background_tasks(dp.bot, FAST_START_DELAY))
+    else:
+        await start_background_tasks(dp.bot)
+
+
+async def start_background_tasks(bot: Bot, delay: float = 0):
+    if delay:
+        await asyncio.sleep(delay)
+        await asyncio.get_running_loop().run_in_executor(None, scraper.warm_up)
+    if not MONITORING_IN_WORKERS:
+        asyncio.create_task(monitor_products(bot))
+    asyncio.create_task(send_outbox(bot))
+    asyncio.create_task(send_digests(bot))
+    asyncio.create_task(remove_orphaned_products())
+    if dialect() == SQLITE:
+        asyncio.create_task(compact_option_history())
+    asyncio.create_task(process_add_jobs(bot))
 
 
 async def shutdown(dp: Dispatcher):
     await dp.storage.close()
     await dp.storage.wait_closed()
+    await add_job_queue.close()
+    if 'metrics_runner' in dp:
+        await dp['metrics_runner'].cleanup()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,134 @@
+"""
+Counts Redis round trips and measures time of select and navigation
+callbacks with state kept by RedisStorage2 as one JSON string and by
+RedisHashStorage with field-level reads and writes.
+
+Usage:
+    python -m benchmarks.bench_fsm_storage [--products N] [--taps N]
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from aiogram.dispatcher.storage import FSMContext
+
+from bot.tests.fake_redis import FakeRedis
+from bot.utils.fsm_storage import RedisHashStorage
+from bot.utils.handlers import change_page, select_product, start_paging
+from bot.utils.keyboard import get_keyboard_for_page, page_keyboards
+
+
+USER_ID = 1
+
+
+def seed_products(count: int) -> List[Dict]:
+    return [
+        {
+            'id': id, 'title': f'Product {id}', 'brand': 'Brand',
+            'url': f'https://www.petheaven.co.za/product-{id}.html',
+            'img': f'https://www.petheaven.co.za/{id}.jpg',
+            'product_type': 'Dog Food', 'rating': 4.5, 'reviews': 12,
+            'description': None, 'product_options': None
+        }
+        for id in range(1, count + 1)
+    ]
+
+
+async def legacy_select(product_id: int, state: FSMContext) -> None:
+    """Select callback before paging keyboards were cached."""
+    async with state.proxy() as data:
+        checked_ids = data.get('checked_products')
+        if not checked_ids:
+            data['checked_products'] = [product_id]
+        elif product_id in checked_ids:
+            checked_ids.remove(product_id)
+        else:
+            checked_ids.append(product_id)
+
+    async with state.proxy() as data:
+        current_page = data['current_page']
+        checked_ids = data['checked_products']
+
+    async with state.proxy() as data:
+        products = data['products']
+    get_keyboard_for_page(products, current_page, checked_ids)
+
+
+async def legacy_navigation(page_num: int, state: FSMContext) -> None:
+    async with state.proxy() as data:
+        products = data['products']
+
+    async with state.proxy() as data:
+        data['current_page'] = page_num
+        checked_ids = data['checked_products']
+    get_keyboard_for_page(products, page_num, checked_ids)
+
+
+def json_storage(redis: FakeRedis):
+    from aiogram.contrib.fsm_storage.redis import AioRedisAdapterV2, RedisStorage2
+
+    storage = RedisStorage2()
+    adapter = AioRedisAdapterV2()
+    adapter._redis = redis
+    storage._redis = adapter
+    return storage
+
+
+async def measure(state: FSMContext, redis: FakeRedis, taps: int,
+                  callback: Callable[[int], Awaitable]) -> Dict[str, float]:
+    redis.round_trips = 0
+    started = time.perf_counter()
+    for tap in range(taps):
+        await callback(tap)
+    elapsed = time.perf_counter() - started
+    return {
+        'round_trips': redis.round_trips / taps,
+        'microseconds': elapsed / taps * 10**6
+    }
+
+
+async def run(products: int, taps: int) -> None:
+    seeded = seed_products(products)
+    results = {}
+
+    redis = FakeRedis()
+    state = FSMContext(json_storage(redis), chat=USER_ID, user=USER_ID)
+    await state.set_data({
+        'products': seeded, 'current_page': 1, 'checked_products': []
+    })
+    results['RedisStorage2'] = (
+        await measure(state, redis, taps, lambda tap: legacy_select(tap % 5 + 1, state)),
+        await measure(state, redis, taps, lambda tap: legacy_navigation(tap % 2 + 1, state))
+    )
+
+    redis = FakeRedis()
+    state = FSMContext(RedisHashStorage(redis=redis), chat=USER_ID, user=USER_ID)
+    await state.set_data({'products': seeded})
+    await start_paging(USER_ID, state)
+    results['RedisHashStorage'] = (
+        await measure(state, redis, taps, lambda tap: select_product(USER_ID, tap % 5 + 1, state)),
+        await measure(state, redis, taps, lambda tap: change_page(USER_ID, tap % 2 + 1, state))
+    )
+    page_keyboards.clear(USER_ID)
+
+    print(f'{products} products in state, {taps} taps')
+    print(f'{"":<20}{"select":>24}{"navigation":>24}')
+    for name, (select, navigation) in results.items():
+        print((
+            f'{name:<20}'
+            f'{select["round_trips"]:>8.1f} trips{select["microseconds"]:>8.0f} us'
+            f'{navigation["round_trips"]:>8.1f} trips{navigation["microseconds"]:>8.0f} us'
+        ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--taps', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.products, args.taps))
+
+
+if __name__ == '__main__':
+    main()
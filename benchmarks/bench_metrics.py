@@ -0,0 +1,65 @@
+"""
+Measures overhead of metrics and tracing instrumentation on the hot path.
+
+Usage:
+    python -m benchmarks.bench_metrics
+"""
+import timeit
+
+from prometheus_client import REGISTRY, generate_latest
+
+from bot import tracing
+from bot.metrics import (
+    DB_QUERY_SECONDS,
+    SCRAPE_FAILURES,
+    SCRAPE_PARSE_SECONDS,
+    timed
+)
+
+
+NUMBER = 200_000
+
+
+def plain() -> int:
+    return 1
+
+
+@timed(DB_QUERY_SECONDS)
+def instrumented() -> int:
+    return 1
+
+
+def with_timer() -> int:
+    with SCRAPE_PARSE_SECONDS.time():
+        return 1
+
+
+def with_span() -> int:
+    with tracing.span('bench'):
+        return 1
+
+
+def main() -> None:
+    baseline = timeit.timeit(plain, number=NUMBER)
+    results = {
+        'timed decorator': timeit.timeit(instrumented, number=NUMBER),
+        'histogram timer': timeit.timeit(with_timer, number=NUMBER),
+        'labeled counter inc': timeit.timeit(
+            lambda: SCRAPE_FAILURES.labels('bench').inc(), number=NUMBER
+        ),
+        f'span (tracing {"on" if tracing.enabled else "off"})': timeit.timeit(
+            with_span, number=NUMBER
+        ),
+    }
+
+    print(f'{"baseline call":<20}{baseline / NUMBER * 1e9:>10.0f} ns/call')
+    for name, total in results.items():
+        overhead = (total - baseline) / NUMBER * 1e9
+        print(f'{name:<20}{total / NUMBER * 1e9:>10.0f} ns/call (+{overhead:.0f} ns)')
+
+    render_time = timeit.timeit(lambda: generate_latest(REGISTRY), number=100) / 100
+    print(f'{"render /metrics":<20}{render_time * 1e6:>10.0f} us')
+
+
+if __name__ == '__main__':
+    main()
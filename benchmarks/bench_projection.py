@@ -0,0 +1,166 @@
+"""
+Compares product queries with and without description column
+on a seeded dataset: bytes of result sets and memory of loaded products.
+
+Usage:
+    python -m benchmarks.bench_projection [--products N] [--options N]
+    python -m benchmarks.bench_projection --db
+"""
+import argparse
+import random
+import string
+import tracemalloc
+from decimal import Decimal
+from typing import Iterable, List, Tuple
+
+from bot.database import product_gateway
+from bot.utils.util import to_products
+
+
+DESCRIPTION_LENGTH = (600, 3000)
+
+
+def seed_rows(products: int, options: int) -> List[Tuple]:
+    """Returns rows of GET_ALL_PRODUCTS_WITH_OPTIONS_QUERY with descriptions."""
+    random.seed(0)
+    rows = []
+    for id in range(1, products + 1):
+        description = ''.join(random.choices(
+            string.ascii_letters + ' ', k=random.randint(*DESCRIPTION_LENGTH)
+        ))
+        product = (
+            id, 'Brand', description, f'https://www.petheaven.co.za/{id}.jpg',
+            f'Product {id}', 'Dog Food', 4.5, 12,
+            f'https://www.petheaven.co.za/product-{id}.html', 'f' * 40
+        )
+        for opt in range(options):
+            rows.append((
+                *product, id * options + opt,
+                'JHB:3;CPT:2', f'{opt + 1}kg',
+                Decimal(random.randint(100, 2000))
+            ))
+    return rows
+
+
+def without_description(rows: Iterable[Tuple]) -> List[Tuple]:
+    return [(*row[:2], None, *row[3:]) for row in rows]
+
+
+def result_set_bytes(rows: Iterable[Tuple]) -> int:
+    """
+    Estimates size of rows in MySQL text protocol: every value
+    is sent as length-encoded string, NULL takes one byte.
+    """
+    size = 0
+    for row in rows:
+        for value in row:
+            if value is None:
+                size += 1
+                continue
+            length = len(str(value).encode())
+            size += length + (1 if length < 251 else 3 if length < 2**16 else 4)
+    return size
+
+
+def loaded_bytes(rows: List[Tuple]) -> int:
+    """
+    Returns peak memory of fetched rows and products built from them.
+    Like database driver, strings are decoded anew for every row.
+    """
+    encoded = [
+        tuple(v.encode() if isinstance(v, str) else v for v in row)
+        for row in rows
+    ]
+    tracemalloc.start()
+    fetched = [
+        tuple(v.decode() if isinstance(v, bytes) else v for v in row)
+        for row in encoded
+    ]
+    products = to_products(fetched)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del fetched, products
+    return peak
+
+
+def print_comparison(name: str, full: int, projected: int) -> None:
+    saved = (full - projected) / full * 100 if full else 0
+    print((
+        f'{name:<24}{full / 2**20:>10.2f} MiB{projected / 2**20:>10.2f} MiB'
+        f'{saved:>8.1f}% saved'
+    ))
+
+
+def run_seeded(products: int, options: int) -> None:
+    full_rows = seed_rows(products, options)
+    projected_rows = without_description(full_rows)
+    list_rows = [row[:10] for row in full_rows[::options]]
+
+    print(f'{products} products with {options} options each')
+    print(f'{"":<24}{"full":>14}{"projected":>14}')
+    print_comparison(
+        'monitoring result set',
+        result_set_bytes(full_rows), result_set_bytes(projected_rows)
+    )
+    print_comparison(
+        '/monitor result set',
+        result_set_bytes(list_rows),
+        result_set_bytes(without_description(list_rows))
+    )
+    print_comparison(
+        'monitoring products',
+        loaded_bytes(full_rows), loaded_bytes(projected_rows)
+    )
+
+
+def run_db() -> None:
+    """
+    Measures result sets of configured database. SQLite has no wire
+    protocol, so their size is estimated like for seeded rows.
+    """
+    from bot.database.engine import MYSQL, connect, dialect
+
+    def bytes_sent(cursor) -> int:
+        cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+        return int(cursor.fetchone()[1])
+
+    with connect() as connection:
+        with connection.cursor() as cursor:
+            sizes = []
+            for column in ('p.' + product_gateway.DESCRIPTION_COLUMN,
+                           product_gateway.NO_DESCRIPTION_COLUMN):
+                before = bytes_sent(cursor) if dialect() == MYSQL else 0
+                cursor.execute(
+                    product_gateway.GET_ALL_PRODUCTS_WITH_OPTIONS_QUERY.format(
+                        description=column
+                    )
+                )
+                result = cursor.fetchall()
+                rows = len(result)
+                if dialect() == MYSQL:
+                    sizes.append(bytes_sent(cursor) - before)
+                else:
+                    sizes.append(result_set_bytes(result))
+
+    print(f'{rows} rows of products with options')
+    print_comparison('monitoring result set', *sizes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--options', type=int, default=4)
+    parser.add_argument(
+        '--db', action='store_true',
+        help='measure queries against database from DB_* variables'
+    )
+    args = parser.parse_args()
+
+    if args.db:
+        run_db()
+    else:
+        run_seeded(args.products, args.options)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Profiles cold start of bot with python -X importtime: total time of
+importing app, modules taking most of it and comparison with eager
+import of parsing modules, which were imported by app before.
+
+Usage:
+    python -m benchmarks.bench_startup [--top N] [--runs N]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from bot.scraper import PARSING_MODULES
+
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+# App validates token on import, it's never used to connect
+FAKE_TOKEN = '123456:ABCdefGHIjklMNOpqrSTUvwxYZ0123456789'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(code: str) -> List[Tuple[int, int, int, str]]:
+    """Returns (self us, cumulative us, depth, module) of imports done by code."""
+    env = {**os.environ, 'TOKEN': os.getenv('TOKEN', FAKE_TOKEN), 'METRICS_PORT': '0'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            times.append((int(self_us), int(cumulative_us), len(indent) // 2, module))
+    return times
+
+
+def total_ms(times: List[Tuple[int, int, int, str]]) -> float:
+    return sum(cumulative for _, cumulative, depth, _ in times if depth == 0) / 1000
+
+
+def packages_ms(times: List[Tuple[int, int, int, str]]) -> Dict[str, float]:
+    packages = defaultdict(float)
+    for self_us, _, _, module in times:
+        packages[module.split('.')[0]] += self_us / 1000
+    return packages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    eager = f'import {", ".join(PARSING_MODULES)}; import app'
+    lazy_runs = [import_times('import app') for _ in range(args.runs)]
+    eager_runs = [import_times(eager) for _ in range(args.runs)]
+
+    lazy = statistics.median(total_ms(times) for times in lazy_runs)
+    eager = statistics.median(total_ms(times) for times in eager_runs)
+    print(f'import app, median of {args.runs} runs')
+    print(f'{"lazy parsing modules":<28}{lazy:>10.1f} ms')
+    print(f'{"eager parsing modules":<28}{eager:>10.1f} ms')
+    print(f'{"saved":<28}{eager - lazy:>10.1f} ms')
+
+    imported = {module for *_, module in lazy_runs[0]}
+    deferred = [module for module in PARSING_MODULES if module not in imported]
+    print(f'\nDeferred until first scrape: {", ".join(deferred) or "none"}')
+
+    print(f'\nTop {args.top} packages by import time')
+    packages = packages_ms(lazy_runs[0])
+    for package, ms in sorted(packages.items(), key=lambda p: -p[1])[:args.top]:
+        print(f'{package:<28}{ms:>10.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
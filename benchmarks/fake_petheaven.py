@@ -0,0 +1,295 @@
+"""
+Local site serving synthetic product pages in markup of petheaven, so
+monitoring cycles can be run against catalog of any size. Products are
+generated from seed and index in url; every cycle prices and stock of
+some products change and some products are removed.
+
+Usage:
+    python -m benchmarks.fake_petheaven [--port N] [--seed N] [--price-churn RATE]
+        [--stock-churn RATE] [--removal-rate RATE]
+
+Cycle is advanced by POST /next-cycle and reset by POST /reset.
+"""
+import argparse
+import html
+import json
+import random
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from bot.entities import Product, ProductOption, WarehouseStock
+from bot.utils.util import (
+    AVAILABILITY_IN_STOCK,
+    AVAILABILITY_LOW_STOCK,
+    AVAILABILITY_OUT_OF_STOCK,
+    get_options_fingerprint
+)
+
+
+PORT = 8089
+PRODUCT_PATH = '/synthetic/{index}.html'
+
+BRANDS = (
+    'Acana', 'Orijen', 'Royal Canin', 'Hill\'s', 'Montego', 'Beeztees',
+    'Wagworld', 'Marlton\'s', 'Dog\'s Life', 'Vondi\'s'
+)
+PRODUCT_TYPES = (
+    'Dog Food', 'Cat Food', 'Dog Treats', 'Cat Treats', 'Bird Food',
+    'Dog Toys', 'Pet Beds', 'Dog Clothing', 'Small Pet Habitats'
+)
+WAREHOUSES = ('JHB', 'CPT', 'DBN')
+STOCK_TEXTS = {
+    AVAILABILITY_IN_STOCK: 'In stock',
+    AVAILABILITY_LOW_STOCK: 'Low stock',
+    AVAILABILITY_OUT_OF_STOCK: 'Out of stock'
+}
+MAX_OPTIONS = 20
+
+
+def product_url(base_url: str, index: int) -> str:
+    return base_url + PRODUCT_PATH.format(index=index)
+
+
+def make_product(seed: int, index: int, base_url: str) -> Product:
+    """
+    Returns product number index of synthetic catalog, the same for
+    the same seed. Most products have a few options, some up to 20.
+    """
+    rng = random.Random(f'{seed}:{index}')
+    brand = rng.choice(BRANDS)
+    product_type = rng.choice(PRODUCT_TYPES)
+    options_count = min(MAX_OPTIONS, 1 + int(rng.expovariate(1 / 3)))
+    unit, step = rng.choice((('kg', 2), ('g', 250), ('pack', 1)))
+    base_price = rng.uniform(30, 300)
+
+    options = [
+        ProductOption(
+            id=None,
+            availability=_make_availability(rng),
+            title=f'{(i + 1) * step} {unit}',
+            price=Decimal(f'{base_price * (i + 1) * rng.uniform(0.8, 1):.2f}')
+        )
+        for i in range(options_count)
+    ]
+    return Product(
+        id=None,
+        brand=brand,
+        description=' '.join(
+            [f'{brand} {product_type.lower()} for happy pets.'] * rng.randint(1, 8)
+        ),
+        img=f'{base_url}/media/{index}.jpg',
+        title=f'{brand} {product_type} No. {index}',
+        product_type=product_type,
+        # Rating is shown as width of stars in percents
+        rating=5 * (rng.randint(50, 100) / 100),
+        reviews=rng.randint(0, 300),
+        url=product_url(base_url, index),
+        product_options=options,
+        options_fingerprint=get_options_fingerprint(options)
+    )
+
+
+def _make_availability(rng: random.Random) -> Tuple[WarehouseStock, ...]:
+    warehouses = WAREHOUSES[:rng.randint(1, len(WAREHOUSES))]
+    return tuple(
+        WarehouseStock(warehouse, rng.choices(
+            tuple(STOCK_TEXTS), weights=(6, 2, 1)
+        )[0])
+        for warehouse in warehouses
+    )
+
+
+def churn_product(product: Product, rng: random.Random, price_churn: float,
+                  stock_churn: float) -> Product:
+    """Returns product with price and stock of one option changed by chance."""
+    options = list(product.product_options)
+    if rng.random() < price_churn:
+        i = rng.randrange(len(options))
+        price = options[i].price * Decimal(f'{rng.uniform(0.8, 1.2):.2f}')
+        options[i] = options[i]._replace(price=price.quantize(Decimal('0.01')))
+    if rng.random() < stock_churn:
+        i = rng.randrange(len(options))
+        availability = list(options[i].availability)
+        j = rng.randrange(len(availability))
+        codes = [code for code in STOCK_TEXTS if code != availability[j].code]
+        availability[j] = availability[j]._replace(code=rng.choice(codes))
+        options[i] = options[i]._replace(availability=tuple(availability))
+
+    return product._replace(
+        product_options=options,
+        options_fingerprint=get_options_fingerprint(options)
+    )
+
+
+def render_page(product: Product, on_sale: bool = False) -> str:
+    """Renders product page which scraper parses back to the product."""
+    options = product.product_options
+    if len(options) == 1:
+        options_html = (
+            '<script>dataLayer.push({"event": "productView"});</script>'
+            '<script>dataLayer.push({\'currentProduct\': '
+            f'{json.dumps({"price": str(options[0].price), "variant": options[0].title})}'
+            '})</script>'
+            f'<div class="availability"><span>{_render_availability(options[0])}</span></div>'
+        )
+    else:
+        options_html = _render_many_options(options, on_sale)
+
+    return (
+        '<html><head><title>Pet Heaven</title></head><body>'
+        f'<h1>{html.escape(product.title)}</h1>'
+        f'<img id="image-main" src="{product.img}">'
+        f'<div class="rating" style="width:{product.rating * 20:.0f}%"></div>'
+        f'<a id="goto-reviews">{product.reviews} Reviews</a>'
+        + ('<span class="sticker sale">Sale</span>' if on_sale else '')
+        + options_html
+        + f'<div itemprop="description">{html.escape(product.description)}</div>'
+        '<table id="product-attribute-specs-table"><tbody>'
+        f'<tr><th>Brands</th><td>{html.escape(product.brand)}</td></tr>'
+        f'<tr><th>Product Type</th><td>{html.escape(product.product_type)}</td></tr>'
+        '</tbody></table>'
+        '</body></html>'
+    )
+
+
+def _render_many_options(options: List[ProductOption], on_sale: bool) -> str:
+    prices = [
+        {
+            'id': str(i),
+            'once_off_price': str(option.price * Decimal('1.1') if on_sale else option.price),
+            'special_price': str(option.price)
+        }
+        for i, option in enumerate(options)
+    ]
+    titles = [
+        {'id': str(i), 'label': option.title, 'product_id': str(100 + i)}
+        for i, option in enumerate(options)
+    ]
+    availabilities = [
+        {'id': str(100 + i), 'availability': _render_availability(option)}
+        for i, option in enumerate(options)
+    ]
+    return (
+        '<div id="product-options-wrapper"></div>'
+        '<script>document.observe("dom:loaded", function() { new Options('
+        f'{{"options":{json.dumps(prices)},"selected_option":null}}); }});</script>'
+        '<script>var spConfig = new Product.Config('
+        f'{{"attributes":{{"1":{{"options":{json.dumps(titles)}}}}},"template":"R#{{price}}",'
+        f'"subProductsAvailability":{json.dumps(availabilities)}}});</script>'
+    )
+
+
+def _render_availability(option: ProductOption) -> str:
+    return ''.join(
+        '<div class="stock-display">'
+        f'<span class="stock-warehouse">{stock.warehouse}</span>'
+        f'<span style="color: green"><span>{STOCK_TEXTS[stock.code]}</span></span>'
+        '</div>'
+        for stock in option.availability
+    )
+
+
+class FakePetHeaven:
+    """
+    Synthetic catalog changing every cycle. Products are generated on
+    request and changes of previous cycles are applied to them, so
+    pages don't depend on order of requests and are repeatable.
+    """
+
+    def __init__(self, base_url: str, seed: int = 0, price_churn: float = 0.05,
+                 stock_churn: float = 0.05, removal_rate: float = 0.001):
+        self.base_url = base_url
+        self.seed = seed
+        self.price_churn = price_churn
+        self.stock_churn = stock_churn
+        self.removal_rate = removal_rate
+        self.cycle = 0
+        # Index: (cycle, product or None if removed)
+        self._products: Dict[int, Tuple[int, Optional[Product]]] = {}
+
+    def next_cycle(self) -> int:
+        self.cycle += 1
+        return self.cycle
+
+    def reset(self) -> None:
+        self.cycle = 0
+        self._products.clear()
+
+    def product(self, index: int) -> Optional[Product]:
+        """Returns product in current cycle, None if it was removed."""
+        cycle, product = self._products.get(
+            index, (0, make_product(self.seed, index, self.base_url))
+        )
+        while cycle < self.cycle and product is not None:
+            cycle += 1
+            rng = random.Random(f'{self.seed}:{index}:{cycle}')
+            if rng.random() < self.removal_rate:
+                product = None
+            else:
+                product = churn_product(
+                    product, rng, self.price_churn, self.stock_churn
+                )
+
+        self._products[index] = (self.cycle, product)
+        return product
+
+    def is_on_sale(self, index: int) -> bool:
+        return random.Random(f'{self.seed}:{index}:sale').random() < 0.2
+
+
+def create_app(site: FakePetHeaven) -> web.Application:
+    async def product_page(request: web.Request) -> web.Response:
+        index = int(request.match_info['index'])
+        product = site.product(index)
+        if product is None:
+            raise web.HTTPNotFound()
+        return web.Response(
+            text=render_page(product, site.is_on_sale(index)), content_type='text/html'
+        )
+
+    async def next_cycle(request: web.Request) -> web.Response:
+        return web.json_response({'cycle': site.next_cycle()})
+
+    async def reset(request: web.Request) -> web.Response:
+        site.reset()
+        return web.json_response({'cycle': site.cycle})
+
+    app = web.Application()
+    app.router.add_get(PRODUCT_PATH.format(index='{index:\\d+}'), product_page)
+    app.router.add_post('/next-cycle', next_cycle)
+    app.router.add_post('/reset', reset)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--price-churn', type=float, default=0.05,
+        help='share of products changing price every cycle'
+    )
+    parser.add_argument(
+        '--stock-churn', type=float, default=0.05,
+        help='share of products changing stock every cycle'
+    )
+    parser.add_argument(
+        '--removal-rate', type=float, default=0.001,
+        help='share of products removed every cycle'
+    )
+    args = parser.parse_args()
+
+    site = FakePetHeaven(
+        f'http://{args.host}:{args.port}', args.seed, args.price_churn,
+        args.stock_churn, args.removal_rate
+    )
+    web.run_app(create_app(site), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
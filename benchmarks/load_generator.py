@@ -0,0 +1,332 @@
+"""
+Seeds database with synthetic users, products with options and
+subscriptions, popularity of products follows Zipf's law, and measures
+monitoring cycles against local fake petheaven with price and stock
+churn. Seeding wipes users, products and related tables, so run it
+against a scratch database only.
+
+Usage:
+    python -m benchmarks.load_generator seed --reset [--products N] [--users N]
+        [--subscriptions N] [--seed N]
+    python -m benchmarks.load_generator cycles [--cycles N]
+    python -m benchmarks.load_generator scale --reset [--sizes N,N,...] [--cycles N]
+        [--report FILE]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import aiohttp
+
+from benchmarks.fake_petheaven import PORT, make_product
+from bot.database.engine import SQLITE, connect, dialect
+from bot.tasks.monitoring import run_monitoring_cycle
+
+
+BASE_URL = f'http://127.0.0.1:{PORT}'
+BATCH_SIZE = 5000
+ZIPF_EXPONENT = 1.1
+DELIVERY_MODES = ('instant', 'hourly', 'daily')
+DELIVERY_MODE_WEIGHTS = (16, 3, 1)
+# Ratios of catalog of 100k products watched by 50k users with 1M subscriptions
+USERS_PER_PRODUCT = 0.5
+SUBSCRIPTIONS_PER_PRODUCT = 10
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEEDED_TABLES = (
+    'notification_outbox', 'pending_notifications', 'option_history',
+    'monitoring_list', 'product_options', 'products', 'users'
+)
+
+ADD_USERS_QUERY = """
+    INSERT INTO users (id, username, first_name, last_name, delivery_mode)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+ADD_PRODUCTS_QUERY = """
+    INSERT INTO products
+    (id, brand, description_, img, title, product_type, rating, reviews, url,
+     options_fingerprint)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+ADD_PRODUCT_OPTIONS_QUERY = """
+    INSERT INTO product_options
+    (availability, title, price, product_id)
+    VALUES (%s, %s, %s, %s)
+"""
+
+ADD_SUBSCRIPTIONS_QUERY = """
+    INSERT INTO monitoring_list (user_id, product_id)
+    VALUES (%s, %s)
+"""
+
+SET_WATCHER_COUNTS_QUERY = """
+    UPDATE products
+    SET watcher_count = (
+        SELECT COUNT(*) FROM monitoring_list
+        WHERE monitoring_list.product_id = products.id
+    )
+"""
+
+
+def generate_subscriptions(seed: int, products: int, users: int,
+                           subscriptions: int, exponent: float = ZIPF_EXPONENT
+                           ) -> Iterator[Tuple[int, int]]:
+    """
+    Yields unique (user id, product id) pairs. Every product has at least
+    one watcher, the rest are drawn by Zipf's law over shuffled ranks.
+    """
+    if not products <= subscriptions <= products * users:
+        raise ValueError(
+            f'{subscriptions} subscriptions cannot cover {products} products '
+            f'watched by {users} users'
+        )
+
+    rng = random.Random(f'{seed}:subscriptions')
+    # Pairs are packed to ints, a set of 1M tuples takes several times more
+    seen = set()
+
+    def add(user_id: int, product_id: int) -> bool:
+        pair = user_id * (products + 1) + product_id
+        if pair in seen:
+            return False
+        seen.add(pair)
+        return True
+
+    for product_id in range(1, products + 1):
+        user_id = rng.randint(1, users)
+        add(user_id, product_id)
+        yield user_id, product_id
+
+    ranked = list(range(1, products + 1))
+    rng.shuffle(ranked)
+    cum_weights = list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, products + 1)
+    ))
+    left = subscriptions - products
+    while left:
+        for product_id in rng.choices(ranked, cum_weights=cum_weights, k=min(left, BATCH_SIZE)):
+            user_id = rng.randint(1, users)
+            if left and add(user_id, product_id):
+                left -= 1
+                yield user_id, product_id
+
+
+def generate_users(seed: int, users: int) -> Iterator[Tuple]:
+    rng = random.Random(f'{seed}:users')
+    for user_id in range(1, users + 1):
+        yield (
+            user_id, f'user{user_id}', f'User {user_id}', None,
+            rng.choices(DELIVERY_MODES, weights=DELIVERY_MODE_WEIGHTS)[0]
+        )
+
+
+def generate_products(seed: int, products: int, base_url: str) -> Iterator[Tuple[Tuple, List[Tuple]]]:
+    """Yields rows of products and their options, ids are indexes in catalog."""
+    for product_id in range(1, products + 1):
+        product = make_product(seed, product_id, base_url)
+        yield (
+            (product_id, *product.to_storage_structure()),
+            product.options_to_storage_structure(product_id)
+        )
+
+
+def seed_database(seed: int, products: int, users: int, subscriptions: int,
+                  base_url: str = BASE_URL, reset: bool = False) -> Dict[str, float]:
+    """Fills empty or reset database and returns counts of rows and seconds."""
+    started = time.perf_counter()
+    with connect() as connection:
+        with connection.cursor() as cursor:
+            if reset and dialect() == SQLITE:
+                # Tables are listed so that referencing ones go first
+                for table in SEEDED_TABLES:
+                    cursor.execute(f'DELETE FROM {table}')
+            elif reset:
+                cursor.execute('SET FOREIGN_KEY_CHECKS = 0')
+                for table in SEEDED_TABLES:
+                    cursor.execute(f'TRUNCATE TABLE {table}')
+                cursor.execute('SET FOREIGN_KEY_CHECKS = 1')
+            else:
+                cursor.execute('SELECT EXISTS (SELECT 1 FROM users), EXISTS (SELECT 1 FROM products)')
+                if any(cursor.fetchone()):
+                    raise RuntimeError('Database is not empty, pass --reset to wipe it')
+
+            _insert_batches(cursor, ADD_USERS_QUERY, generate_users(seed, users))
+            options = 0
+            for batch in _batches(generate_products(seed, products, base_url)):
+                cursor.executemany(ADD_PRODUCTS_QUERY, [product for product, _ in batch])
+                option_rows = [row for _, rows in batch for row in rows]
+                cursor.executemany(ADD_PRODUCT_OPTIONS_QUERY, option_rows)
+                options += len(option_rows)
+            _insert_batches(
+                cursor, ADD_SUBSCRIPTIONS_QUERY,
+                generate_subscriptions(seed, products, users, subscriptions)
+            )
+            cursor.execute(SET_WATCHER_COUNTS_QUERY)
+            connection.commit()
+
+    return {
+        'users': users, 'products': products, 'options': options,
+        'subscriptions': subscriptions, 'seconds': time.perf_counter() - started
+    }
+
+
+def _batches(rows: Iterable) -> Iterator[List]:
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, BATCH_SIZE)):
+        yield batch
+
+
+def _insert_batches(cursor, query: str, rows: Iterable[Tuple]) -> None:
+    for batch in _batches(rows):
+        cursor.executemany(query, batch)
+
+
+async def run_cycles(base_url: str, cycles: int) -> None:
+    """
+    Runs monitoring cycles advancing churn of fake site before each
+    of them and prints stats of cycles as JSON lines.
+    """
+    for number in range(1, cycles + 1):
+        await _post(f'{base_url}/next-cycle')
+        cycle = await run_monitoring_cycle(None)
+        print(json.dumps({
+            'cycle': number,
+            **cycle._asdict(),
+            'max_rss_mib': _max_rss_mib()
+        }), flush=True)
+
+
+def _max_rss_mib() -> float:
+    # Kilobytes on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+async def _post(url: str) -> None:
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url) as response:
+            response.raise_for_status()
+
+
+async def _reset_site(base_url: str, timeout: float = 10) -> None:
+    """Resets churn of fake site, waiting for it to start."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await _post(f'{base_url}/reset')
+        except aiohttp.ClientConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def scale(sizes: List[int], cycles: int, seed: int, churn_args: List[str]) -> List[Dict]:
+    """
+    Seeds database for every catalog size and runs cycles in fresh
+    process, so peak memory of one size doesn't hide the next one.
+    """
+    site = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.fake_petheaven', '--seed', str(seed), *churn_args],
+        cwd=ROOT
+    )
+    env = {**os.environ, 'SCRAPE_CACHE_DISABLED': '1'}
+    env.pop('TRACE_FILE', None)
+    results = []
+    try:
+        for size in sizes:
+            seeded = seed_database(
+                seed, size, max(1, int(size * USERS_PER_PRODUCT)),
+                size * SUBSCRIPTIONS_PER_PRODUCT, reset=True
+            )
+            asyncio.run(_reset_site(BASE_URL))
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.load_generator', 'cycles', '--cycles', str(cycles)],
+                cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True, check=True
+            ).stdout
+            for line in output.splitlines():
+                if line.startswith('{'):
+                    results.append({'size': size, 'seeded': seeded, **json.loads(line)})
+    finally:
+        site.terminate()
+        site.wait()
+    return results
+
+
+def print_report(results: List[Dict]) -> None:
+    columns = ('products', 'subs', 'cycle', 'seconds', 'products/s', 'notifications', 'unavailable', 'rss MiB')
+    print(''.join(f'{c:>14}' for c in columns))
+    for result in results:
+        print(''.join(f'{value:>14}' for value in (
+            result['size'],
+            result['seeded']['subscriptions'],
+            result['cycle'],
+            f'{result["seconds"]:.1f}',
+            f'{result["products"] / result["seconds"]:.1f}',
+            result['notifications'],
+            result['unavailable'],
+            f'{result["max_rss_mib"]:.0f}'
+        )))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('mode', choices=('seed', 'cycles', 'scale'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--subscriptions', type=int, default=1_000_000)
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument(
+        '--sizes', default='1000,10000,100000',
+        help='comma separated catalog sizes, users and subscriptions are scaled with them'
+    )
+    parser.add_argument('--reset', action='store_true', help='wipe seeded tables first')
+    parser.add_argument('--report', help='also write results of scale to JSON file')
+    parser.add_argument('--price-churn', default='0.05', help='passed to fake site')
+    parser.add_argument('--stock-churn', default='0.05', help='passed to fake site')
+    parser.add_argument('--removal-rate', default='0.001', help='passed to fake site')
+    args = parser.parse_args()
+
+    if args.mode == 'seed':
+        seeded = seed_database(
+            args.seed, args.products, args.users, args.subscriptions, reset=args.reset
+        )
+        print((
+            f'Seeded {seeded["users"]} users, {seeded["products"]} products with '
+            f'{seeded["options"]} options and {seeded["subscriptions"]} subscriptions '
+            f'in {seeded["seconds"]:.1f} s'
+        ))
+    elif args.mode == 'cycles':
+        asyncio.run(run_cycles(BASE_URL, args.cycles))
+    else:
+        if not args.reset:
+            parser.error('scale wipes seeded tables for every size, pass --reset')
+        sizes = [int(size) for size in args.sizes.split(',')]
+        churn_args = [
+            '--price-churn', args.price_churn, '--stock-churn', args.stock_churn,
+            '--removal-rate', args.removal_rate
+        ]
+        results = scale(sizes, args.cycles, args.seed, churn_args)
+        print_report(results)
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Records product pages of all products in database to archive once and
+runs full monitoring cycle against recorded pages with given latency
+and injected errors. Cycle works with database from DB_* variables and
+updates it like monitoring worker, so use a local copy.
+
+Usage:
+    python -m benchmarks.replay_cycle record cycle.json.gz
+    python -m benchmarks.replay_cycle replay cycle.json.gz [--latency MS] [--jitter MS]
+        [--error-rate RATE] [--seed N] [--memory]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Spans of cycle stages are summarized, so tracing must be enabled before import
+TRACE_FILE = os.path.join(tempfile.mkdtemp(), 'replay_traces.jsonl')
+os.environ['TRACE_FILE'] = TRACE_FILE
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from benchmarks.trace_summary import load_spans, print_summary
+from bot import scraper
+from bot.database import product_gateway
+from bot.tasks.monitoring import run_monitoring_cycle
+from bot.utils.http_archive import HttpArchive, RecordingSession, ReplaySession
+from bot.utils.scrape_pool import scrape_pool
+
+
+async def record(path: str) -> None:
+    archive = HttpArchive()
+    urls = [product.url for product in product_gateway.get_all_products(with_options=False)]
+    async with RecordingSession(archive, scraper.create_session()) as session:
+        results = await asyncio.gather(
+            *(scrape_pool.scrape(url, session) for url in urls),
+            return_exceptions=True
+        )
+
+    archive.save(path)
+    failed = sum(isinstance(result, Exception) for result in results)
+    print((
+        f'Recorded {len(archive)} pages of {len(urls)} products to {path}, '
+        f'{os.path.getsize(path) / 2**20:.1f} MiB, {failed} failed to scrape'
+    ))
+
+
+async def replay(path: str, latency: float, jitter: float, error_rate: float,
+                 seed: int, memory: bool) -> None:
+    archive = HttpArchive.load(path)
+    scraper.session_factory = lambda: ReplaySession(
+        archive, latency / 1000, jitter / 1000, error_rate, seed
+    )
+    # Parsing modules would be imported within the first scrape otherwise
+    scraper.warm_up()
+
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    cycle = await run_monitoring_cycle(None)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if memory else None
+    if memory:
+        tracemalloc.stop()
+
+    print((
+        f'Replayed {len(archive)} pages with {latency:.0f}±{jitter:.0f} ms latency '
+        f'and {error_rate:.0%} errors'
+    ))
+    print((
+        f'{cycle.products} products, {cycle.scraped} scraped, '
+        f'{cycle.unavailable} unavailable, {cycle.notifications} notifications'
+    ))
+    print(f'Wall time: {elapsed:.2f} s')
+    if peak is not None:
+        print(f'Peak traced memory of cycle: {peak / 2**20:.1f} MiB')
+    # Kilobytes on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'Peak RSS of process: {max_rss / (2**20 if sys.platform == "darwin" else 2**10):.1f} MiB')
+
+    print()
+    print_summary(load_spans(TRACE_FILE))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('mode', choices=('record', 'replay'))
+    parser.add_argument('archive', help='gzip compressed JSON file of recorded pages')
+    parser.add_argument('--latency', type=float, default=0, help='mean latency, ms')
+    parser.add_argument('--jitter', type=float, default=0, help='max deviation of latency, ms')
+    parser.add_argument(
+        '--error-rate', type=float, default=0,
+        help='share of requests failing with timeout, network or http status error'
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--memory', action='store_true',
+        help='trace peak memory of cycle, slows it down'
+    )
+    args = parser.parse_args()
+
+    if args.mode == 'record':
+        asyncio.run(record(args.archive))
+    else:
+        asyncio.run(replay(
+            args.archive, args.latency, args.jitter, args.error_rate,
+            args.seed, args.memory
+        ))
+
+
+if __name__ == '__main__':
+    main()
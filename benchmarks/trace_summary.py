@@ -0,0 +1,71 @@
+"""
+Summarizes spans exported with TRACE_FILE by span name.
+
+Usage:
+    python -m benchmarks.trace_summary traces.jsonl [--trace TRACE_ID]
+"""
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, List
+
+
+def load_spans(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, round(q * (len(values) - 1)))
+    return values[index]
+
+
+def print_summary(spans: List[Dict]) -> None:
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    for span in spans:
+        durations[span['name']].append(span['duration_ms'])
+        if span['status'] != 'OK':
+            errors[span['name']] += 1
+
+    print(f'{"span":<40}{"count":>8}{"errors":>8}{"total ms":>12}{"p50 ms":>10}{"p95 ms":>10}')
+    for name, values in sorted(durations.items(), key=lambda i: -sum(i[1])):
+        print(
+            f'{name:<40}{len(values):>8}{errors[name]:>8}{sum(values):>12.1f}'
+            f'{percentile(values, 0.5):>10.2f}{percentile(values, 0.95):>10.2f}'
+        )
+
+
+def print_trace(spans: List[Dict], trace_id: str) -> None:
+    spans = sorted(
+        (s for s in spans if s['trace_id'] == trace_id),
+        key=lambda s: s['start_time_unix_nano']
+    )
+    children = defaultdict(list)
+    for span in spans:
+        children[span['parent_id']].append(span)
+
+    def walk(parent_id: str, depth: int) -> None:
+        for span in children[parent_id]:
+            print(f'{"  " * depth}{span["name"]} {span["duration_ms"]:.2f} ms {span["status"]}')
+            walk(span['span_id'], depth + 1)
+
+    walk(None, 0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file')
+    parser.add_argument('--trace', help='print span tree of a single trace')
+    args = parser.parse_args()
+
+    spans = load_spans(args.file)
+    if args.trace:
+        print_trace(spans, args.trace)
+    else:
+        print_summary(spans)
+
+
+if __name__ == '__main__':
+    main()
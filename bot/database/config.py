@@ -2,8 +2,10 @@ import os
 
 
 db_config = {
+    # mysql or sqlite, database of sqlite is path to its file
+    'engine': os.getenv('DB_ENGINE', 'mysql'),
     'host': os.getenv('DB_HOST'),
     'user': os.getenv('DB_USER'),
     'password': os.getenv('DB_PASSWORD'),
     'database': os.getenv('DB_NAME')
-}
\ No newline at end of file
+}
@@ -0,0 +1,138 @@
+"""
+Database engines behind gateways: MySQL server or embedded SQLite file
+for tests and single-node deployments. Gateways write queries with %s
+placeholders; queries using syntax of one engine are dicts by dialect.
+"""
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Iterable, Sequence
+
+try:
+    import mysql.connector
+    from mysql.connector import errorcode
+except ImportError:
+    # SQLite deployments may go without MySQL driver
+    mysql = None
+
+from .config import db_config
+
+
+MYSQL = 'mysql'
+SQLITE = 'sqlite'
+
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Errors of both drivers, so gateways catch them regardless of engine
+Error = (sqlite3.Error, mysql.connector.Error) if mysql else (sqlite3.Error,)
+
+
+def dialect() -> str:
+    """Returns name of engine set by DB_ENGINE, mysql by default."""
+    return db_config['engine']
+
+
+def connect():
+    """
+    Returns new connection of configured engine. Like MySQL connection
+    it's closed on exiting with block, uncommitted changes are discarded.
+    """
+    if dialect() == SQLITE:
+        return SQLiteConnection(db_config['database'])
+
+    config = {key: value for key, value in db_config.items() if key != 'engine'}
+    return mysql.connector.connect(**config)
+
+
+def is_duplicate_entry(error: Exception) -> bool:
+    """Tells if error is violation of primary key or unique index."""
+    if isinstance(error, sqlite3.IntegrityError):
+        return 'UNIQUE constraint failed' in str(error)
+    if mysql is None:
+        return False
+    return getattr(error, 'errno', None) == errorcode.ER_DUP_ENTRY
+
+
+# MySQL driver returns DECIMAL as Decimal and DATETIME as datetime,
+# SQLite ones are converted back by declared types of columns
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda value: value.strftime(SQLITE_DATETIME_FORMAT))
+sqlite3.register_converter('DECIMAL', lambda value: Decimal(value.decode()))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+
+
+class SQLiteConnection:
+    """SQLite connection with interface of MySQL connection used by gateways."""
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(
+            path, detect_types=sqlite3.PARSE_DECLTYPES,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000
+        )
+        # Both are off by default and are set per connection
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+
+    def cursor(self) -> 'SQLiteCursor':
+        return SQLiteCursor(self._connection.cursor())
+
+    def commit(self) -> None:
+        self._connection.commit()
+
+    def rollback(self) -> None:
+        self._connection.rollback()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'SQLiteConnection':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SQLiteCursor:
+    """SQLite cursor taking queries with %s placeholders."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, query: str, params: Sequence = ()) -> None:
+        self._cursor.execute(_to_qmark(query), params)
+
+    def executemany(self, query: str, params: Iterable[Sequence]) -> None:
+        self._cursor.executemany(_to_qmark(query), params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self) -> int:
+        return self._cursor.lastrowid
+
+    def close(self) -> None:
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self) -> 'SQLiteCursor':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+@lru_cache(maxsize=256)
+def _to_qmark(query: str) -> str:
+    return query.replace('%s', '?')
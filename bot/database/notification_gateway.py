@@ -0,0 +1,177 @@
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bot.metrics import DB_QUERY_SECONDS, timed
+from bot.tracing import traced
+from .engine import Error, connect
+
+
+ADD_PENDING_NOTIFICATION_QUERY = """
+    INSERT INTO pending_notifications (user_id, message)
+    VALUES (%s, %s)
+"""
+
+FIND_DUE_DIGEST_USERS_QUERY = """
+    SELECT u.id FROM users u
+    WHERE (
+        (u.delivery_mode = 'hourly' AND (u.last_digest_at IS NULL OR u.last_digest_at <= %s))
+        OR (u.delivery_mode = 'daily' AND (u.last_digest_at IS NULL OR u.last_digest_at <= %s))
+    )
+    AND u.is_active
+    AND EXISTS (SELECT 1 FROM pending_notifications p WHERE p.user_id = u.id)
+"""
+
+FIND_PENDING_NOTIFICATIONS_QUERY = """
+    SELECT id, message FROM pending_notifications
+    WHERE user_id = %s
+    ORDER BY id
+"""
+
+REMOVE_PENDING_NOTIFICATIONS_QUERY = """
+    DELETE FROM pending_notifications
+    WHERE user_id = %s AND id <= %s
+"""
+
+SET_LAST_DIGEST_TIME_QUERY = """
+    UPDATE users SET last_digest_at = %s WHERE id = %s
+"""
+
+ADD_TO_OUTBOX_QUERY = """
+    INSERT INTO notification_outbox (user_id, message, trace_id)
+    VALUES (%s, %s, %s)
+"""
+
+FIND_OUTBOX_QUERY = """
+    SELECT id, user_id, message, trace_id FROM notification_outbox
+    ORDER BY id
+    LIMIT %s
+"""
+
+REMOVE_FROM_OUTBOX_QUERY = """
+    DELETE FROM notification_outbox WHERE id IN ({})
+"""
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def add_pending(notifications: List[Tuple[int, str]]) -> bool:
+    """Stores (user_id, message) pairs until user's next digest."""
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    ADD_PENDING_NOTIFICATION_QUERY, notifications
+                )
+                connection.commit()
+                return True
+    except Error as e:
+        logging.exception(f'Failed to add pending notifications: {e}')
+        return False
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def find_due_digest_users(hourly_before: datetime, daily_before: datetime) -> List[int]:
+    """
+    Returns ids of users with pending notifications whose
+    last digest was sent before given time of their delivery mode.
+    """
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    FIND_DUE_DIGEST_USERS_QUERY, (hourly_before, daily_before)
+                )
+                return [row[0] for row in cursor.fetchall()]
+    except Error as e:
+        logging.exception(f'Failed to find users with due digests: {e}')
+        return []
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def find_pending(user_id: int) -> List[Tuple[int, str]]:
+    """Returns (id, message) of user's pending notifications."""
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(FIND_PENDING_NOTIFICATIONS_QUERY, (user_id,))
+                return cursor.fetchall()
+    except Error as e:
+        logging.exception(
+            f'Failed to find pending notifications of user {user_id}: {e}'
+        )
+        return []
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def complete_digest(user_id: int, last_notification_id: int, sent_at: Optional[datetime]) -> bool:
+    """
+    Removes pending notifications included in sent digest and
+    remembers when it was sent, if sent_at is set.
+    """
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    REMOVE_PENDING_NOTIFICATIONS_QUERY,
+                    (user_id, last_notification_id)
+                )
+                if sent_at is not None:
+                    cursor.execute(SET_LAST_DIGEST_TIME_QUERY, (sent_at, user_id))
+                connection.commit()
+                return True
+    except Error as e:
+        logging.exception(
+            f'Failed to complete digest of user {user_id}: {e}'
+        )
+        return False
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def add_to_outbox(notifications: List[Tuple[int, str, str]]) -> bool:
+    """Stores (user_id, message, trace_id) until bot process sends them."""
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.executemany(ADD_TO_OUTBOX_QUERY, notifications)
+                connection.commit()
+                return True
+    except Error as e:
+        logging.exception(f'Failed to add notifications to outbox: {e}')
+        return False
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def find_outbox(limit: int) -> List[Tuple[int, int, str, str]]:
+    """Returns (id, user_id, message, trace_id) of the oldest notifications in outbox."""
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(FIND_OUTBOX_QUERY, (limit,))
+                return cursor.fetchall()
+    except Error as e:
+        logging.exception(f'Failed to find notifications in outbox: {e}')
+        return []
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def remove_from_outbox(ids: List[int]) -> bool:
+    if not ids:
+        return True
+
+    query = REMOVE_FROM_OUTBOX_QUERY.format(', '.join(['%s'] * len(ids)))
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, ids)
+                connection.commit()
+                return True
+    except Error as e:
+        logging.exception(f'Failed to remove notifications from outbox: {e}')
+        return False
@@ -1,18 +1,28 @@
 import logging
-from typing import Dict, List, Tuple, Union
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple, Union
 
-from mysql.connector import connect, Error, errorcode
-
-from bot.entities import Product, ProductOption
+from bot.entities import AlertRule, OptionHistoryPoint, Product, ProductOption
 from bot.exceptions import DataAlreadyExistsInDBError
-from bot.utils.util import group_product_options_by_ids, to_products
-from .config import db_config
+from bot.metrics import DB_QUERY_SECONDS, timed
+from bot.tracing import traced
+from bot.utils.util import (
+    get_option_history_rows,
+    group_product_options_by_ids,
+    to_product,
+    to_products
+)
+from .engine import MYSQL, SQLITE, Error, connect, dialect, is_duplicate_entry
+
 
+HISTORY_START = datetime(2022, 1, 1)
 
 ADD_PRODUCT_QUERY = """
     INSERT INTO products 
-    (brand, description_, img, title, product_type, rating, reviews, url)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    (brand, description_, img, title, product_type, rating, reviews, url,
+     options_fingerprint)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
 """
 
 ADD_PRODUCT_OPTION_QUERY = """
@@ -26,8 +36,71 @@ LINK_PRODUCT_WITH_USER_QUERY = """
     VALUES (%s, %s)
 """
 
+# Watchers are active users, subscriptions of inactive ones are suspended
+CHANGE_WATCHER_COUNT_QUERY = """
+    UPDATE products
+    SET watcher_count = watcher_count + %s
+    WHERE id = %s
+    AND EXISTS (SELECT 1 FROM users WHERE id = %s AND is_active)
+"""
+
+# SQLite has no DELETE ... LIMIT, MySQL has no LIMIT in IN subquery
+# Watchers of inactive users aren't counted, but their subscriptions
+# are kept, so products linked with them aren't removed
+REMOVE_ORPHANED_PRODUCTS_QUERY = {
+    MYSQL: """
+        DELETE FROM products
+        WHERE watcher_count = 0 AND created_at < %s AND NOT EXISTS (
+            SELECT 1 FROM monitoring_list WHERE product_id = products.id
+        )
+        LIMIT %s
+    """,
+    SQLITE: """
+        DELETE FROM products
+        WHERE id IN (
+            SELECT id FROM products
+            WHERE watcher_count = 0 AND created_at < %s AND NOT EXISTS (
+                SELECT 1 FROM monitoring_list WHERE product_id = products.id
+            )
+            LIMIT %s
+        )
+    """
+}
+
 FIND_PRODUCT_BY_URL_QUERY = """
-    SELECT * FROM products WHERE url = %s
+    SELECT id, brand, description_, img, title, product_type,
+           rating, reviews, url, options_fingerprint
+    FROM products WHERE url = %s
+"""
+
+FIND_PRODUCT_ID_BY_URL_QUERY = """
+    SELECT id FROM products WHERE url = %s
+"""
+
+FIND_PRODUCT_IDS_BY_URLS_QUERY = """
+    SELECT url, id FROM products WHERE url IN ({})
+"""
+
+FIND_LINKED_PRODUCT_IDS_QUERY = """
+    SELECT product_id FROM monitoring_list
+    WHERE user_id = %s AND product_id IN ({})
+"""
+
+INCREASE_WATCHER_COUNTS_QUERY = """
+    UPDATE products
+    SET watcher_count = watcher_count + 1
+    WHERE id IN ({})
+    AND EXISTS (SELECT 1 FROM users WHERE id = %s AND is_active)
+"""
+
+FIND_IMG_FILE_IDS_QUERY = """
+    SELECT id, img_file_id FROM products
+    WHERE id IN ({}) AND img_file_id IS NOT NULL
+"""
+
+SET_IMG_FILE_ID_QUERY = """
+    UPDATE products SET img_file_id = %s
+    WHERE id = %s AND img = %s
 """
 
 FIND_PRODUCT_OPTIONS_BY_ID_QUERY = """
@@ -43,10 +116,23 @@ FIND_PRODUCT_OPTIONS_BY_IDS_QUERY = """
     ORDER BY product_id
 """
 
+# Description is the heaviest column and is needed by Info only, so
+# product lists select NULL in its place unless it's asked for
+DESCRIPTION_COLUMN = 'description_'
+NO_DESCRIPTION_COLUMN = 'NULL'
+
+FIND_DESCRIPTIONS_QUERY = """
+    SELECT id, description_ FROM products
+    WHERE id IN ({})
+"""
+
 FIND_FAVOURITE_PRODUCTS_QUERY = """
-    SELECT p.* FROM monitoring_list m
+    SELECT p.id, p.brand, {description}, p.img, p.title, p.product_type,
+           p.rating, p.reviews, p.url, p.options_fingerprint
+    FROM monitoring_list m
     JOIN products p ON m.product_id = p.id
     WHERE m.user_id = %s
+    ORDER BY p.id
 """
 
 REMOVE_PRODUCT_BY_ID_QUERY = """
@@ -61,102 +147,371 @@ UNLINK_PRODUCTS_WITH_USER_QUERY = """
 """
 
 GET_ALL_PRODUCTS_QUERY = """
-    SELECT * FROM products
+    SELECT id, brand, {description}, img, title, product_type,
+           rating, reviews, url, options_fingerprint
+    FROM products
+    WHERE watcher_count > 0
     ORDER BY id
 """
 
 GET_ALL_PRODUCTS_WITH_OPTIONS_QUERY = """
-    SELECT p.*, po.id, po.availability, po.title, po.price
+    SELECT p.id, p.brand, {description}, p.img, p.title, p.product_type,
+           p.rating, p.reviews, p.url, p.options_fingerprint,
+           po.id, po.availability, po.title, po.price
     FROM products AS p
     JOIN product_options AS po ON p.id = po.product_id
+    WHERE p.watcher_count > 0
     ORDER BY p.id, po.id
 """
 
-GET_ALL_FROM_MONITORING_LIST_QUERY = """
-    SELECT * FROM monitoring_list
+# Keyset page of watched products, only products with options are
+# selected, so page is shorter than limit at the end of table only
+GET_PRODUCTS_PAGE_QUERY = """
+    SELECT p.id, p.brand, {description}, p.img, p.title, p.product_type,
+           p.rating, p.reviews, p.url, p.options_fingerprint,
+           po.id, po.availability, po.title, po.price
+    FROM (
+        SELECT * FROM products
+        WHERE watcher_count > 0
+        AND id > %s
+        AND EXISTS (SELECT 1 FROM product_options WHERE product_id = products.id)
+        ORDER BY id
+        LIMIT %s
+    ) AS p
+    JOIN product_options AS po ON p.id = po.product_id
+    ORDER BY p.id, po.id
 """
 
-UPDATE_PRODUCT_QUERY = """
-    INSERT INTO products
-        (id, brand, description_, img, title, product_type, rating, reviews, url)
-    VALUES 
-        (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-        brand = VALUES(brand),
-        description_ = VALUES(description_),
-        img = VALUES(img),
-        title = VALUES(title),
-        product_type = VALUES(product_type),
-        rating = VALUES(rating),
-        reviews = VALUES(reviews),
-        url = VALUES(url)
+FIND_CHANGED_PRODUCT_IDS_QUERY = """
+    SELECT id FROM products
+    WHERE options_changed_at >= %s
+    ORDER BY options_changed_at
 """
 
-UPDATE_PRODUCT_OPTIONS_QUERY = """
-    INSERT INTO product_options
-        (id, availability, title, price, product_id)
-    VALUES
-        (%s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-        availability = VALUES(availability),
-        title = VALUES(title),
-        price = VALUES(price)
+FIND_MONITORING_ROWS_QUERY = """
+    SELECT m.user_id, m.product_id, m.alert_type, m.threshold
+    FROM monitoring_list AS m
+    JOIN users AS u ON m.user_id = u.id
+    WHERE u.is_active
+    AND m.product_id IN ({})
 """
 
+SET_ALERT_RULE_QUERY = """
+    UPDATE monitoring_list
+    SET alert_type = %s, threshold = %s
+    WHERE user_id = %s AND product_id = %s
+"""
+
+UPDATE_PRODUCT_QUERY = {
+    MYSQL: """
+        INSERT INTO products
+            (id, brand, description_, img, title, product_type, rating, reviews, url,
+             options_fingerprint)
+        VALUES
+            (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            brand = VALUES(brand),
+            description_ = VALUES(description_),
+            -- Uploaded photo is outdated if image changed, must precede img update
+            img_file_id = IF(img <=> VALUES(img), img_file_id, NULL),
+            img = VALUES(img),
+            title = VALUES(title),
+            product_type = VALUES(product_type),
+            rating = VALUES(rating),
+            reviews = VALUES(reviews),
+            url = VALUES(url),
+            -- Must precede options_fingerprint update
+            options_changed_at = IF(
+                options_fingerprint <=> VALUES(options_fingerprint),
+                options_changed_at, NOW()
+            ),
+            options_fingerprint = VALUES(options_fingerprint)
+    """,
+    # Unlike MySQL, all assignments see old values of the row
+    SQLITE: """
+        INSERT INTO products
+            (id, brand, description_, img, title, product_type, rating, reviews, url,
+             options_fingerprint)
+        VALUES
+            (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (id) DO UPDATE SET
+            brand = excluded.brand,
+            description_ = excluded.description_,
+            img_file_id = CASE WHEN img IS excluded.img THEN img_file_id END,
+            img = excluded.img,
+            title = excluded.title,
+            product_type = excluded.product_type,
+            rating = excluded.rating,
+            reviews = excluded.reviews,
+            url = excluded.url,
+            options_changed_at = CASE
+                WHEN options_fingerprint IS excluded.options_fingerprint
+                THEN options_changed_at
+                ELSE datetime('now', 'localtime')
+            END,
+            options_fingerprint = excluded.options_fingerprint
+    """
+}
+
+UPDATE_PRODUCT_OPTIONS_QUERY = {
+    MYSQL: """
+        INSERT INTO product_options
+            (id, availability, title, price, product_id)
+        VALUES
+            (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            availability = VALUES(availability),
+            title = VALUES(title),
+            price = VALUES(price)
+    """,
+    SQLITE: """
+        INSERT INTO product_options
+            (id, availability, title, price, product_id)
+        VALUES
+            (%s, %s, %s, %s, %s)
+        ON CONFLICT (id) DO UPDATE SET
+            availability = excluded.availability,
+            title = excluded.title,
+            price = excluded.price
+    """
+}
+
 REMOVE_PRODUCT_OPTIONS_QUERY = """
     DELETE FROM product_options
     WHERE id = %s
 """
 
+ADD_OPTION_HISTORY_QUERY = {
+    MYSQL: """
+        INSERT INTO option_history
+            (product_id, option_id, recorded_at, price_cents, availability_code)
+        VALUES
+            (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            price_cents = VALUES(price_cents),
+            availability_code = VALUES(availability_code)
+    """,
+    SQLITE: """
+        INSERT INTO option_history
+            (product_id, option_id, recorded_at, price_cents, availability_code)
+        VALUES
+            (%s, %s, %s, %s, %s)
+        ON CONFLICT (product_id, option_id, recorded_at) DO UPDATE SET
+            price_cents = excluded.price_cents,
+            availability_code = excluded.availability_code
+    """
+}
+
+# Option history of SQLite is compacted by bot like by events.sql in MySQL,
+# which can't select from table it deletes from
+DOWNSAMPLE_OPTION_HISTORY_QUERY = """
+    DELETE FROM option_history
+    WHERE recorded_at < %s
+    AND recorded_at < (
+        SELECT MAX(h.recorded_at) FROM option_history AS h
+        WHERE h.product_id = option_history.product_id
+        AND h.option_id = option_history.option_id
+        AND DATE(h.recorded_at) = DATE(option_history.recorded_at)
+    )
+"""
+
+REMOVE_EXPIRED_OPTION_HISTORY_QUERY = """
+    DELETE FROM option_history WHERE recorded_at < %s
+"""
+
+GET_PRICE_SERIES_QUERY = """
+    SELECT option_id, recorded_at, price_cents, availability_code
+    FROM option_history
+    WHERE product_id = %s AND recorded_at >= %s
+    ORDER BY option_id, recorded_at
+"""
 
+
+@traced()
+@timed(DB_QUERY_SECONDS)
 def add(user_id: int, product: Product) -> bool:
     """
     Inserts product and product options to appropriate tables
     and add product to user's monitoring list.
     """
+    product_id = insert_or_get(product)
+    if product_id is None:
+        return False
+
+    add_to_monitoring_list(user_id, product_id)
+    return True
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def insert_or_get(product: Product) -> Union[int, None]:
+    """
+    Inserts product with its options and returns id of inserted product.
+    If product with the same url already exists (e.g. it was inserted
+    by concurrent request), returns id of existing product instead.
+    """
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(
-                    ADD_PRODUCT_QUERY, product.to_storage_structure()
-                )
-                product_id = cursor.lastrowid
-                cursor.executemany(
-                    ADD_PRODUCT_OPTION_QUERY,
-                    product.options_to_storage_structure(product_id)
-                )
+                product_id = _insert_or_get(cursor, product)
                 connection.commit()
-        add_to_monitoring_list(user_id, product_id)
-        return True
+                return product_id
     except Error as e:
         logging.exception(f'Failed to add product: {e}')
-        return False
+        return None
 
 
+@traced()
+@timed(DB_QUERY_SECONDS)
+def insert_many(products: List[Product]) -> Dict[str, int]:
+    """
+    Inserts products like insert_or_get in one transaction
+    and returns ids of inserted or existing products by urls.
+    """
+    if not products:
+        return {}
+
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                product_ids = {
+                    product.url: _insert_or_get(cursor, product)
+                    for product in products
+                }
+                connection.commit()
+                return product_ids
+    except Error as e:
+        logging.exception(f'Failed to add {len(products)} products: {e}')
+        return {}
+
+
+def _insert_or_get(cursor, product: Product) -> int:
+    try:
+        cursor.execute(ADD_PRODUCT_QUERY, product.to_storage_structure())
+    except Error as e:
+        if not is_duplicate_entry(e):
+            raise
+        # Unique index on url makes a concurrent insert fail,
+        # so the row that won the race is returned
+        cursor.execute(FIND_PRODUCT_ID_BY_URL_QUERY, (product.url,))
+        return cursor.fetchone()[0]
+
+    product_id = cursor.lastrowid
+    saved = _insert_new_options(cursor, product._replace(id=product_id))
+    # Starting points of options price and availability history
+    cursor.executemany(
+        ADD_OPTION_HISTORY_QUERY[dialect()],
+        get_option_history_rows(
+            saved._replace(product_options=[]), saved, datetime.now()
+        )
+    )
+    return product_id
+
+
+def _insert_new_options(cursor, product: Product) -> Product:
+    """Inserts options without id and returns product with their ids."""
+    product_options = []
+    for option in product.product_options:
+        if option.id is None:
+            cursor.execute(ADD_PRODUCT_OPTION_QUERY, (*option.to_tuple(), product.id))
+            option = option._replace(id=cursor.lastrowid)
+        product_options.append(option)
+    return product._replace(product_options=product_options)
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
 def add_to_monitoring_list(user_id: int, product_id: int) -> bool:
     """
     Creates connection between user and product in monitoring_list
     by user_id and product_id.
     """
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
                 cursor.execute(
                     LINK_PRODUCT_WITH_USER_QUERY, (user_id, product_id)
                 )
+                cursor.execute(
+                    CHANGE_WATCHER_COUNT_QUERY, (1, product_id, user_id)
+                )
                 connection.commit()
                 return True
     except Error as e:
-        if e.errno == errorcode.ER_DUP_ENTRY:
+        if is_duplicate_entry(e):
             raise DataAlreadyExistsInDBError from e
         logging.exception(f'Failed to add product to monitoring list: {e}')
         return False
 
 
+@traced()
+@timed(DB_QUERY_SECONDS)
+def add_many_to_monitoring_list(user_id: int, product_ids: List[int]) -> Union[int, None]:
+    """
+    Adds products to user's monitoring list skipping already added ones.
+    Returns number of added products or None on failure.
+    """
+    if not product_ids:
+        return 0
+
+    placeholders = ', '.join(['%s' for _ in range(len(product_ids))])
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    FIND_LINKED_PRODUCT_IDS_QUERY.format(placeholders),
+                    (user_id, *product_ids)
+                )
+                linked_ids = {id for id, in cursor.fetchall()}
+                new_ids = [id for id in product_ids if id not in linked_ids]
+                if not new_ids:
+                    return 0
+
+                cursor.executemany(
+                    LINK_PRODUCT_WITH_USER_QUERY,
+                    [(user_id, id) for id in new_ids]
+                )
+                cursor.execute(
+                    INCREASE_WATCHER_COUNTS_QUERY.format(
+                        ', '.join(['%s' for _ in range(len(new_ids))])
+                    ),
+                    (*new_ids, user_id)
+                )
+                connection.commit()
+                return len(new_ids)
+    except Error as e:
+        logging.exception(
+            f'Failed to add products {product_ids} to monitoring list: {e}'
+        )
+        return None
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def find_ids_by_urls(urls: List[str]) -> Dict[str, int]:
+    """Returns ids of existing products by urls."""
+    if not urls:
+        return {}
+
+    query = FIND_PRODUCT_IDS_BY_URLS_QUERY.format(
+        ', '.join(['%s' for _ in range(len(urls))])
+    )
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, urls)
+                return dict(cursor.fetchall())
+    except Error as e:
+        logging.exception(f'Failed to find products by {len(urls)} urls: {e}')
+        return {}
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
 def find_by_url(url: str, with_product_options: bool = False) -> Union[Product, None]:
     """Finds first product by given url."""
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
                 cursor.execute(FIND_PRODUCT_BY_URL_QUERY, (url,))
                 data = cursor.fetchone()
@@ -169,16 +524,18 @@ def find_by_url(url: str, with_product_options: bool = False) -> Union[Product,
                     # todo consider raising error if product have no options
                     product_options = find_options_by_id(data[0])
 
-                return Product._make((*data, product_options))
+                return to_product(data, product_options)
     except Error as e:
         logging.exception(f'Failed to find product by url={url}: {e}')
         return None
 
 
+@traced()
+@timed(DB_QUERY_SECONDS)
 def find_options_by_id(product_id: int) -> List[ProductOption]:
     """Finds product options by product_id."""
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
                 cursor.execute(
                     FIND_PRODUCT_OPTIONS_BY_ID_QUERY, (product_id,)
@@ -186,7 +543,7 @@ def find_options_by_id(product_id: int) -> List[ProductOption]:
                 data = cursor.fetchall()
                 if not data:
                     return []
-                return [ProductOption._make(item) for item in data]
+                return [ProductOption.from_storage_structure(item) for item in data]
     except Error as e:
         logging.exception(
             f'Failed to find product options by id={product_id}: {e}'
@@ -194,6 +551,8 @@ def find_options_by_id(product_id: int) -> List[ProductOption]:
         return []
 
 
+@traced()
+@timed(DB_QUERY_SECONDS)
 def find_options_by_ids(product_ids: List[int]) -> Dict[int, List[ProductOption]]:
     """Finds product options within product_ids list."""
     if not product_ids:
@@ -204,7 +563,7 @@ def find_options_by_ids(product_ids: List[int]) -> Dict[int, List[ProductOption]
     )
 
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
                 cursor.execute(query, product_ids)
                 data = cursor.fetchall()
@@ -218,25 +577,102 @@ def find_options_by_ids(product_ids: List[int]) -> Dict[int, List[ProductOption]
         return {}
 
 
-def find_all_from_monitoring_list(user_id: int) -> List[Product]:
-    """Finds products from user's monitoring list."""
+@traced()
+@timed(DB_QUERY_SECONDS)
+def find_img_file_ids(product_ids: List[int]) -> Dict[int, str]:
+    """
+    Returns Telegram file ids of uploaded product images
+    by product ids for products that have them.
+    """
+    if not product_ids:
+        return {}
+
+    query = FIND_IMG_FILE_IDS_QUERY.format(
+        ', '.join(['%s' for _ in range(len(product_ids))])
+    )
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(FIND_FAVOURITE_PRODUCTS_QUERY, (user_id,))
+                cursor.execute(query, product_ids)
+                return dict(cursor.fetchall())
+    except Error as e:
+        logging.exception(
+            f'Failed to find image file ids of products {product_ids}: {e}'
+        )
+        return {}
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def set_img_file_id(product_id: int, img: str, file_id: Optional[str]) -> bool:
+    """
+    Saves Telegram file id of uploaded product image,
+    if product's image is still the same.
+    """
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(SET_IMG_FILE_ID_QUERY, (file_id, product_id, img))
+                connection.commit()
+                return True
+    except Error as e:
+        logging.exception(
+            f'Failed to set image file id of product {product_id}: {e}'
+        )
+        return False
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def find_descriptions(product_ids: List[int]) -> Dict[int, str]:
+    """Returns descriptions of products by product ids."""
+    if not product_ids:
+        return {}
+
+    query = FIND_DESCRIPTIONS_QUERY.format(
+        ', '.join(['%s' for _ in range(len(product_ids))])
+    )
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, product_ids)
+                return dict(cursor.fetchall())
+    except Error as e:
+        logging.exception(
+            f'Failed to find descriptions of products {product_ids}: {e}'
+        )
+        return {}
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def find_all_from_monitoring_list(user_id: int, with_description: bool = False) -> List[Product]:
+    """
+    Finds products from user's monitoring list. Description
+    of products is None, unless with_description is set.
+    """
+    query = FIND_FAVOURITE_PRODUCTS_QUERY.format(
+        description=_description_column(with_description, 'p.')
+    )
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, (user_id,))
                 data = cursor.fetchall()
                 if not data:
                     return []
-                return [Product._make((*item, None)) for item in data]
+                return [to_product(item, None) for item in data]
     except Error as e:
         logging.exception(f'Failed to find favourite products: {e}')
         return []
 
 
+@traced()
+@timed(DB_QUERY_SECONDS)
 def remove_by_ids(product_ids: List[int]) -> bool:
     """Removes products with given ids."""
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
                 cursor.executemany(
                     REMOVE_PRODUCT_BY_ID_QUERY, [(id,) for id in product_ids]
@@ -250,15 +686,21 @@ def remove_by_ids(product_ids: List[int]) -> bool:
         return False
 
 
+@traced()
+@timed(DB_QUERY_SECONDS)
 def remove_from_monitoring_list_by_ids(user_id: int, product_ids: List[int]) -> bool:
     """Removes products from user's monitoring list."""
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
-                cursor.executemany(
-                    UNLINK_PRODUCTS_WITH_USER_QUERY,
-                    [(user_id, id) for id in product_ids]
-                )
+                for id in product_ids:
+                    cursor.execute(
+                        UNLINK_PRODUCTS_WITH_USER_QUERY, (user_id, id)
+                    )
+                    if cursor.rowcount:
+                        cursor.execute(
+                            CHANGE_WATCHER_COUNT_QUERY, (-1, id, user_id)
+                        )
                 connection.commit()
                 return True
     except Error as e:
@@ -269,51 +711,147 @@ def remove_from_monitoring_list_by_ids(user_id: int, product_ids: List[int]) ->
         return False
 
 
-def get_all_products(with_options: bool = True) -> List[Product]:
-    """Returns all products from products table."""
+@traced()
+@timed(DB_QUERY_SECONDS)
+def get_all_products(with_options: bool = True, with_description: bool = False) -> List[Product]:
+    """
+    Returns all products watched by at least one active user.
+    Description of products is None, unless with_description is set.
+    """
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
                 if with_options:
-                    cursor.execute(GET_ALL_PRODUCTS_WITH_OPTIONS_QUERY)
+                    cursor.execute(GET_ALL_PRODUCTS_WITH_OPTIONS_QUERY.format(
+                        description=_description_column(with_description, 'p.')
+                    ))
                     data = cursor.fetchall()
                     return to_products(data)
 
-                cursor.execute(GET_ALL_PRODUCTS_QUERY)
+                cursor.execute(GET_ALL_PRODUCTS_QUERY.format(
+                    description=_description_column(with_description)
+                ))
                 data = cursor.fetchall()
-                return [Product._make(*item, None) for item in data]
+                return [to_product(item, None) for item in data]
     except Error as e:
         logging.exception(f'Failed to get all products: {e}')
         return []
 
 
-def get_all_from_monitoring_list() -> List[Tuple]:
-    """Returns all rows from monitoring_list table."""
+@traced()
+@timed(DB_QUERY_SECONDS)
+def get_products_page(after_id: int, limit: int, with_description: bool = False) -> List[Product]:
+    """
+    Returns up to limit products watched by at least one active user
+    with ids greater than after_id, ordered by id.
+    """
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(GET_PRODUCTS_PAGE_QUERY.format(
+                    description=_description_column(with_description, 'p.')
+                ), (after_id, limit))
+                data = cursor.fetchall()
+                return sorted(to_products(data), key=lambda p: p.id)
+    except Error as e:
+        logging.exception(f'Failed to get products after id={after_id}: {e}')
+        return []
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def find_changed_product_ids(since: datetime) -> List[int]:
+    """Returns ids of products which options changed since given time."""
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(FIND_CHANGED_PRODUCT_IDS_QUERY, (since,))
+                return [id for id, in cursor.fetchall()]
+    except Error as e:
+        logging.exception(f'Failed to find products changed since {since}: {e}')
+        return []
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def find_monitoring_rows(product_ids: List[int]) -> List[Tuple]:
+    """
+    Returns rows of active users from monitoring_list table for
+    given products as (user_id, product_id, alert_type, threshold).
+    """
+    if not product_ids:
+        return []
+
+    query = FIND_MONITORING_ROWS_QUERY.format(
+        ', '.join(['%s' for _ in range(len(product_ids))])
+    )
+
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(GET_ALL_FROM_MONITORING_LIST_QUERY)
+                cursor.execute(query, product_ids)
                 return cursor.fetchall()
     except Error as e:
-        logging.exception(f'Failed to get all from monitoring list: {e}')
+        logging.exception(
+            f'Failed to find monitoring list rows of products with ids={product_ids}: {e}'
+        )
         return []
 
 
-def update_products(products: List[Product]) -> bool:
-    """Updates old products values with given products values."""
-    products_data = [(*p,)[:-1] for p in products]
+@traced()
+@timed(DB_QUERY_SECONDS)
+def set_alert_rule(rule: AlertRule) -> bool:
+    """Sets alert rule of product in user's monitoring list."""
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(SET_ALERT_RULE_QUERY, (
+                    rule.alert_type, rule.threshold,
+                    rule.user_id, rule.product_id
+                ))
+                connection.commit()
+                return cursor.rowcount > 0
+    except Error as e:
+        logging.exception(f'Failed to set alert rule {rule}: {e}')
+        return False
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def update_products(products: List[Product], old_products: Dict[int, Product] = None) -> bool:
+    """
+    Updates old products values with given products values. Options
+    whose price or availability differs from options of old product
+    with the same id are appended to history in the same transaction.
+    """
+    old_products = old_products or {}
+    products_data = [(p.id, *p.to_storage_structure()) for p in products]
     product_options_data = [
-        (*opt, p.id) for p in products for opt in p.product_options
+        (*opt.to_tuple(with_id=True), p.id)
+        for p in products for opt in p.product_options if opt.id is not None
     ]
+    recorded_at = datetime.now()
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
                 cursor.executemany(
-                    UPDATE_PRODUCT_QUERY, products_data
+                    UPDATE_PRODUCT_QUERY[dialect()], products_data
                 )
                 cursor.executemany(
-                    UPDATE_PRODUCT_OPTIONS_QUERY, product_options_data
+                    UPDATE_PRODUCT_OPTIONS_QUERY[dialect()], product_options_data
                 )
+
+                # History references options by ids, so new ones are inserted first
+                history_rows = []
+                for product in products:
+                    saved = _insert_new_options(cursor, product)
+                    old = old_products.get(product.id)
+                    if old is not None:
+                        history_rows.extend(
+                            get_option_history_rows(old, saved, recorded_at)
+                        )
+                if history_rows:
+                    cursor.executemany(ADD_OPTION_HISTORY_QUERY[dialect()], history_rows)
                 connection.commit()
                 return True
     except Error as e:
@@ -321,10 +859,12 @@ def update_products(products: List[Product]) -> bool:
         return False
 
 
+@traced()
+@timed(DB_QUERY_SECONDS)
 def remove_product_options_by_id(ids: List[int]) -> bool:
     """Removes all product options whose id in given ids list."""
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
                 cursor.executemany(
                     REMOVE_PRODUCT_OPTIONS_QUERY,
@@ -337,3 +877,77 @@ def remove_product_options_by_id(ids: List[int]) -> bool:
             f'Failed to remove product options by ids={ids}: {e}'
         )
         return False
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def get_price_series(product_id: int, since: datetime = None) -> Dict[int, List[OptionHistoryPoint]]:
+    """
+    Returns price and availability changes of product's options
+    since given time (whole history by default) grouped by option id.
+    """
+    since = since or HISTORY_START
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(GET_PRICE_SERIES_QUERY, (product_id, since))
+                series = {}
+                for option_id, recorded_at, price_cents, code in cursor:
+                    series.setdefault(option_id, []).append(OptionHistoryPoint(
+                        option_id, recorded_at,
+                        Decimal(price_cents) / 100, code
+                    ))
+                return series
+    except Error as e:
+        logging.exception(
+            f'Failed to get price series of product id={product_id}: {e}'
+        )
+        return {}
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def remove_orphaned_products(created_before: datetime, limit: int) -> int:
+    """
+    Removes at most limit products created before given time, which
+    aren't in anyone's monitoring list, and returns number of removed products.
+    """
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    REMOVE_ORPHANED_PRODUCTS_QUERY[dialect()], (created_before, limit)
+                )
+                connection.commit()
+                return cursor.rowcount
+    except Error as e:
+        logging.exception(f'Failed to remove orphaned products: {e}')
+        return 0
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def compact_option_history(downsample_before: datetime, retention_start: datetime) -> int:
+    """
+    Keeps only the last change of each day of options changed before
+    downsample_before and removes changes before retention_start.
+    Returns number of removed rows.
+    """
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(REMOVE_EXPIRED_OPTION_HISTORY_QUERY, (retention_start,))
+                removed = cursor.rowcount
+                cursor.execute(DOWNSAMPLE_OPTION_HISTORY_QUERY, (downsample_before,))
+                removed += cursor.rowcount
+                connection.commit()
+                return removed
+    except Error as e:
+        logging.exception(f'Failed to compact option history: {e}')
+        return 0
+
+
+def _description_column(with_description: bool, prefix: str = '') -> str:
+    if with_description:
+        return prefix + DESCRIPTION_COLUMN
+    return NO_DESCRIPTION_COLUMN
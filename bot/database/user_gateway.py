@@ -1,10 +1,12 @@
 import logging
-
-from mysql.connector import connect, Error, errorcode
+from datetime import datetime
+from typing import Dict
 
 from bot.entities import User
 from bot.exceptions import DataAlreadyExistsInDBError, CantSaveToDBError
-from .config import db_config
+from bot.metrics import DB_QUERY_SECONDS, timed
+from bot.tracing import traced
+from .engine import Error, connect, is_duplicate_entry
 
 
 ADD_USER_QUERY = """
@@ -13,11 +15,40 @@ ADD_USER_QUERY = """
     VALUES (%s, %s, %s, %s)
 """
 
+SET_DELIVERY_MODE_QUERY = """
+    UPDATE users SET delivery_mode = %s WHERE id = %s
+"""
 
+FIND_DIGEST_USERS_QUERY = """
+    SELECT id, delivery_mode FROM users
+    WHERE delivery_mode <> 'instant' AND is_active
+"""
+
+DEACTIVATE_USER_QUERY = """
+    UPDATE users
+    SET is_active = FALSE, deactivation_reason = %s, deactivated_at = %s
+    WHERE id = %s AND is_active
+"""
+
+ACTIVATE_USER_QUERY = """
+    UPDATE users
+    SET is_active = TRUE, deactivation_reason = NULL, deactivated_at = NULL
+    WHERE id = %s AND NOT is_active
+"""
+
+CHANGE_USER_PRODUCTS_WATCHER_COUNT_QUERY = """
+    UPDATE products
+    SET watcher_count = watcher_count + %s
+    WHERE id IN (SELECT product_id FROM monitoring_list WHERE user_id = %s)
+"""
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
 def save(user: User) -> bool:
     """Save user to database"""
     try:
-        with connect(**db_config) as connection:
+        with connect() as connection:
             with connection.cursor() as cursor:
                 cursor.execute(ADD_USER_QUERY, (*user,))
                 connection.commit()
@@ -25,6 +56,86 @@ def save(user: User) -> bool:
     except Error as e:
         error = f'Failed to add user: {e}'
         logging.exception(error)
-        if e.errno == errorcode.ER_DUP_ENTRY:
+        if is_duplicate_entry(e):
             raise DataAlreadyExistsInDBError(error)
         raise CantSaveToDBError(error)
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def set_delivery_mode(user_id: int, delivery_mode: str) -> bool:
+    """Sets how user receives notifications: instantly or in digests."""
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    SET_DELIVERY_MODE_QUERY, (delivery_mode, user_id)
+                )
+                connection.commit()
+                return True
+    except Error as e:
+        logging.exception(
+            f'Failed to set delivery mode of user {user_id}: {e}'
+        )
+        return False
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def find_digest_users() -> Dict[int, str]:
+    """Returns delivery modes of users that receive digests by their ids."""
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(FIND_DIGEST_USERS_QUERY)
+                return dict(cursor.fetchall())
+    except Error as e:
+        logging.exception(f'Failed to find users receiving digests: {e}')
+        return {}
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def deactivate(user_id: int, reason: str) -> bool:
+    """
+    Marks user, who can't receive messages anymore, as inactive.
+    Subscriptions of inactive users are suspended.
+    """
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    DEACTIVATE_USER_QUERY, (reason, datetime.now(), user_id)
+                )
+                if cursor.rowcount:
+                    cursor.execute(
+                        CHANGE_USER_PRODUCTS_WATCHER_COUNT_QUERY, (-1, user_id)
+                    )
+                connection.commit()
+                return True
+    except Error as e:
+        logging.exception(f'Failed to deactivate user {user_id}: {e}')
+        return False
+
+
+@traced()
+@timed(DB_QUERY_SECONDS)
+def activate(user_id: int) -> bool:
+    """
+    Marks user as active again and resumes his subscriptions.
+    Returns True if user was inactive.
+    """
+    try:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(ACTIVATE_USER_QUERY, (user_id,))
+                activated = cursor.rowcount > 0
+                if activated:
+                    cursor.execute(
+                        CHANGE_USER_PRODUCTS_WATCHER_COUNT_QUERY, (1, user_id)
+                    )
+                connection.commit()
+                return activated
+    except Error as e:
+        logging.exception(f'Failed to activate user {user_id}: {e}')
+        return False
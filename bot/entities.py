@@ -1,10 +1,14 @@
 from __future__ import annotations
+from datetime import datetime
 from decimal import Decimal
 import logging
 from typing import NamedTuple, List, Tuple
 
 from aiogram import Bot, types
-from aiogram.utils.exceptions import BotBlocked
+from aiogram.utils.exceptions import BotBlocked, ChatNotFound, UserDeactivated
+
+from bot import tracing
+from bot.metrics import NOTIFICATIONS_SENT
 
 
 class User(NamedTuple):
@@ -14,10 +18,47 @@ class User(NamedTuple):
     last_name: str
 
 
+# How notifications are delivered to user, instantly or in digests
+DELIVERY_INSTANT = 'instant'
+DELIVERY_HOURLY = 'hourly'
+DELIVERY_DAILY = 'daily'
+DELIVERY_MODES = (DELIVERY_INSTANT, DELIVERY_HOURLY, DELIVERY_DAILY)
+
+
+class WarehouseStock(NamedTuple):
+    warehouse: str
+    # One of AVAILABILITY_* codes from bot.utils.util
+    code: int
+
+
+# Stock of warehouses in order they are shown on product page
+Availability = Tuple[WarehouseStock, ...]
+
+
+def pack_availability(availability: Availability) -> str:
+    """Packs availability to string like "JHB:3;CPT:2" to store it."""
+    return ';'.join(f'{stock.warehouse}:{stock.code}' for stock in availability)
+
+
+def unpack_availability(packed: str) -> Availability:
+    """
+    Unpacks availability packed by pack_availability, warehouses
+    sharing a code may be joined by comma, e.g. "JHB,CPT:3".
+    """
+    availability = []
+    for item in filter(None, packed.split(';')):
+        warehouses, _, code = item.rpartition(':')
+        availability.extend(
+            WarehouseStock(warehouse, int(code))
+            for warehouse in warehouses.split(',')
+        )
+    return tuple(availability)
+
+
 # todo consider using dataclass decorator instead of extending NamedTuple
 class ProductOption(NamedTuple):
     id: int
-    availability: str
+    availability: Availability
     title: str
     price: Decimal
 
@@ -42,18 +83,28 @@ class ProductOption(NamedTuple):
         )
 
     def to_tuple(self, with_id: bool = False) -> Tuple:
-        """Converts an object to tuple of it's values."""
+        """
+        Converts an object to tuple of it's values
+        that can be saved in storage.
+        """
         fields = self._fields
-        dict_ = self._asdict()
+        dict_ = {**self._asdict(), 'availability': pack_availability(self.availability)}
         if not with_id:
             fields = fields[1:]
         return tuple(dict_[f] for f in fields)
 
+    @classmethod
+    def from_storage_structure(cls, data: Tuple) -> ProductOption:
+        """Makes product option from (id, availability, title, price)."""
+        id, availability, title, price = data
+        return cls(id, unpack_availability(availability), title, price)
+
 
 # todo consider using dataclass decorator instead of extending NamedTuple
 class Product(NamedTuple):
     id: int
     brand: str
+    # None, if product was loaded without description
     description: str
     img: str
     title: str
@@ -62,10 +113,16 @@ class Product(NamedTuple):
     reviews: int
     url: str
     product_options: List[ProductOption]
+    # Hash of sorted options, see get_options_fingerprint
+    options_fingerprint: str = None
 
     def __eq__(self, other: Product) -> bool:
         return self.url == other.url
 
+    def __ne__(self, other: Product) -> bool:
+        # NamedTuple would compare all fields
+        return not self == other
+
     def update_with(self, other: Product) -> Product:
         """
         Returns new version of product updated with scraped product's data.
@@ -107,6 +164,10 @@ class Product(NamedTuple):
         Returns False, if old product options and
         new product options are equal. Otherwise return True.
         """
+        if self.options_fingerprint and other.options_fingerprint:
+            return self.options_fingerprint != other.options_fingerprint
+
+        # Fingerprint is unknown for products saved before it was added
         diff = set(self.product_options).difference(other.product_options)
         len_is_equal = len(self.product_options) != len(other.product_options)
         return bool(diff) or len_is_equal
@@ -116,9 +177,11 @@ class Product(NamedTuple):
         Converts product to structure
         that can be saved in storage.
         """
-        fields = self._fields
-        dict_ = self._asdict()
-        return tuple(dict_[f] for f in fields[1:-1])
+        return (
+            self.brand, self.description, self.img, self.title,
+            self.product_type, self.rating, self.reviews, self.url,
+            self.options_fingerprint
+        )
 
     def options_to_storage_structure(self, product_id: int) -> List[Tuple]:
         """
@@ -128,15 +191,38 @@ class Product(NamedTuple):
         return [(*opt.to_tuple(), product_id) for opt in self.product_options]
 
 
+class AlertRule(NamedTuple):
+    user_id: int
+    product_id: int
+    alert_type: str = 'any'
+    threshold: Decimal = None
+
+
+class OptionHistoryPoint(NamedTuple):
+    option_id: int
+    recorded_at: datetime
+    price: Decimal
+    availability_code: int
+
+
 class ProductDifference(NamedTuple):
     availability_changed: bool
     price_changed: bool
 
 
+# Errors after which messages can't be delivered until user's next /start
+UNREACHABLE_REASONS = {
+    BotBlocked: 'blocked',
+    UserDeactivated: 'deactivated',
+    ChatNotFound: 'chat_not_found'
+}
+
+
 class Notification(NamedTuple):
     receiver_id: int
     sender: Bot
     message: str
+    trace_id: str = None
 
     def __eq__(self, other: Notification) -> bool:
         return (
@@ -147,8 +233,16 @@ class Notification(NamedTuple):
     def __hash__(self) -> int:
         return hash(self.receiver_id) + hash(self.message)
 
-    async def send(self) -> None:
-        """Sends message from bot to user."""
+    async def send(self) -> bool:
+        """
+        Sends message from bot to user. Returns False if user can't
+        receive messages anymore and was deactivated.
+        """
+        with tracing.use_trace(self.trace_id):
+            return await self._send()
+
+    @tracing.traced('notification.send')
+    async def _send(self) -> bool:
         try:
             await self.sender.send_message(
                 self.receiver_id,
@@ -156,8 +250,19 @@ class Notification(NamedTuple):
                 parse_mode=types.ParseMode.HTML,
                 disable_web_page_preview=True
             )
-        except BotBlocked as e:
-            # todo consider doing something with users that blocked the bot
+        except (BotBlocked, UserDeactivated, ChatNotFound) as e:
+            reason = UNREACHABLE_REASONS[type(e)]
+            NOTIFICATIONS_SENT.labels(reason).inc()
             logging.error(
-                f'Bot was blocked by {self.receiver_id}: {e}'
+                f'User {self.receiver_id} is unreachable ({reason}): {e}'
             )
+            # Imported here as gateways depend on entities
+            from bot.database import user_gateway
+            user_gateway.deactivate(self.receiver_id, reason)
+            return False
+        except Exception:
+            NOTIFICATIONS_SENT.labels('failed').inc()
+            raise
+        else:
+            NOTIFICATIONS_SENT.labels('sent').inc()
+            return True
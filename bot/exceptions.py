@@ -20,4 +20,14 @@ class ServiceOperationFailedError(Exception):
 
 class ProductNotFoundError(Exception):
     """Exception that is raised when scraper can't find product on a website."""
-    pass
\ No newline at end of file
+    pass
+
+
+class RequestFailedError(Exception):
+    """Exception that is raised when website responds with unexpected status."""
+    pass
+
+
+class InvalidUserInputError(Exception):
+    """Exception that is raised when user's input cannot be parsed."""
+    pass
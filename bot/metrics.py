@@ -0,0 +1,130 @@
+import logging
+import os
+import time
+from functools import wraps
+from typing import Callable
+
+from aiohttp import web
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest
+)
+
+
+# Endpoint is served on loopback only and is disabled unless port is set
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+
+def timed(histogram: Histogram) -> Callable:
+    """
+    Decorator observing duration of function calls in histogram
+    labeled with module and function name, e.g. product_gateway.add.
+    """
+    def decorator(func: Callable) -> Callable:
+        module = func.__module__.rsplit('.', 1)[-1]
+        child = histogram.labels(f'{module}.{func.__name__}')
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        body=generate_latest(REGISTRY),
+        headers={'Content-Type': CONTENT_TYPE_LATEST}
+    )
+
+
+async def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> web.AppRunner:
+    """Starts aiohttp app serving /metrics endpoint."""
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f'Metrics are served on http://{host}:{port}/metrics')
+    return runner
+
+
+# Monitoring pipeline metrics
+
+SCRAPE_REQUEST_SECONDS = Histogram(
+    'scrape_request_seconds', 'Time of requesting product page.'
+)
+SCRAPE_PARSE_SECONDS = Histogram(
+    'scrape_parse_seconds', 'Time of parsing product page.'
+)
+SCRAPE_FAILURES = Counter(
+    'scrape_failures', 'Failed product scrapes by category.', ('category',)
+)
+SCRAPES_IN_FLIGHT = Gauge(
+    'scrapes_in_flight', 'Product pages being scraped by scrape pool.'
+)
+DB_QUERY_SECONDS = Histogram(
+    'db_query_seconds', 'Time of gateway function calls.', ('function',)
+)
+NOTIFICATIONS_QUEUED = Gauge(
+    'notifications_queued', 'Notifications waiting to be sent.'
+)
+NOTIFICATIONS_SENT = Counter(
+    'notifications_sent', 'Sent notifications by status.', ('status',)
+)
+PRODUCTS_MONITORED = Gauge(
+    'products_monitored', 'Products loaded in the last monitoring cycle.'
+)
+PRODUCTS_CHANGED = Counter(
+    'products_changed', 'Products whose options changed.'
+)
+PRODUCTS_UNAVAILABLE = Counter(
+    'products_unavailable', 'Products that disappeared from website.'
+)
+MONITORING_CYCLE_SECONDS = Gauge(
+    'monitoring_cycle_seconds', 'Duration of the last monitoring cycle.'
+)
+MONITORING_CYCLES = Counter(
+    'monitoring_cycles', 'Finished monitoring cycles.'
+)
+PIPELINE_QUEUE_DEPTH = Gauge(
+    'pipeline_queue_depth', 'Items waiting for monitoring pipeline stage.', ('stage',)
+)
+PIPELINE_STAGE_SECONDS = Histogram(
+    'pipeline_stage_seconds', 'Time of handling batch by monitoring pipeline stage.', ('stage',)
+)
+SCRAPE_CACHE_HITS = Counter('scrape_cache_hits', 'Scrape cache hits.')
+SCRAPE_CACHE_MISSES = Counter('scrape_cache_misses', 'Scrape cache misses.')
+SCRAPE_CACHE_EVICTIONS = Counter('scrape_cache_evictions', 'Scrape cache evictions.')
+SCRAPE_CACHE_BYTES = Gauge('scrape_cache_bytes', 'Estimated scrape cache size.')
+
+# Info flow metrics
+
+PHOTO_FILE_ID_LOOKUPS = Counter(
+    'photo_file_id_lookups', 'Lookups of uploaded photo file ids by result.', ('result',)
+)
+PHOTO_SEND_SECONDS = Histogram(
+    'photo_send_seconds', 'Time of sending product photos.', ('source',)
+)
+KEYBOARD_CACHE_LOOKUPS = Counter(
+    'keyboard_cache_lookups', 'Lookups of cached paging keyboards by result.', ('result',)
+)
+
+# Adding and import metrics
+
+IMPORTED_URLS = Counter(
+    'imported_urls', 'Urls processed by bulk import by result.', ('result',)
+)
+ADD_JOBS = Counter(
+    'add_jobs', 'Finished background add jobs by result.', ('result',)
+)
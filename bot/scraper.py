@@ -1,16 +1,21 @@
+from __future__ import annotations
+import importlib
 import logging
 import re
 from decimal import Decimal
-from typing import Dict, List
+from typing import TYPE_CHECKING, Callable, Dict, List
 
 import aiohttp
 import asyncio
-import chompjs
-import pandas as pd
-from bs4 import BeautifulSoup as BS
 
-from bot.entities import Product, ProductOption
-from bot.exceptions import ProductNotFoundError
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup as BS
+
+from bot import tracing
+from bot.entities import Availability, Product, ProductOption, WarehouseStock
+from bot.exceptions import ProductNotFoundError, RequestFailedError
+from bot.metrics import SCRAPE_PARSE_SECONDS, SCRAPE_REQUEST_SECONDS
+from bot.utils.util import get_options_fingerprint, stock_code
 
 
 HEADERS = {
@@ -48,6 +53,32 @@ REGEXPS = {
 }
 
 PARSER = 'lxml'
+# Parsing modules are imported on first scrape, so bot starts faster
+PARSING_MODULES = ('bs4', 'lxml.etree', 'chompjs', 'pandas')
+
+
+def _create_client_session() -> aiohttp.ClientSession:
+    return aiohttp.ClientSession(headers=HEADERS)
+
+
+# Replaced by recording or replaying sessions in performance tests
+session_factory: Callable[[], aiohttp.ClientSession] = _create_client_session
+
+
+def create_session() -> aiohttp.ClientSession:
+    """Returns new session for requests to website."""
+    return session_factory()
+
+
+def make_soup(html: str) -> BS:
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, PARSER)
+
+
+def warm_up() -> None:
+    """Imports parsing modules ahead of first scrape, e.g. in executor."""
+    for module in PARSING_MODULES:
+        importlib.import_module(module)
 
 
 class Scraper:
@@ -58,17 +89,22 @@ class Scraper:
     async def scrape_product(self) -> Product:
         """Scrape whole product data from page and return Product object."""
         if not self.__session:
-            async with aiohttp.ClientSession(headers=HEADERS) as session:
+            async with create_session() as session:
                 html = await self.get_html(session)
         else:
             html = await self.get_html(self.__session)
 
-        soup = BS(html, PARSER)
+        with SCRAPE_PARSE_SECONDS.time():
+            with tracing.span('parse.soup'):
+                soup = make_soup(html)
+
+            with tracing.span('parse.descriptive_data'):
+                main_data = self.get_descriptive_data(soup)
+            with tracing.span('parse.additional_info'):
+                additional_info = self.get_data_from_additional_info(soup)
+            with tracing.span('parse.product_options'):
+                product_options = self.get_product_options(soup)
 
-        main_data = self.get_descriptive_data(soup)
-        additional_info = self.get_data_from_additional_info(soup)
-        product_options = self.get_product_options(soup)
-        
         product = Product(
             id=None,
             brand=additional_info['brands'],
@@ -79,24 +115,25 @@ class Scraper:
             rating=main_data['rating'],
             reviews=main_data['reviews'],
             url=self.url,
-            product_options=product_options
+            product_options=product_options,
+            options_fingerprint=get_options_fingerprint(product_options)
         )
         logging.info('Scraped product %s', product)
         return product
 
     async def get_html(self, session: aiohttp.ClientSession) -> str:
         """Helper func for sending request and getting page's html."""
-        async with session.get(self.url) as response:
-            status = response.status
-            if status == STATUS_OK:
-                return await response.text()
-            elif status == STATUS_NOT_FOUND:
-                raise ProductNotFoundError(
-                    f'Product cannot be found on page {self.url}'
-                )
-            else:
-                raise Exception(f'Request failed: {response}')
-                
+        with SCRAPE_REQUEST_SECONDS.time(), tracing.span('scraper.get_html', url=self.url):
+            async with session.get(self.url) as response:
+                status = response.status
+                if status == STATUS_OK:
+                    return await response.text()
+                elif status == STATUS_NOT_FOUND:
+                    raise ProductNotFoundError(
+                        f'Product cannot be found on page {self.url}'
+                    )
+                else:
+                    raise RequestFailedError(f'Request failed: {response}')
 
     def get_descriptive_data(self, soup: BS) -> Dict[str, str]:
         """Scrape descriptive data on page."""
@@ -136,9 +173,11 @@ class Scraper:
         )[1]
         price_and_title_text = script_1.get_text()
         
-        current_product = chompjs.parse_js_object(re.search(
-            REGEXPS['current_product'], price_and_title_text
-        ).group())
+        import chompjs
+        with tracing.span('parse.chompjs'):
+            current_product = chompjs.parse_js_object(re.search(
+                REGEXPS['current_product'], price_and_title_text
+            ).group())
         
 
         price = current_product['price']
@@ -197,7 +236,9 @@ class Scraper:
         string_data = re.search(regexp, text)
         if not string_data:
             return None
-        return chompjs.parse_js_object(string_data.group())
+        import chompjs
+        with tracing.span('parse.chompjs'):
+            return chompjs.parse_js_object(string_data.group())
 
     @staticmethod
     def has_sale_sticker(soup: BS) -> bool:
@@ -206,26 +247,29 @@ class Scraper:
     @staticmethod
     def join_data(prices: List[Dict], options: List[Dict], availabilities: List[Dict], keys: List[str]) -> List[List]:
         """"Join 3 dicts together and convert result to List[List]."""
-        df1 = pd.DataFrame(prices)
-        df2 = pd.DataFrame(options)
-        df3 = pd.DataFrame(availabilities)
-
-        merged_data = pd.merge(
-            pd.merge(df1, df2, on='id'),
-            df3,
-            left_on='product_id', right_on='id'
-        )
-        result = merged_data[keys]
-        return result.values.tolist()
+        import pandas as pd
+        with tracing.span('parse.join_data'):
+            df1 = pd.DataFrame(prices)
+            df2 = pd.DataFrame(options)
+            df3 = pd.DataFrame(availabilities)
+
+            merged_data = pd.merge(
+                pd.merge(df1, df2, on='id'),
+                df3,
+                left_on='product_id', right_on='id'
+            )
+            result = merged_data[keys]
+            return result.values.tolist()
 
     @staticmethod
-    def parse_availability(availability_html: str) -> str:
-        """Scrape availability_html and pretify scraped data."""
-        soup = BS(availability_html, PARSER)
+    def parse_availability(availability_html: str) -> Availability:
+        """Scrape stock of warehouses from availability_html."""
+        soup = make_soup(availability_html)
 
         rows_number = len(soup.select(SELECTORS['availability_item']))
+        # Separators of packed availability are dropped from names
         titles = tuple(map(
-            lambda item: item.get_text(),
+            lambda item: re.sub(r'[:;,]', '', item.get_text(strip=True)),
             soup.select(SELECTORS['availability_item_name'])
         ))
 
@@ -234,7 +278,9 @@ class Scraper:
                 SELECTORS['span'], style=REGEXPS['availability_value']
             ).span.get_text()
 
-            return f'{", ".join(titles)}: {value}'
+            return tuple(
+                WarehouseStock(title, stock_code(value)) for title in titles
+            )
 
         elif rows_number > 1:
             values = tuple(map(
@@ -244,11 +290,14 @@ class Scraper:
                 )
             ))
 
-            return '; '.join(
-                [f'{titles[i]}: {values[i]}' for i in range(len(titles))]
+            return tuple(
+                WarehouseStock(titles[i], stock_code(values[i]))
+                for i in range(len(titles))
             )
-        
-        return availability_html
+
+        # Markup isn't recognized, so stock is unknown
+        logging.warning('Cannot parse availability %s', availability_html)
+        return ()
 
     @staticmethod
     def get_data_from_additional_info(soup: BS) -> Dict:
@@ -277,4 +326,4 @@ if __name__ == '__main__':
     url5 = 'https://www.petheaven.co.za/dogs/dog-clothing/jackets/dog-s-life-summer-raincoat-spots-black.html'
     url6 = 'https://www.petheaven.co.za/cats/cat-treats/orijen/orijen-6-fish-freeze-dried-cat-treats.html'
     scraper = Scraper(url5)
-    asyncio.run(scraper.scrape_product())
\ No newline at end of file
+    asyncio.run(scraper.scrape_product())
@@ -1,13 +1,42 @@
 import logging
-from typing import List
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Set
 
 from aiogram.dispatcher import FSMContext
 
 from bot.database import product_gateway
-from bot.entities import Product
-from bot.exceptions import DataNotFoundError, ServiceOperationFailedError
-from bot.scraper import Scraper
-from bot.utils.common import find_items
+from bot.entities import AlertRule, Product
+from bot.exceptions import (
+    CantSaveToDBError,
+    DataNotFoundError,
+    InvalidUserInputError,
+    ServiceOperationFailedError
+)
+from bot.metrics import PHOTO_FILE_ID_LOOKUPS
+from bot.utils.alerts import (
+    ALERT_ANY,
+    ALERT_IN_STOCK,
+    ALERT_PRICE_BELOW,
+    ALERT_PRICE_DROP
+)
+from bot.utils.cache import product_cache
+from bot.utils.common import find_items, is_product_url, normalize_url
+from bot.utils.fsm_storage import get_fields
+from bot.utils.job_queue import AddJob, add_job_queue
+from bot.utils.scrape_pool import scrape_pool
+from bot.utils.singleflight import SingleFlight
+
+
+# Scrapes of the same url requested by several users at once are shared
+_scrapes_in_progress = SingleFlight()
+
+# Words used in /alert command
+ALERT_COMMAND_TYPES = {
+    'any': ALERT_ANY,
+    'below': ALERT_PRICE_BELOW,
+    'drop': ALERT_PRICE_DROP,
+    'instock': ALERT_IN_STOCK
+}
 
 
 def find_all_from_monitoring_list(user_id: int) -> List[Product]:
@@ -15,15 +44,30 @@ def find_all_from_monitoring_list(user_id: int) -> List[Product]:
 
 
 async def get_info(state: FSMContext) -> List[Product]:
-    async with state.proxy() as data:
-        products = data['products']
-        checked_products = data['checked_products']
+    data = await get_fields(state, 'products', 'checked_products')
+    products = data['products']
+    checked_products = set(data['checked_products'] or ())
 
     product_dicts = find_items(
         lambda product: product['id'] in checked_products, products
     )
 
-    product_options = product_gateway.find_options_by_ids(checked_products)
+    # Recently scraped products have fresher options than database
+    product_options = {}
+    descriptions = {}
+    for product_dict in product_dicts:
+        cached = await product_cache.get(product_dict['url'])
+        if cached:
+            product_options[product_dict['id']] = cached.product_options
+            descriptions[product_dict['id']] = cached.description
+
+    not_cached_ids = [id for id in checked_products if id not in product_options]
+    if not_cached_ids:
+        product_options.update(
+            product_gateway.find_options_by_ids(not_cached_ids)
+        )
+        # Product lists are loaded without descriptions
+        descriptions.update(product_gateway.find_descriptions(not_cached_ids))
 
     if not product_options:
         raise DataNotFoundError(
@@ -33,33 +77,110 @@ async def get_info(state: FSMContext) -> List[Product]:
     products = []
     for product_dict in product_dicts:
         id = product_dict['id']
+        product_dict['description'] = descriptions.get(id)
         product_dict['product_options'] = product_options[id]
         products.append(Product._make(product_dict.values()))
 
     return products
 
 
+async def enqueue_add(product_url: str, user_id: int) -> AddJob:
+    """Enqueues adding of product to be done by background task."""
+    if not is_product_url(product_url):
+        raise InvalidUserInputError(f'Not a product url: {product_url}')
+
+    return await add_job_queue.put(user_id, normalize_url(product_url))
+
+
+async def find_add_jobs(user_id: int) -> List[AddJob]:
+    return await add_job_queue.find_user_jobs(user_id)
+
+
 async def add(product_url: str, user_id: int) -> None:
-    # Check if someone already add product to his list
+    product_url = normalize_url(product_url)
+
+    # Check if someone already add product to his list, cached id isn't
+    # trusted as product could be removed since it was scraped
     product = product_gateway.find_by_url(product_url)
 
-    if not product:
+    if product:
+        product_id = product.id
+    else:
         # Scraping product from website and then adding
-        scraper = Scraper(product_url)
-        product = await scraper.scrape_product()
-        product_gateway.add(user_id, product)
-        return
+        product_id = await _scrapes_in_progress.do(
+            product_url, lambda: _scrape_and_save(product_url)
+        )
 
     # Trying to add link to existing product
-    product_gateway.add_to_monitoring_list(user_id, product.id)
+    if not product_gateway.add_to_monitoring_list(user_id, product_id):
+        raise ServiceOperationFailedError(
+            f'Cannot add product with id={product_id} to list of user {user_id}'
+        )
+
+
+async def _scrape_and_save(product_url: str) -> int:
+    product = await scrape_pool.scrape(product_url)
+
+    product_id = product_gateway.insert_or_get(product)
+    if product_id is None:
+        raise CantSaveToDBError(f'Cannot save product with url={product_url}')
+
+    await product_cache.set(product._replace(id=product_id))
+    return product_id
+
+
+def set_alert(user_id: int, args: str) -> Product:
+    """
+    Sets alert rule from /alert command arguments, e.g. "2 below 150",
+    where 2 is a number of product in user's monitoring list.
+    Returns product the rule was set for.
+    """
+    rule_args = args.replace('%', ' ').split()
+    if len(rule_args) < 2 or rule_args[1].lower() not in ALERT_COMMAND_TYPES:
+        raise InvalidUserInputError(f'Cannot parse alert rule: {args}')
+
+    alert_type = ALERT_COMMAND_TYPES[rule_args[1].lower()]
+    threshold = None
+    try:
+        number = int(rule_args[0])
+        if alert_type in (ALERT_PRICE_BELOW, ALERT_PRICE_DROP):
+            threshold = Decimal(rule_args[2])
+    except (IndexError, ValueError, InvalidOperation) as e:
+        raise InvalidUserInputError(f'Cannot parse alert rule: {args}') from e
+
+    if threshold is not None and threshold <= 0:
+        raise InvalidUserInputError(f'Threshold must be positive: {args}')
+
+    products = product_gateway.find_all_from_monitoring_list(user_id)
+    if not 1 <= number <= len(products):
+        raise InvalidUserInputError(f'No product with number {number}')
+
+    product = products[number-1]
+    rule = AlertRule(user_id, product.id, alert_type, threshold)
+    if not product_gateway.set_alert_rule(rule):
+        raise ServiceOperationFailedError
+
+    logging.info(f'Alert rule {rule} is set')
+    return product
+
+
+def find_photo_file_ids(products: List[Product]) -> Dict[str, str]:
+    """Returns file ids of already uploaded photos by image urls."""
+    file_ids = product_gateway.find_img_file_ids([p.id for p in products])
+    PHOTO_FILE_ID_LOOKUPS.labels('hit').inc(len(file_ids))
+    PHOTO_FILE_ID_LOOKUPS.labels('miss').inc(len(products) - len(file_ids))
+    return {p.img: file_ids[p.id] for p in products if p.id in file_ids}
+
+
+def save_photo_file_id(product: Product, file_id: Optional[str]) -> None:
+    product_gateway.set_img_file_id(product.id, product.img, file_id)
 
 
 async def remove_from_monitoring_list_by_ids(user_id: int, state: FSMContext) -> None:
-    async with state.proxy() as data:
-        product_ids = data.get('checked_products')
-        if not product_ids:
-            logging.info('No products selected to remove')
-            return
+    product_ids = (await get_fields(state, 'checked_products'))['checked_products']
+    if not product_ids:
+        logging.info('No products selected to remove')
+        return
 
     result = product_gateway.remove_from_monitoring_list_by_ids(
         user_id, product_ids
@@ -73,16 +194,11 @@ async def remove_from_monitoring_list_by_ids(user_id: int, state: FSMContext) ->
     ))
 
 
-async def add_to_checked_ids(id: int, state: FSMContext) -> None:
-    """Add id to checked_ids or remove if already exist."""
-    async with state.proxy() as data:
-        checked_ids = data.get('checked_products')
-        if not checked_ids:
-            data['checked_products'] = [id]
-            return
+def toggle_checked_id(id: int, checked_ids: Set[int]) -> bool:
+    """Adds id to checked ids or removes if already checked, returns whether id is checked now."""
+    if id in checked_ids:
+        checked_ids.discard(id)
+        return False
 
-        if id in checked_ids:
-            checked_ids.remove(id)
-        else:
-            checked_ids.append(id)
-    
\ No newline at end of file
+    checked_ids.add(id)
+    return True
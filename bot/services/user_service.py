@@ -1,8 +1,12 @@
 import logging
 
 from bot.database import user_gateway
-from bot.entities import User
-from bot.exceptions import DataAlreadyExistsInDBError
+from bot.entities import DELIVERY_MODES, User
+from bot.exceptions import (
+    DataAlreadyExistsInDBError,
+    InvalidUserInputError,
+    ServiceOperationFailedError
+)
 
 
 def save(id: int, username: str, first_name: str, last_name: str) -> None:
@@ -15,4 +19,20 @@ def save(id: int, username: str, first_name: str, last_name: str) -> None:
         ))
         logging.info(f'User with id={id} successfully added')
     except DataAlreadyExistsInDBError as e:
-        logging.error(e)
\ No newline at end of file
+        logging.error(e)
+        # Returning user could block the bot earlier
+        if user_gateway.activate(id):
+            logging.info(f'User with id={id} is active again')
+
+
+def set_delivery_mode(id: int, delivery_mode: str) -> None:
+    delivery_mode = delivery_mode.strip().lower()
+    if delivery_mode not in DELIVERY_MODES:
+        raise InvalidUserInputError(
+            f'Unknown delivery mode: {delivery_mode}'
+        )
+
+    if not user_gateway.set_delivery_mode(id, delivery_mode):
+        raise ServiceOperationFailedError
+
+    logging.info(f'User with id={id} set delivery mode {delivery_mode}')
@@ -5,4 +5,5 @@ class MonitorProducts(StatesGroup):
     on_monitor_cmd = State()
     on_getting_product_info = State()
     on_adding_product = State()
-    on_removing_product = State()
\ No newline at end of file
+    on_removing_product = State()
+    on_importing_products = State()
\ No newline at end of file
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import os
+
+from aiogram import Bot
+from aiogram.utils.exceptions import TelegramAPIError
+
+from bot.exceptions import DataAlreadyExistsInDBError, ProductNotFoundError
+from bot.metrics import ADD_JOBS
+from bot.services import product_service
+from bot.utils.common import MESSAGES
+from bot.utils.job_queue import AddJob, add_job_queue
+from bot.utils.rate_limiter import telegram_limiter
+
+
+# Scrapes are also limited by scrape pool shared with monitoring
+ADD_WORKERS = int(os.getenv('ADD_WORKERS', 4))
+SECONDS_AFTER_QUEUE_ERROR = 5
+
+ADD_JOB_ERROR_ALREADY_ADDED = 'already_added'
+ADD_JOB_ERROR_NOT_FOUND = 'not_found'
+ADD_JOB_ERROR_FAILED = 'failed'
+
+RESULT_MESSAGES = {
+    '': 'add_success',
+    ADD_JOB_ERROR_ALREADY_ADDED: 'add_same_product',
+    ADD_JOB_ERROR_NOT_FOUND: 'add_not_found',
+    ADD_JOB_ERROR_FAILED: 'add_error'
+}
+
+
+async def process_add_jobs(bot: Bot) -> None:
+    """Task for adding products requested by users in background."""
+    await add_job_queue.requeue_unfinished()
+    await asyncio.gather(*(_work(bot) for _ in range(ADD_WORKERS)))
+
+
+async def _work(bot: Bot) -> None:
+    while True:
+        try:
+            job = await add_job_queue.take()
+        except Exception as e:
+            logging.exception(f'Failed to take add job: {e}')
+            await asyncio.sleep(SECONDS_AFTER_QUEUE_ERROR)
+            continue
+
+        if job is not None:
+            await process_add_job(bot, job)
+
+
+async def process_add_job(bot: Bot, job: AddJob) -> str:
+    """Adds product of job, notifies user and returns job error."""
+    error = ''
+    try:
+        await product_service.add(job.url, job.user_id)
+    except DataAlreadyExistsInDBError:
+        error = ADD_JOB_ERROR_ALREADY_ADDED
+    except ProductNotFoundError:
+        error = ADD_JOB_ERROR_NOT_FOUND
+    except Exception as e:
+        logging.exception(f'Failed to add {job.url} for user {job.user_id}: {e}')
+        error = ADD_JOB_ERROR_FAILED
+
+    ADD_JOBS.labels(error or 'done').inc()
+    await add_job_queue.finish(job, error)
+
+    await telegram_limiter.acquire()
+    try:
+        await bot.send_message(
+            job.user_id,
+            MESSAGES[RESULT_MESSAGES[error]].format(job.url),
+            disable_web_page_preview=True
+        )
+    except TelegramAPIError as e:
+        logging.error(f'Failed to notify user {job.user_id} about add job: {e}')
+    return error
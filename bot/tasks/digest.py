@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from aiogram import Bot
+
+from bot.database import notification_gateway, user_gateway
+from bot.entities import DELIVERY_DAILY, DELIVERY_HOURLY, Notification
+from bot.utils.rate_limiter import telegram_limiter
+from bot.views.product_notification import render_digest_pages
+
+
+DIGEST_PERIODS = {
+    DELIVERY_HOURLY: timedelta(hours=1),
+    DELIVERY_DAILY: timedelta(days=1)
+}
+DIGEST_CHECK_DELTA = timedelta(minutes=5)
+# Telegram allows one message per second to the same chat
+SECONDS_BETWEEN_PAGES = 1
+
+
+def defer_digest_notifications(notifications: List[Notification],
+                               digest_users: Dict[int, str] = None) -> List[Notification]:
+    """
+    Stores notifications of users receiving digests until their
+    next digest and returns notifications that must be sent now.
+    Delivery modes of digest users are loaded unless they're given.
+    """
+    if digest_users is None:
+        digest_users = user_gateway.find_digest_users()
+    if not digest_users:
+        return notifications
+
+    instant, deferred = [], []
+    for n in notifications:
+        if n.receiver_id in digest_users:
+            deferred.append((n.receiver_id, n.message))
+        else:
+            instant.append(n)
+
+    if deferred and not notification_gateway.add_pending(deferred):
+        # Better to send them now than to lose them
+        return notifications
+
+    logging.info(f'{len(deferred)} notifications are deferred to digests')
+    return instant
+
+
+async def send_digests(bot: Bot) -> None:
+    """Task for sending hourly and daily digests of notifications."""
+    while True:
+        try:
+            await _send_due_digests(bot)
+        except Exception as e:
+            logging.exception(f'Failed to send digests: {e}')
+        await asyncio.sleep(DIGEST_CHECK_DELTA.total_seconds())
+
+
+async def _send_due_digests(bot: Bot) -> None:
+    now = datetime.now()
+    user_ids = notification_gateway.find_due_digest_users(
+        now - DIGEST_PERIODS[DELIVERY_HOURLY],
+        now - DIGEST_PERIODS[DELIVERY_DAILY]
+    )
+    if not user_ids:
+        return
+
+    logging.info(f'Sending digests to {len(user_ids)} users')
+    # Global rate is capped by telegram_limiter, so sends are spread over time
+    results = await asyncio.gather(
+        *(_send_digest(bot, user_id, now) for user_id in user_ids),
+        return_exceptions=True
+    )
+    for user_id, result in zip(user_ids, results):
+        if isinstance(result, Exception):
+            logging.error(f'Failed to send digest to {user_id}: {result}')
+
+
+async def _send_digest(bot: Bot, user_id: int, now: datetime) -> None:
+    pending = notification_gateway.find_pending(user_id)
+    if not pending:
+        return
+
+    pages = render_digest_pages([message for _, message in pending])
+    done = 0
+    try:
+        for i, (page, messages_done) in enumerate(pages):
+            if i:
+                await asyncio.sleep(SECONDS_BETWEEN_PAGES)
+            await telegram_limiter.acquire()
+            if not await Notification(user_id, bot, page).send():
+                # User was deactivated, the rest waits for reactivation
+                return
+            done = messages_done
+    finally:
+        # Delivered pages aren't resent, digest is retried unless it's complete
+        if done:
+            notification_gateway.complete_digest(
+                user_id, pending[done-1][0], now if done == len(pending) else None
+            )
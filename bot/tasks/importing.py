@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import time
+from typing import List, Set
+
+from aiogram import types
+from aiogram.utils.exceptions import MessageNotModified, TelegramAPIError
+from aiohttp import ClientSession
+
+from bot.database import product_gateway
+from bot.entities import Product
+from bot.metrics import IMPORTED_URLS
+from bot.scraper import create_session
+from bot.utils.cache import product_cache
+from bot.utils.common import MESSAGES
+from bot.utils.rate_limiter import telegram_limiter
+from bot.utils.scrape_pool import scrape_pool
+
+
+MAX_IMPORT_URLS = int(os.getenv('MAX_IMPORT_URLS', 500))
+# Admins may import any number of urls, also to lists of other users
+ADMIN_IDS = {
+    int(id) for id in os.getenv('ADMIN_IDS', '').split(',') if id.strip()
+}
+MAX_IMPORT_FILE_SIZE = 1024 * 1024
+IMPORT_FILE_EXTENSIONS = ('.txt', '.csv')
+IMPORT_BATCH_SIZE = 50
+SECONDS_BETWEEN_PROGRESS_EDITS = 3
+
+# References to running imports, so they aren't garbage collected
+_imports: Set[asyncio.Task] = set()
+
+
+class ImportProgress:
+    """Counters of urls processed by bulk import."""
+    __slots__ = ('total', 'added', 'existing', 'failed')
+
+    def __init__(self, total: int):
+        self.total = total
+        self.added = 0
+        self.existing = 0
+        self.failed = 0
+
+    @property
+    def done(self) -> int:
+        return self.added + self.existing + self.failed
+
+    def render(self) -> str:
+        template = 'import_done' if self.done == self.total else 'import_progress'
+        return MESSAGES[template].format(
+            done=self.done, total=self.total, added=self.added,
+            existing=self.existing, failed=self.failed
+        )
+
+
+def is_admin(user_id: int) -> bool:
+    return user_id in ADMIN_IDS
+
+
+def start_import(progress_message: types.Message, user_id: int, urls: List[str]) -> None:
+    """
+    Starts importing normalized urls to user's monitoring list in
+    background, progress is reported by editing progress_message.
+    """
+    task = asyncio.create_task(_run_import(progress_message, user_id, urls))
+    _imports.add(task)
+    task.add_done_callback(_imports.discard)
+
+
+async def _run_import(progress_message: types.Message, user_id: int, urls: List[str]) -> None:
+    try:
+        await import_products(progress_message, user_id, urls)
+    except Exception as e:
+        logging.exception(f'Failed to import urls of user {user_id}: {e}')
+        await telegram_limiter.acquire()
+        await progress_message.answer(MESSAGES['import_error'])
+
+
+async def import_products(progress_message: types.Message, user_id: int, urls: List[str]) -> ImportProgress:
+    """
+    Task for adding products to user's monitoring list by urls.
+    Existing products are found by one query, the rest are scraped
+    through scrape pool and inserted in batches.
+    """
+    progress = ImportProgress(len(urls))
+    reporter = _ProgressReporter(progress_message, progress)
+
+    existing_ids = product_gateway.find_ids_by_urls(urls)
+    product_ids = list(existing_ids.values())
+    for i in range(0, len(product_ids), IMPORT_BATCH_SIZE):
+        _link_batch(user_id, product_ids[i:i+IMPORT_BATCH_SIZE], progress)
+    await reporter.report()
+
+    # Missing urls are scraped by slices, so number of tasks doesn't grow
+    # with number of urls, which isn't limited for admins
+    missing_urls = [url for url in urls if url not in existing_ids]
+    async with create_session() as session:
+        for i in range(0, len(missing_urls), IMPORT_BATCH_SIZE):
+            scraped = await asyncio.gather(*(
+                _scrape(url, session)
+                for url in missing_urls[i:i+IMPORT_BATCH_SIZE]
+            ))
+            batch = [product for product in scraped if product is not None]
+            progress.failed += len(scraped) - len(batch)
+            IMPORTED_URLS.labels('failed').inc(len(scraped) - len(batch))
+
+            await _save_batch(user_id, batch, progress)
+            await reporter.report()
+
+    await reporter.report(force=True)
+
+    logging.info((
+        f'Imported {progress.added} of {progress.total} urls to list '
+        f'of user {user_id}, {progress.existing} already added, '
+        f'{progress.failed} failed'
+    ))
+    return progress
+
+
+async def _scrape(url: str, session: ClientSession) -> Product:
+    # Product could be scraped a moment ago by monitoring or adding
+    product = await product_cache.get(url)
+    if product:
+        return product
+
+    try:
+        return await scrape_pool.scrape(url, session)
+    except Exception as e:
+        logging.error(f'Failed to scrape {url} while importing: {e}')
+        return None
+
+
+async def _save_batch(user_id: int, products: List[Product], progress: ImportProgress) -> None:
+    if not products:
+        return
+
+    product_ids = product_gateway.insert_many(products)
+    if not product_ids:
+        progress.failed += len(products)
+        IMPORTED_URLS.labels('failed').inc(len(products))
+        return
+
+    for product in products:
+        await product_cache.set(product._replace(id=product_ids[product.url]))
+    _link_batch(user_id, list(product_ids.values()), progress)
+
+
+def _link_batch(user_id: int, product_ids: List[int], progress: ImportProgress) -> None:
+    added = product_gateway.add_many_to_monitoring_list(user_id, product_ids)
+    if added is None:
+        progress.failed += len(product_ids)
+        IMPORTED_URLS.labels('failed').inc(len(product_ids))
+        return
+
+    progress.added += added
+    progress.existing += len(product_ids) - added
+    IMPORTED_URLS.labels('added').inc(added)
+    IMPORTED_URLS.labels('existing').inc(len(product_ids) - added)
+
+
+class _ProgressReporter:
+    """Edits progress message at most once in a few seconds."""
+
+    def __init__(self, message: types.Message, progress: ImportProgress):
+        self.message = message
+        self.progress = progress
+        self._edited_at = 0.0
+
+    async def report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._edited_at < SECONDS_BETWEEN_PROGRESS_EDITS:
+            return
+
+        self._edited_at = now
+        await telegram_limiter.acquire()
+        try:
+            await self.message.edit_text(self.progress.render())
+        except MessageNotModified:
+            pass
+        except TelegramAPIError as e:
+            logging.error(f'Failed to edit import progress: {e}')
@@ -1,132 +1,281 @@
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
-from random import uniform
-from typing import List, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple
+)
 
 from aiogram import Bot
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientSession
 
-from bot.database import product_gateway
+from bot import tracing
+from bot.database import product_gateway, user_gateway
 from bot.entities import Notification, Product
-from bot.exceptions import ProductNotFoundError
-from bot.scraper import HEADERS, Scraper
-from bot.utils.common import find_items
-from bot.utils.util import choose_notifications
+from bot.exceptions import ProductNotFoundError, RequestFailedError
+from bot.metrics import (
+    MONITORING_CYCLE_SECONDS,
+    MONITORING_CYCLES,
+    PRODUCTS_CHANGED,
+    PRODUCTS_MONITORED,
+    PRODUCTS_UNAVAILABLE,
+    SCRAPE_FAILURES
+)
+from bot.scraper import create_session
+from bot.utils.alerts import ProductAlertIndex, build_alert_indexes
+from bot.utils.cache import product_cache
+from bot.utils.pipeline import Stage, run_pipeline
+from bot.utils.scrape_pool import SCRAPE_CONCURRENCY, scrape_pool
 from bot.views.product_notification import render_notification_message
+from .outbox import deliver_notifications
 from .removing import remove_unavailable_products
 
 
-MAX_SECONDS_DELAY = 5
-MIN_SECONDS_DELAY = 2
 DELTA = timedelta(hours=12)
+# Products loaded from database at once, next page is loaded when
+# pipeline takes the previous one
+PRODUCTS_PAGE_SIZE = 500
+# Scraped products compared with old ones at once
+DIFF_BATCH_SIZE = 50
+# Changed products saved in one transaction
+PERSIST_BATCH_SIZE = 50
+# Notifications delivered at once, digest and outbox ones are saved in one query
+NOTIFY_BATCH_SIZE = 100
 
 
-async def monitor_products(bot: Bot) -> None:
-    """Task for monitoring products and updating their info."""
+class MonitoringCycle(NamedTuple):
+    """Stats of one monitoring cycle."""
+    products: int
+    scraped: int
+    unavailable: int
+    notifications: int
+    seconds: float
+    finished_at: float
+
+
+class ProductChange(NamedTuple):
+    """Scraped product to save and notifications about its changes."""
+    old: Product
+    scraped: Product
+    notifications: List[Notification]
+
+
+async def monitor_products(bot: Optional[Bot], shard: Callable[[Product], bool] = None) -> None:
+    """
+    Task for monitoring products and updating their info. Worker monitors
+    only products of its shard and runs without bot, so notifications
+    are put to outbox.
+    """
     while True:
-        start_time = datetime.now()
-        logging.info('Start monitoring products...')
+        await run_monitoring_cycle(bot, shard)
+        logging.info(f'Monitoring task scheduled to {datetime.now() + DELTA}')
+        await asyncio.sleep(DELTA.total_seconds())
 
-        products = product_gateway.get_all_products()
-        monitoring_list = product_gateway.get_all_from_monitoring_list()
-        scraped_products, unavailable_product_urls = await _scrape_products(
-            [p.url for p in products]
-        )
 
-        notifications = _create_notifications(
-            bot, products, scraped_products, monitoring_list
-        )
+async def run_monitoring_cycle(bot: Optional[Bot], shard: Callable[[Product], bool] = None) -> MonitoringCycle:
+    """
+    Scrapes products, saves changes and notifies users about them.
+    Every product goes through pipeline as soon as it's scraped.
+    """
+    start_time = datetime.now()
+    logging.info('Start monitoring products...')
 
-        await _send_notifications(notifications)
-        _update_products(products, scraped_products)
+    products = _ProductPages(shard)
+    # Delivery modes are read once per cycle instead of per notify batch
+    with tracing.span('cycle.load'):
+        digest_users = user_gateway.find_digest_users()
+    with tracing.span('cycle.pipeline'):
+        scraped, unavailable_products, notifications = await _monitor(
+            bot, products, digest_users
+        )
 
-        if unavailable_product_urls:
+    if unavailable_products:
+        with tracing.span('cycle.remove_unavailable'):
             await remove_unavailable_products(
-                bot, unavailable_product_urls, products, monitoring_list
+                bot, unavailable_products, digest_users
             )
 
-        logging.info(f'{len(products) = }')
-        logging.info(f'{len(scraped_products) = }')
-        logging.info(f'{len(unavailable_product_urls) = }')
-        logging.info(f'{len(notifications) = }')
+    logging.info(f'{products.count = }')
+    logging.info(f'{scraped = }')
+    logging.info(f'{len(unavailable_products) = }')
+    logging.info(f'{notifications = }')
+    logging.info(f'{product_cache.stats = }')
 
-        logging.info(
-            f'Time elapsed: {(datetime.now()-start_time).total_seconds()} sec'
-        )
-        logging.info(f'Monitoring task scheduled to {datetime.now() + DELTA}')
-        await asyncio.sleep(DELTA.total_seconds())
+    elapsed = (datetime.now()-start_time).total_seconds()
+    PRODUCTS_MONITORED.set(products.count)
+    PRODUCTS_UNAVAILABLE.inc(len(unavailable_products))
+    MONITORING_CYCLE_SECONDS.set(elapsed)
+    MONITORING_CYCLES.inc()
 
+    tracing.end_cycle()
 
-async def _scrape_products(urls: List[str]) -> List[Product]:
-    unavailable_product_urls = []
+    logging.info(f'Time elapsed: {elapsed} sec')
+    return MonitoringCycle(
+        products.count, scraped, len(unavailable_products),
+        notifications, elapsed, time.time()
+    )
 
-    async def scrape_product(url: str, session: ClientSession) -> Product:
-        scraper = Scraper(url, session)
-        try:
-            return await scraper.scrape_product()
-        except ProductNotFoundError as e:
-            unavailable_product_urls.append(url)
-            logging.exception(e)
 
-    async with ClientSession(headers=HEADERS) as session:
-        result =  await asyncio.gather(
-            *(scrape_product(url, session) for url in urls)
-        )
+class _ProductPages:
+    """
+    Iterates over watched products loading them page by page in
+    order of ids, counts products of shard passed to pipeline.
+    """
+
+    def __init__(self, shard: Callable[[Product], bool] = None) -> None:
+        self.shard = shard
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Product]:
+        after_id = 0
+        while True:
+            with tracing.span('cycle.load'):
+                page = product_gateway.get_products_page(after_id, PRODUCTS_PAGE_SIZE)
+            for product in page:
+                if self.shard is None or self.shard(product):
+                    self.count += 1
+                    yield product
+            if len(page) < PRODUCTS_PAGE_SIZE:
+                return
+            after_id = page[-1].id
+
 
-    return list(filter(lambda p: p, result)), unavailable_product_urls
-
-
-def _create_notifications(bot: Bot, old_products: List[Product], scraped_products: List[Product],
-                          monitoring_list: List[Tuple]) -> List[Notification]:
-    notifications = []
-    for old in old_products:
-        for scraped in scraped_products:
-            if old == scraped and old.are_product_options_changed(scraped):
-                message = render_notification_message(
-                    scraped, old
-                )
-                user_ids = _find_user_ids(old.id, monitoring_list)
-                notifications.extend(
-                    [Notification(id_, bot, message) for id_ in user_ids]
-                )
-    return notifications
-
-
-def _find_user_ids(product_id: int, monitoring_list: List[List]) -> List[int]:
-    return [
-        el[0]
-        for el in find_items(
-            lambda item: item[1] == product_id,
-            monitoring_list
+async def _monitor(bot: Optional[Bot], products: Iterable[Product],
+                   digest_users: Dict[int, str]) -> Tuple[int, List[Product], int]:
+    """
+    Runs products through scrape, diff, persist and notify stages.
+    Returns number of scraped products, unavailable products
+    and number of notifications.
+    """
+    unavailable_products = []
+    scraped_count = 0
+    notifications_count = 0
+
+    async def scrape(batch: List[Product]) -> List[Tuple[Product, Product]]:
+        nonlocal scraped_count
+        product, = batch
+        scraped = await _scrape_product(product, session, unavailable_products)
+        if scraped is None:
+            return []
+        scraped_count += 1
+        return [(product, scraped)]
+
+    async def diff(batch: List[Tuple[Product, Product]]) -> List[ProductChange]:
+        # Receivers are looked up for changed products of batch only
+        alert_indexes = build_alert_indexes(product_gateway.find_monitoring_rows([
+            old.id for old, scraped in batch
+            if old.are_product_options_changed(scraped)
+        ]))
+        changes = (
+            _diff_product(bot, old, scraped, alert_indexes)
+            for old, scraped in batch
         )
-    ]
+        return [change for change in changes if change is not None]
+
+    async def persist(batch: List[ProductChange]) -> List[Notification]:
+        _update_products(batch)
+        return [n for change in batch for n in change.notifications]
+
+    async def notify(batch: List[Notification]) -> List:
+        nonlocal notifications_count
+        notifications_count += len(batch)
+        await deliver_notifications(bot, batch, digest_users)
+        return []
+
+    async with create_session() as session:
+        await run_pipeline(products, [
+            Stage('scrape', scrape, SCRAPE_CONCURRENCY),
+            Stage('diff', diff, batch_size=DIFF_BATCH_SIZE),
+            Stage('persist', persist, batch_size=PERSIST_BATCH_SIZE),
+            Stage('notify', notify, batch_size=NOTIFY_BATCH_SIZE),
+        ])
+
+    return scraped_count, unavailable_products, notifications_count
+
+
+async def _scrape_product(product: Product, session: ClientSession,
+                          unavailable_products: List[Product]) -> Optional[Product]:
+    # Product could be scraped a moment ago while adding it
+    cached = await product_cache.get(product.url)
+    if cached:
+        return cached
 
+    try:
+        with tracing.product_trace(product.url), tracing.span('scrape'):
+            scraped = await scrape_pool.scrape(product.url, session)
+    except ProductNotFoundError as e:
+        SCRAPE_FAILURES.labels('not_found').inc()
+        unavailable_products.append(product)
+        await product_cache.invalidate(product.url)
+        logging.exception(e)
+        return None
+    except Exception as e:
+        SCRAPE_FAILURES.labels(_failure_category(e)).inc()
+        logging.exception(f'Failed to scrape {product.url}: {e}')
+        return None
 
-async def _send_notifications(notifications: List[Notification]) -> None:
-    notifications_set = set(notifications)
-    while notifications_set:
-        notifications_to_send = choose_notifications(notifications_set)
-        await asyncio.gather(*(n.send() for n in notifications_to_send))
+    await product_cache.set(scraped._replace(id=product.id))
+    return scraped
 
-        notifications_set = notifications_set.difference(
-            notifications_to_send
+
+def _failure_category(error: Exception) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return 'timeout'
+    if isinstance(error, ClientError):
+        return 'network'
+    if isinstance(error, RequestFailedError):
+        return 'http_status'
+    return 'parse'
+
+
+def _diff_product(bot: Optional[Bot], old: Product, scraped: Product,
+                  alert_indexes: Dict[int, ProductAlertIndex]) -> Optional[ProductChange]:
+    """Returns change of product to save, None if it's unchanged."""
+    if old.are_product_options_changed(scraped):
+        PRODUCTS_CHANGED.inc()
+        return ProductChange(
+            old, scraped, _create_notifications(bot, old, scraped, alert_indexes)
         )
+    if old.img != scraped.img or not old.options_fingerprint:
+        # Saving new image drops outdated Telegram file id,
+        # products saved before fingerprints get theirs
+        return ProductChange(old, scraped, [])
+    return None
+
 
-        await asyncio.sleep(uniform(MIN_SECONDS_DELAY, MAX_SECONDS_DELAY))
+def _create_notifications(bot: Optional[Bot], old: Product, scraped: Product,
+                          alert_indexes: Dict[int, ProductAlertIndex]) -> List[Notification]:
+    alert_index = alert_indexes.get(old.id)
+    if alert_index is None:
+        return []
 
+    trace_id = tracing.product_trace_id(old.url)
+    with tracing.use_trace(trace_id), tracing.span('diff'):
+        user_ids = alert_index.match(old, scraped)
+        if not user_ids:
+            return []
+        message = render_notification_message(scraped, old)
+    return [Notification(id_, bot, message, trace_id) for id_ in user_ids]
 
-def _update_products(old_products: List[Product], scraped_products: List[Product]) -> None:
+
+def _update_products(changes: List[ProductChange]) -> None:
     new_products = []
     outdated_product_options_ids = []
-    for old in old_products:
-        for scraped in scraped_products:
-            if old == scraped and old.are_product_options_changed(scraped):
-                new_products.append(old.update_with(scraped))
-
-                outdated_product_options_ids.extend(
-                    old.get_outdated_product_options_ids(scraped)
-                )
+    for old, scraped, _ in changes:
+        new_products.append(old.update_with(scraped))
+        if old.are_product_options_changed(scraped):
+            outdated_product_options_ids.extend(
+                old.get_outdated_product_options_ids(scraped)
+            )
 
-    product_gateway.update_products(new_products)
+    product_gateway.update_products(
+        new_products, {old.id: old for old, _, _ in changes}
+    )
     product_gateway.remove_product_options_by_id(outdated_product_options_ids)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from datetime import timedelta
+from random import uniform
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+
+from bot.database import notification_gateway
+from bot.entities import Notification
+from bot.metrics import NOTIFICATIONS_QUEUED
+from bot.utils.util import choose_notifications
+from .digest import defer_digest_notifications
+
+
+MAX_SECONDS_DELAY = 5
+MIN_SECONDS_DELAY = 2
+OUTBOX_CHECK_DELTA = timedelta(seconds=30)
+OUTBOX_BATCH_SIZE = 200
+
+
+async def deliver_notifications(bot: Optional[Bot], notifications: List[Notification],
+                                digest_users: Dict[int, str] = None) -> None:
+    """
+    Defers notifications of digest users and sends the rest. Without bot,
+    e.g. in monitoring worker, they are put to outbox sent by bot process.
+    """
+    notifications = defer_digest_notifications(notifications, digest_users)
+    if bot is not None:
+        await send_notifications(notifications)
+        return
+
+    if notifications and not notification_gateway.add_to_outbox(
+        [(n.receiver_id, n.message, n.trace_id) for n in notifications]
+    ):
+        logging.error(f'{len(notifications)} notifications are lost')
+
+
+async def send_notifications(notifications: List[Notification]) -> None:
+    notifications_set = set(notifications)
+    while notifications_set:
+        NOTIFICATIONS_QUEUED.set(len(notifications_set))
+        notifications_to_send = choose_notifications(notifications_set)
+        results = await asyncio.gather(
+            *(n.send() for n in notifications_to_send), return_exceptions=True
+        )
+        for n, result in zip(notifications_to_send, results):
+            if isinstance(result, Exception):
+                logging.error(f'Failed to notify user {n.receiver_id}: {result}')
+
+        notifications_set = notifications_set.difference(
+            notifications_to_send
+        )
+
+        await asyncio.sleep(uniform(MIN_SECONDS_DELAY, MAX_SECONDS_DELAY))
+    NOTIFICATIONS_QUEUED.set(0)
+
+
+async def send_outbox(bot: Bot) -> None:
+    """Task for sending notifications put to outbox by monitoring workers."""
+    while True:
+        try:
+            sent = await _send_outbox_batch(bot)
+        except Exception as e:
+            logging.exception(f'Failed to send notifications from outbox: {e}')
+            sent = 0
+
+        if sent < OUTBOX_BATCH_SIZE:
+            await asyncio.sleep(OUTBOX_CHECK_DELTA.total_seconds())
+
+
+async def _send_outbox_batch(bot: Bot) -> int:
+    rows = notification_gateway.find_outbox(OUTBOX_BATCH_SIZE)
+    if not rows:
+        return 0
+
+    notifications = [
+        Notification(user_id, bot, message, trace_id)
+        for _, user_id, message, trace_id in rows
+    ]
+    try:
+        await send_notifications(notifications)
+    finally:
+        # Failed notifications aren't retried, like ones sent by monitoring
+        notification_gateway.remove_from_outbox([row[0] for row in rows])
+
+    logging.info(f'{len(rows)} notifications from outbox are sent')
+    return len(rows)
@@ -1,6 +1,7 @@
 import asyncio
 import logging
-from typing import List, Tuple
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
 from aiogram import Bot
 
@@ -8,23 +9,34 @@ from bot.database import product_gateway
 from bot.entities import Product, Notification
 from bot.utils.common import find_items
 from bot.views.product_notification import render_unavailable_product
+from .outbox import deliver_notifications
 
 
-async def remove_unavailable_products(bot: Bot,
-                                      unavailable_product_urls: List[str],
-                                      products: List[Product],
-                                      monitoring_list: List[Tuple]) -> None:
+ORPHANS_CHECK_DELTA = timedelta(minutes=10)
+# Freshly added product has no watchers until it's linked with user
+ORPHANS_GRACE_PERIOD = timedelta(hours=1)
+ORPHANS_BATCH_SIZE = 100
+SECONDS_BETWEEN_BATCHES = 1
+# Same as events.sql does in MySQL
+OPTION_HISTORY_CHECK_DELTA = timedelta(days=1)
+OPTION_HISTORY_DOWNSAMPLE_AFTER = timedelta(days=90)
+OPTION_HISTORY_RETENTION_MONTHS = 24
+
+
+async def remove_unavailable_products(bot: Optional[Bot],
+                                      unavailable_products: List[Product],
+                                      digest_users: Dict[int, str] = None) -> None:
     """
     Task for removing unavailable products and
     notifying users that monitor such products.
     """
-    unavailable_products = find_items(
-        lambda p: p.url in unavailable_product_urls, products
+    monitoring_list = product_gateway.find_monitoring_rows(
+        [p.id for p in unavailable_products]
     )
     notifications = _create_notifications(
         bot, unavailable_products, monitoring_list
     )
-    await _send_notifications(notifications)
+    await deliver_notifications(bot, notifications, digest_users)
 
     logging.info(f'{len(notifications) = }')
 
@@ -32,11 +44,46 @@ async def remove_unavailable_products(bot: Bot,
     logging.info('Unavailable products are removed successfully')
 
 
-async def _send_notifications(notifications: List[Notification]) -> None:
-    await asyncio.gather(*(n.send() for n in notifications))
+async def remove_orphaned_products() -> None:
+    """
+    Task for incremental removing of products without watchers
+    in small batches, so table isn't locked for long.
+    """
+    while True:
+        removed = 0
+        while True:
+            count = product_gateway.remove_orphaned_products(
+                datetime.now() - ORPHANS_GRACE_PERIOD, ORPHANS_BATCH_SIZE
+            )
+            removed += count
+            if count < ORPHANS_BATCH_SIZE:
+                break
+            await asyncio.sleep(SECONDS_BETWEEN_BATCHES)
+
+        if removed:
+            logging.info(f'{removed} orphaned products are removed')
+        await asyncio.sleep(ORPHANS_CHECK_DELTA.total_seconds())
+
+
+async def compact_option_history() -> None:
+    """
+    Task for downsampling and removing old option history, which
+    is done by events in MySQL, so it's run for SQLite only.
+    """
+    while True:
+        now = datetime.now()
+        # Whole months are kept like partitions in MySQL
+        months = now.year * 12 + now.month - 1 - OPTION_HISTORY_RETENTION_MONTHS
+        removed = product_gateway.compact_option_history(
+            now - OPTION_HISTORY_DOWNSAMPLE_AFTER,
+            datetime(months // 12, months % 12 + 1, 1)
+        )
+        if removed:
+            logging.info(f'{removed} option history rows are compacted')
+        await asyncio.sleep(OPTION_HISTORY_CHECK_DELTA.total_seconds())
 
 
-def _create_notifications(bot: Bot, products: List[Product],
+def _create_notifications(bot: Optional[Bot], products: List[Product],
                           monitoring_list: List[Tuple]) -> List[Notification]:
     notifications = []
     for product in products:
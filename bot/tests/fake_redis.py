@@ -0,0 +1,138 @@
+import fnmatch
+from typing import Any, Dict
+
+
+class _Commands:
+    """In-memory implementation of Redis commands used by bot."""
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.ttls: Dict[str, int] = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def keys(self, pattern):
+        return [key for key in self.data if fnmatch.fnmatch(key, pattern)]
+
+    def flushdb(self):
+        self.data.clear()
+
+    def expire(self, key, seconds):
+        if key not in self.data:
+            return False
+        self.ttls[key] = seconds
+        return True
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        data = self.data.setdefault(key, {})
+        if mapping:
+            data.update(mapping)
+        if field is not None:
+            data[field] = value
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hmget(self, key, fields):
+        data = self.data.get(key, {})
+        return [data.get(field) for field in fields]
+
+    def hdel(self, key, *fields):
+        data = self.data.get(key, {})
+        return sum(data.pop(field, None) is not None for field in fields)
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        return self.hdel(key, *members)
+
+    def zrangebyscore(self, key, min, max):
+        scores = self.data.get(key, {})
+        return sorted(
+            (m for m, s in scores.items() if float(min) <= s <= float(max)),
+            key=scores.get
+        )
+
+    def zremrangebyscore(self, key, min, max):
+        return self.zrem(key, *self.zrangebyscore(key, min, max))
+
+    def lpush(self, key, value):
+        self.data.setdefault(key, []).insert(0, value)
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:end + 1]
+
+    def lrange(self, key, start, end):
+        values = self.data.get(key, [])
+        return values[start:] if end == -1 else values[start:end + 1]
+
+    def lrem(self, key, count, value):
+        self.data[key] = [v for v in self.data.get(key, []) if v != value]
+
+    def rpoplpush(self, source, destination):
+        if not self.data.get(source):
+            return None
+        value = self.data[source].pop()
+        self.lpush(destination, value)
+        return value
+
+    def brpoplpush(self, source, destination, timeout):
+        return self.rpoplpush(source, destination)
+
+
+class FakeRedis:
+    """
+    Async in-memory Redis client counting round trips to server,
+    commands of pipeline are sent in one round trip.
+    """
+
+    def __init__(self):
+        self.commands = _Commands()
+        self.round_trips = 0
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self.commands.data
+
+    def pipeline(self, transaction: bool = True) -> 'FakePipeline':
+        return FakePipeline(self)
+
+    async def close(self):
+        pass
+
+    def __getattr__(self, name):
+        command = getattr(self.commands, name)
+
+        async def call(*args, **kwargs):
+            self.round_trips += 1
+            return command(*args, **kwargs)
+        return call
+
+
+class FakePipeline:
+
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._queued = []
+
+    async def execute(self):
+        self._redis.round_trips += 1
+        queued, self._queued = self._queued, []
+        return [command(*args, **kwargs) for command, args, kwargs in queued]
+
+    def __getattr__(self, name):
+        command = getattr(self._redis.commands, name)
+
+        def queue(*args, **kwargs):
+            self._queued.append((command, args, kwargs))
+            return self
+        return queue
@@ -1,23 +1,27 @@
 import os
+import shutil
+import sqlite3
 import subprocess
+import tempfile
 import unittest
 from unittest.mock import patch
 
 from dotenv import load_dotenv
-from mysql.connector import connect, Error
 
 
 ENV_FILE = '.env'
 SQL_FOLDER = 'sql'
 CREATEDB_FILE = 'createdb.sql'
+SQLITE_FOLDER = 'sqlite'
 
 path = os.path.join(os.getcwd(), ENV_FILE)
-if not os.path.exists(path):
-    raise FileNotFoundError(f'Failed to find {ENV_FILE} file with path: {path}')
-
-load_dotenv(path)
+if os.path.exists(path):
+    load_dotenv(path)
 from bot.database.config import db_config
+from bot.database.engine import SQLITE
 
+# Tests run on temporary SQLite database unless mysql is set
+TEST_DB_ENGINE = os.getenv('TEST_DB_ENGINE', SQLITE)
 TEST_DB_NAME = os.getenv('TEST_DB_NAME')
 
 
@@ -27,19 +31,36 @@ class MockDb(unittest.TestCase):
     def setUpClass(cls) -> None:
         cls._config = db_config.copy()
         del cls._config['database']
+        del cls._config['engine']
 
-        cls._create_db()
-        cls._create_db_structure()
+        if TEST_DB_ENGINE == SQLITE:
+            cls._sqlite_dir = tempfile.mkdtemp()
+            database = os.path.join(cls._sqlite_dir, 'test.sqlite3')
+            cls._create_sqlite_db(database)
+        else:
+            database = TEST_DB_NAME
+            cls._create_db()
+            cls._create_db_structure()
 
         new_config = db_config.copy()
-        new_config['database'] = TEST_DB_NAME
+        new_config['engine'] = TEST_DB_ENGINE
+        new_config['database'] = database
         cls.mock_db_config = patch.dict(db_config, new_config)
 
     # def test_method(self):
     #     self.assertEqual(1, 1)
 
+    @classmethod
+    def _create_sqlite_db(cls, database: str):
+        data = cls._get_data_from_file(SQLITE_FOLDER)
+        with sqlite3.connect(database) as connection:
+            connection.executescript(data.decode())
+        connection.close()
+
     @classmethod
     def _create_db(cls):
+        from mysql.connector import connect, Error
+
         try:
             with connect(**cls._config) as connection:
                 with connection.cursor() as cursor:
@@ -70,8 +91,8 @@ class MockDb(unittest.TestCase):
             print(f'DB structure have been successfully created')
 
     @staticmethod
-    def _get_data_from_file() -> str:
-        filepath = os.path.join(os.getcwd(), SQL_FOLDER, CREATEDB_FILE)
+    def _get_data_from_file(*folders: str) -> str:
+        filepath = os.path.join(os.getcwd(), SQL_FOLDER, *folders, CREATEDB_FILE)
         if not os.path.exists(filepath):
             raise FileNotFoundError(
                 f'Failed to find {CREATEDB_FILE} with path: {filepath}'
@@ -83,6 +104,8 @@ class MockDb(unittest.TestCase):
 
     @classmethod
     def _drop_db(cls):
+        from mysql.connector import connect, Error
+
         try:
             with connect(**cls._config) as connection:
                 with connection.cursor() as cursor:
@@ -96,4 +119,7 @@ class MockDb(unittest.TestCase):
 
     @classmethod
     def tearDownClass(cls) -> None:
-        cls._drop_db()
+        if TEST_DB_ENGINE == SQLITE:
+            shutil.rmtree(cls._sqlite_dir)
+        else:
+            cls._drop_db()
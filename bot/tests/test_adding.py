@@ -0,0 +1,172 @@
+from bot.tests.mock_db import MockDb # must be imported before tested functions
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from bot.database import product_gateway, user_gateway
+from bot.entities import Product, ProductOption, User, unpack_availability
+from bot.exceptions import (
+    DataAlreadyExistsInDBError,
+    InvalidUserInputError,
+    ServiceOperationFailedError
+)
+from bot.services import product_service
+from bot.tasks import adding
+from bot.tests.fake_redis import FakeRedis
+from bot.utils import job_queue
+from bot.utils.job_queue import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_RUNNING,
+    AddJob,
+    AddJobQueue
+)
+from bot.views.add_jobs import render_add_jobs
+
+
+class TestAddJobQueue(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.redis = FakeRedis()
+        self.queue = AddJobQueue(redis=self.redis)
+
+    def test_job_lifecycle(self):
+        """Tests that job is taken, tracked and finished"""
+        async def run():
+            job = await self.queue.put(1, 'https://www.petheaven.co.za/dog.html')
+            taken = await self.queue.take()
+            self.assertEqual(taken.id, job.id)
+            self.assertEqual((await self.queue.get(job.id)).status, JOB_RUNNING)
+            self.assertIsNone(await self.queue.take())
+
+            await self.queue.finish(taken, 'not_found')
+            finished = await self.queue.get(job.id)
+            self.assertEqual((finished.status, finished.error), (JOB_FAILED, 'not_found'))
+            self.assertEqual(self.redis.data[self.queue.processing_key], [])
+            self.assertEqual(
+                [j.id for j in await self.queue.find_user_jobs(1)], [job.id]
+            )
+        asyncio.run(run())
+
+    def test_job_is_queued_in_one_transaction(self):
+        """Tests that job is saved with TTL and queued in one round trip"""
+        job = asyncio.run(self.queue.put(1, 'https://www.petheaven.co.za/dog.html'))
+        self.assertEqual(self.redis.round_trips, 1)
+        self.assertEqual(self.redis.data[self.queue.queue_key], [job.id])
+        self.assertEqual(
+            self.redis.commands.ttls[self.queue._job_key(job.id)],
+            job_queue.JOB_TTL
+        )
+
+    def test_unfinished_jobs_are_requeued(self):
+        """Tests that jobs taken before restart are queued again"""
+        async def run():
+            job = await self.queue.put(1, 'https://www.petheaven.co.za/dog.html')
+            await self.queue.take()
+            self.assertEqual(await self.queue.requeue_unfinished(), 1)
+            self.assertEqual((await self.queue.take()).id, job.id)
+        asyncio.run(run())
+
+
+class TestEnqueueAdd(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.queue = AddJobQueue(redis=FakeRedis())
+        patch.object(product_service, 'add_job_queue', self.queue).start()
+        self.addCleanup(patch.stopall)
+
+    def test_product_url_is_queued_normalized(self):
+        """Tests that product url is queued in canonical form"""
+        job = asyncio.run(product_service.enqueue_add(
+            ' http://petheaven.co.za/dog.html?utm_source=x ', 1
+        ))
+        self.assertEqual(job.url, 'https://www.petheaven.co.za/dog.html')
+
+    def test_invalid_url_is_not_queued(self):
+        """Tests that text other than product url is rejected before queueing"""
+        for text in (
+            'https://example.com/dog.html',
+            '<b>https://www.petheaven.co.za/dog.html</b>',
+            'dog food'
+        ):
+            with self.assertRaises(InvalidUserInputError):
+                asyncio.run(product_service.enqueue_add(text, 1))
+        self.assertEqual(asyncio.run(self.queue.find_user_jobs(1)), [])
+
+    def test_job_urls_are_escaped(self):
+        """Tests that job urls are escaped in HTML list of jobs"""
+        job = AddJob('1', 1, 'https://www.petheaven.co.za/a&b<i>.html')
+        self.assertIn(
+            'https://www.petheaven.co.za/a&amp;b&lt;i&gt;.html',
+            render_add_jobs([job])
+        )
+
+
+class TestAddProduct(MockDb):
+
+    def setUp(self) -> None:
+        self.user = User(1, 'jackdoe', 'Jack', 'Doe')
+        self.product = Product(
+            None, 'Acana', 'Description', 'dog.png', 'Title', 'Dog Food',
+            4.5, 10, 'https://www.petheaven.co.za/dog.html',
+            [ProductOption(None, unpack_availability('JHB:3'), '2kg', 199)]
+        )
+        self.scrape = patch.object(
+            product_service.scrape_pool, 'scrape', AsyncMock(return_value=self.product)
+        ).start()
+        self.addCleanup(patch.stopall)
+
+    def test_removed_cached_product_is_scraped_again(self):
+        """Tests that id of cached product isn't used after product is removed"""
+        with self.mock_db_config:
+            user_gateway.save(self.user)
+            product_id = product_gateway.insert_or_get(self.product)
+            asyncio.run(product_service.product_cache.set(
+                self.product._replace(id=product_id)
+            ))
+            product_gateway.remove_by_ids([product_id])
+
+            asyncio.run(product_service.add(self.product.url, self.user.id))
+            products = product_gateway.find_all_from_monitoring_list(self.user.id)
+            self.assertEqual([p.url for p in products], [self.product.url])
+            self.scrape.assert_called_once()
+
+    def test_failed_link_raises_error(self):
+        """Tests that adding fails when product isn't linked with user"""
+        with self.mock_db_config:
+            with patch.object(
+                product_gateway, 'add_to_monitoring_list', return_value=False
+            ):
+                with self.assertRaises(ServiceOperationFailedError):
+                    asyncio.run(product_service.add(self.product.url, self.user.id))
+
+
+class TestProcessAddJob(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.queue = AddJobQueue(redis=FakeRedis())
+        patch.object(adding, 'add_job_queue', self.queue).start()
+        self.add = patch.object(adding.product_service, 'add', AsyncMock()).start()
+        self.addCleanup(patch.stopall)
+        self.bot = AsyncMock()
+
+    def process(self) -> str:
+        async def run():
+            await self.queue.put(1, 'https://www.petheaven.co.za/dog.html')
+            return await adding.process_add_job(self.bot, await self.queue.take())
+        return asyncio.run(run())
+
+    def test_user_is_notified_about_added_product(self):
+        """Tests that user gets follow-up message when product is added"""
+        self.assertEqual(self.process(), '')
+        job, = asyncio.run(self.queue.find_user_jobs(1))
+        self.assertEqual(job.status, JOB_DONE)
+        user_id, text = self.bot.send_message.call_args.args
+        self.assertEqual(user_id, 1)
+        self.assertIn('dog.html', text)
+
+    def test_already_added_product(self):
+        """Tests that already added product finishes job with error"""
+        self.add.side_effect = DataAlreadyExistsInDBError
+        self.assertEqual(self.process(), adding.ADD_JOB_ERROR_ALREADY_ADDED)
+        self.bot.send_message.assert_called_once()
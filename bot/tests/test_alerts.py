@@ -0,0 +1,51 @@
+import unittest
+from decimal import Decimal
+
+from bot.entities import Product, ProductOption, unpack_availability
+from bot.utils.alerts import build_alert_indexes
+
+
+def make_product(price: str, availability: str = 'JHB:3') -> Product:
+    options = [ProductOption(1, unpack_availability(availability), '300g', Decimal(price))]
+    return Product(
+        1, 'Adaptil', 'Description', 'cat.png', 'Title',
+        'Cat Food', 3.43, 7, 'https://www.cat.com', options
+    )
+
+
+class TestAlertIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        monitoring_list = [
+            (1, 1, 'any', None),
+            (2, 1, 'below', Decimal('90')),
+            (3, 1, 'below', Decimal('50')),
+            (4, 1, 'below', Decimal('100')),
+            (5, 1, 'drop_pct', Decimal('10')),
+            (6, 1, 'drop_pct', Decimal('30')),
+            (7, 1, 'in_stock', None),
+        ]
+        self.index = build_alert_indexes(monitoring_list)[1]
+
+    def test_price_drop(self):
+        """Tests rules matched by price drop from 100 to 80"""
+        matched = self.index.match(make_product('100'), make_product('80'))
+        # Rule "below 50" is not matched as price is still above 50
+        self.assertEqual(matched, {1, 2, 4, 5})
+
+    def test_price_already_below(self):
+        """Tests that rule is not matched again once price is below threshold"""
+        matched = self.index.match(make_product('80'), make_product('70'))
+        self.assertEqual(matched, {1, 5})
+
+    def test_price_increase(self):
+        """Tests that only "any" rules match price increase"""
+        matched = self.index.match(make_product('80'), make_product('100'))
+        self.assertEqual(matched, {1})
+
+    def test_back_in_stock(self):
+        """Tests rules matched by product coming back in stock"""
+        matched = self.index.match(
+            make_product('100', 'JHB:1'), make_product('100')
+        )
+        self.assertEqual(matched, {1, 7})
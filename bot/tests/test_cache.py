@@ -0,0 +1,74 @@
+import asyncio
+import unittest
+from decimal import Decimal
+
+from bot.entities import Product, ProductOption, unpack_availability
+from bot.utils.cache import ProductCache, _dumps_product, _loads_product
+
+
+def make_product(url: str, description: str = 'Description') -> Product:
+    options = [ProductOption(None, unpack_availability('JHB:3'), '300g', Decimal('100.5'))]
+    return Product(
+        None, 'Adaptil', description, 'cat.png', 'Title',
+        'Cat Food', 3.43, 7, url, options
+    )
+
+
+class TestProductCache(unittest.TestCase):
+
+    def test_get_and_stats(self):
+        """Tests that hits and misses are counted"""
+        async def run():
+            cache = ProductCache(ttl=60)
+            await cache.set(make_product('a'))
+            return (
+                await cache.get('a'), await cache.get('b'),
+                await cache.get('a', bypass=True), cache.stats
+            )
+
+        hit, miss, bypassed, stats = asyncio.run(run())
+        self.assertEqual(hit.url, 'a')
+        self.assertIsNone(miss)
+        self.assertIsNone(bypassed)
+        self.assertEqual((stats.hits, stats.misses), (1, 1))
+        self.assertEqual(stats.hit_ratio, 0.5)
+
+    def test_expired_entry_is_dropped(self):
+        """Tests that entries are not returned after ttl"""
+        async def run():
+            cache = ProductCache(ttl=0)
+            await cache.set(make_product('a'))
+            return await cache.get('a'), cache.stats
+
+        product, stats = asyncio.run(run())
+        self.assertIsNone(product)
+        self.assertEqual(stats.entries, 0)
+
+    def test_lru_eviction(self):
+        """Tests that least recently used entries are evicted first"""
+        async def run():
+            cache = ProductCache(ttl=60, max_entries=2)
+            await cache.set(make_product('a'))
+            await cache.set(make_product('b'))
+            await cache.get('a')
+            await cache.set(make_product('c'))
+            return [await cache.get(url) is not None for url in 'abc']
+
+        self.assertEqual(asyncio.run(run()), [True, False, True])
+
+    def test_size_bound(self):
+        """Tests that cache size stays within max_bytes"""
+        async def run():
+            cache = ProductCache(ttl=60, max_bytes=4096)
+            for i in range(10):
+                await cache.set(make_product(str(i), 'x' * 1000))
+            return cache.stats
+
+        stats = asyncio.run(run())
+        self.assertLessEqual(stats.size_bytes, 4096)
+        self.assertGreater(stats.evictions, 0)
+
+    def test_serialization(self):
+        """Tests that product survives Redis serialization"""
+        product = make_product('a')._replace(id=3)
+        self.assertEqual(tuple(_loads_product(_dumps_product(product))), tuple(product))
@@ -0,0 +1,81 @@
+import asyncio
+import unittest
+
+from bot.utils.common import extract_urls, normalize_url
+from bot.utils.singleflight import SingleFlight
+
+
+class TestNormalizeUrl(unittest.TestCase):
+
+    def test_strips_query_and_fragment(self):
+        """Tests that query string and fragment are removed"""
+        self.assertEqual(
+            normalize_url('https://www.petheaven.co.za/dog.html?utm_source=x#reviews'),
+            'https://www.petheaven.co.za/dog.html'
+        )
+
+    def test_canonicalizes_host(self):
+        """Tests that scheme, host and port are canonicalized"""
+        expected = 'https://www.petheaven.co.za/dog.html'
+        for url in (
+            'http://petheaven.co.za/dog.html',
+            'HTTPS://WWW.PetHeaven.co.za:443/dog.html',
+            ' www.petheaven.co.za/dog.html ',
+        ):
+            self.assertEqual(normalize_url(url), expected)
+
+
+class TestExtractUrls(unittest.TestCase):
+
+    def test_urls_are_normalized_and_deduplicated(self):
+        """Tests extraction of product urls from pasted list and csv"""
+        text = (
+            'url,title\n'
+            'https://www.petheaven.co.za/dog.html?utm_source=x,"Dog"\n'
+            'petheaven.co.za/dog.html; http://m.petheaven.co.za/cat.html\n'
+            'https://example.com/fish.html'
+        )
+        self.assertEqual(extract_urls(text), [
+            'https://www.petheaven.co.za/dog.html',
+            'https://www.petheaven.co.za/cat.html'
+        ])
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_share_result(self):
+        """Tests that concurrent calls with the same key run once"""
+        calls = 0
+
+        async def scrape():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        async def run():
+            flight = SingleFlight()
+            return await asyncio.gather(
+                *(flight.do('url', scrape) for _ in range(5))
+            )
+
+        self.assertEqual(asyncio.run(run()), [1] * 5)
+        self.assertEqual(calls, 1)
+
+    def test_error_is_shared_and_key_released(self):
+        """Tests that error is raised for all callers and key is released"""
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError
+
+        async def run():
+            flight = SingleFlight()
+            results = await asyncio.gather(
+                *(flight.do('url', fail) for _ in range(3)),
+                return_exceptions=True
+            )
+            return results, 'url' in flight
+
+        results, in_flight = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertFalse(in_flight)
@@ -0,0 +1,140 @@
+import asyncio
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+from bot.entities import DELIVERY_HOURLY, Notification
+from bot.tasks import digest
+
+from bot.utils.rate_limiter import ChatRateLimiter, RateLimiter
+from bot.views.product_notification import (
+    MAX_MESSAGE_LENGTH,
+    render_digest_pages
+)
+
+
+class TestDigestPages(unittest.TestCase):
+
+    def test_single_page(self):
+        """Tests that short messages are joined into one page"""
+        pages = render_digest_pages(['<b>First</b>\n', '<b>Second</b>\n'])
+        self.assertEqual(len(pages), 1)
+        self.assertIn('<b>First</b>\n\n<b>Second</b>', pages[0][0])
+        self.assertEqual(pages[0][1], 2)
+
+    def test_pages_fit_limit(self):
+        """Tests that pages fit Telegram limit and keep every message"""
+        messages = [f'📬<b>Product {i}</b>\n' + 'x' * 500 for i in range(30)]
+        pages = render_digest_pages(messages)
+
+        self.assertGreater(len(pages), 1)
+        for page, _ in pages:
+            self.assertLessEqual(len(page.encode('utf-16-le')) // 2, MAX_MESSAGE_LENGTH)
+        self.assertIn(f'(1/{len(pages)})', pages[0][0])
+        done = [done for _, done in pages]
+        self.assertEqual(done, sorted(done))
+        self.assertEqual(done[-1], 30)
+        joined = ''.join(page for page, _ in pages)
+        for i in range(30):
+            self.assertIn(f'<b>Product {i}</b>', joined)
+
+    def test_long_message_is_split_by_lines(self):
+        """Tests splitting of message longer than limit"""
+        message = '\n'.join(f'<b>Line {i}</b> ' + 'y' * 90 for i in range(100))
+        pages = render_digest_pages([message])
+
+        self.assertGreater(len(pages), 1)
+        # Message is included fully only in the last page
+        self.assertEqual([done for _, done in pages], [0] * (len(pages) - 1) + [1])
+        for page, _ in pages:
+            self.assertEqual(page.count('<b>'), page.count('</b>'))
+
+
+class TestDeferDigestNotifications(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.find_digest_users = patch.object(
+            digest.user_gateway, 'find_digest_users', return_value={}
+        ).start()
+        self.gateway = patch.object(digest, 'notification_gateway').start()
+        self.addCleanup(patch.stopall)
+
+    def test_given_digest_users_are_not_loaded(self):
+        """Tests that digest users loaded once per cycle aren't queried again"""
+        notifications = [Notification(1, None, 'a'), Notification(2, None, 'b')]
+        instant = digest.defer_digest_notifications(
+            notifications, {2: DELIVERY_HOURLY}
+        )
+
+        self.assertEqual(instant, notifications[:1])
+        self.gateway.add_pending.assert_called_once_with([(2, 'b')])
+        self.find_digest_users.assert_not_called()
+
+
+class TestSendDigest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.now = datetime.now()
+        self.gateway = patch.object(digest, 'notification_gateway').start()
+        self.gateway.find_pending.return_value = [(1, 'a'), (2, 'b'), (3, 'c')]
+        patch.object(digest, 'SECONDS_BETWEEN_PAGES', 0).start()
+        patch.object(digest, 'render_digest_pages', return_value=[
+            ('page 1', 1), ('page 2', 2), ('page 3', 3)
+        ]).start()
+        self.addCleanup(patch.stopall)
+
+    def send_digest(self, *results):
+        send = AsyncMock(side_effect=results)
+        with patch.object(digest.Notification, 'send', send):
+            asyncio.run(digest._send_digest(None, 7, self.now))
+        return send.await_count
+
+    def test_failed_page_keeps_rest_pending(self):
+        """Tests that only notifications of delivered pages are completed"""
+        with self.assertRaises(RuntimeError):
+            self.send_digest(True, RuntimeError('failed'))
+        self.gateway.complete_digest.assert_called_once_with(7, 1, None)
+
+    def test_deactivated_user_stops_digest(self):
+        """Tests that pages aren't sent after user was deactivated"""
+        self.assertEqual(self.send_digest(True, False, True), 2)
+        self.gateway.complete_digest.assert_called_once_with(7, 1, None)
+
+    def test_complete_digest(self):
+        """Tests that time of digest is set once all pages are sent"""
+        self.assertEqual(self.send_digest(True, True, True), 3)
+        self.gateway.complete_digest.assert_called_once_with(7, 3, self.now)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_rate_is_limited(self):
+        """Tests that operations over burst wait for tokens"""
+        async def run():
+            limiter = RateLimiter(50, burst=5)
+            start = time.monotonic()
+            for _ in range(15):
+                await limiter.acquire()
+            return time.monotonic() - start
+
+        # 5 operations are allowed at once, 10 more take 0.2 sec
+        self.assertGreaterEqual(asyncio.run(run()), 0.18)
+
+    def test_chats_are_limited_separately(self):
+        """Tests that busy chat waits while other chats don't"""
+        async def run():
+            limiter = ChatRateLimiter(20, burst=1, max_chats=2)
+            start = time.monotonic()
+            for chat_id in (1, 2, 3):
+                await limiter.acquire(chat_id)
+            other_chats = time.monotonic() - start
+            for _ in range(3):
+                await limiter.acquire(3)
+            return other_chats, time.monotonic() - start, len(limiter._limiters)
+
+        other_chats, same_chat, chats = asyncio.run(run())
+        self.assertLess(other_chats, 0.04)
+        # 3 more messages to the same chat take 0.15 sec
+        self.assertGreaterEqual(same_chat, 0.13)
+        self.assertEqual(chats, 2)
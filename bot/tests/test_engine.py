@@ -0,0 +1,152 @@
+from bot.tests.mock_db import MockDb # must be imported before tested functions
+import sqlite3
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from bot.database import product_gateway, user_gateway
+from bot.database import engine
+from bot.database.engine import connect, is_duplicate_entry
+from bot.entities import Product, ProductOption, User, unpack_availability
+from bot.exceptions import DataAlreadyExistsInDBError
+
+
+class TestEngineSemantics(MockDb):
+    """Tests of queries having variants for MySQL and SQLite"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User(1, 'jackdoe', 'Jack', 'Doe')
+        cls.product = Product(
+            None, 'Acana', 'Description', 'dog.png', 'Title', 'Dog Food',
+            4.5, 10, 'https://www.dog.com',
+            [ProductOption(None, unpack_availability('JHB:3'), '2kg', Decimal('199.90'))],
+            'fingerprint'
+        )
+        with cls.mock_db_config:
+            user_gateway.save(cls.user)
+            product_gateway.add(cls.user.id, cls.product)
+            cls.saved = product_gateway.find_by_url(cls.product.url, True)
+
+    def query(self, query: str, *params) -> list:
+        with connect() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                connection.commit()
+                return rows
+
+    def test_duplicate_entry(self):
+        """Tests that adding product twice to list raises error"""
+        with self.mock_db_config:
+            with self.assertRaises(DataAlreadyExistsInDBError):
+                product_gateway.add_to_monitoring_list(self.user.id, self.saved.id)
+
+    def test_types(self):
+        """Tests that prices and times are read back as Decimal and datetime"""
+        with self.mock_db_config:
+            option = product_gateway.find_options_by_id(self.saved.id)[0]
+            self.assertEqual(option.price, Decimal('199.90'))
+            self.assertIsInstance(option.price, Decimal)
+            (created_at,), = self.query(
+                'SELECT created_at FROM products WHERE id = %s', self.saved.id
+            )
+            self.assertIsInstance(created_at, datetime)
+
+    def test_update_product(self):
+        """Tests that file id is reset and change time is set only on changes"""
+        with self.mock_db_config:
+            product_gateway.set_img_file_id(self.saved.id, self.saved.img, 'file-id')
+            changed_at_query = 'SELECT options_changed_at FROM products WHERE id = %s'
+            self.query('UPDATE products SET options_changed_at = %s', datetime(2022, 1, 1))
+
+            product_gateway.update_products([self.saved._replace(title='New Title')])
+            self.assertEqual(product_gateway.find_img_file_ids([self.saved.id]), {
+                self.saved.id: 'file-id'
+            })
+            self.assertEqual(
+                self.query(changed_at_query, self.saved.id), [(datetime(2022, 1, 1),)]
+            )
+
+            product_gateway.update_products([self.saved._replace(
+                img='cat.png', options_fingerprint='new fingerprint'
+            )])
+            self.assertEqual(product_gateway.find_img_file_ids([self.saved.id]), {})
+            (changed_at,), = self.query(changed_at_query, self.saved.id)
+            self.assertTrue(changed_at > datetime.now() - timedelta(minutes=1))
+
+    def test_update_products_history(self):
+        """Tests that history is written for saved options by their ids"""
+        option = self.saved.product_options[0]
+        duplicate = ProductOption(None, option.availability, option.title, Decimal('99.90'))
+        started_at = datetime.now().replace(microsecond=0)
+        with self.mock_db_config:
+            product_gateway.update_products(
+                [self.saved._replace(product_options=[
+                    option._replace(price=Decimal('149.90')), duplicate
+                ])],
+                {self.saved.id: self.saved}
+            )
+            rows = self.query(
+                'SELECT option_id, price_cents FROM option_history '
+                'WHERE product_id = %s AND recorded_at >= %s ORDER BY price_cents',
+                self.saved.id, started_at
+            )
+            options = product_gateway.find_options_by_id(self.saved.id)
+            self.assertEqual(len(options), 2)
+            duplicate_id, = [opt.id for opt in options if opt.id != option.id]
+            self.assertEqual(rows, [(duplicate_id, 9990), (option.id, 14990)])
+
+    def test_remove_orphaned_products(self):
+        """Tests that only limit of old products without watchers are removed"""
+        with self.mock_db_config:
+            for i in range(3):
+                product_gateway.insert_or_get(self.product._replace(url=f'https://www.orphan.com/{i}'))
+
+            self.assertEqual(product_gateway.remove_orphaned_products(datetime.now(), 100), 0)
+            self.query('UPDATE products SET created_at = %s', datetime(2022, 1, 1))
+            self.assertEqual(product_gateway.remove_orphaned_products(datetime.now(), 2), 2)
+            self.assertEqual(product_gateway.remove_orphaned_products(datetime.now(), 2), 1)
+            self.assertTrue(product_gateway.find_by_url(self.product.url))
+
+    def test_compact_option_history(self):
+        """Tests that only the last change of old days is kept"""
+        option_id = self.saved.product_options[0].id
+        day = datetime(2022, 3, 1)
+        with self.mock_db_config:
+            self.query('DELETE FROM option_history')
+            for recorded_at in (day, day + timedelta(hours=1), day + timedelta(days=200)):
+                self.query(
+                    'INSERT INTO option_history VALUES (%s, %s, %s, %s, %s)',
+                    self.saved.id, option_id, recorded_at, 19990, 3
+                )
+
+            removed = product_gateway.compact_option_history(
+                day + timedelta(days=100), datetime(2021, 1, 1)
+            )
+            self.assertEqual(removed, 1)
+            series = product_gateway.get_price_series(self.saved.id)
+            self.assertEqual(
+                [point.recorded_at for point in series[option_id]],
+                [day + timedelta(hours=1), day + timedelta(days=200)]
+            )
+            self.assertEqual(series[option_id][0].price, Decimal('199.90'))
+
+
+class TestDuplicateEntry(unittest.TestCase):
+    """Tests of telling duplicate key errors of both drivers"""
+
+    def test_without_mysql_driver(self):
+        """Tests that errors are checked when MySQL driver isn't installed"""
+        with patch.object(engine, 'mysql', None), patch.dict(vars(engine)):
+            # Like failed import, which leaves errorcode undefined
+            del vars(engine)['errorcode']
+            self.assertTrue(is_duplicate_entry(
+                sqlite3.IntegrityError('UNIQUE constraint failed: users.id')
+            ))
+            self.assertFalse(is_duplicate_entry(
+                sqlite3.IntegrityError('FOREIGN KEY constraint failed')
+            ))
+            self.assertFalse(is_duplicate_entry(sqlite3.OperationalError('locked')))
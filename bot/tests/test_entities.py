@@ -0,0 +1,23 @@
+import unittest
+from decimal import Decimal
+
+from bot.entities import Product, ProductOption
+
+
+def make_product(url: str = 'https://www.cat.com') -> Product:
+    options = [ProductOption(1, 'JHB: In stock', '300g', Decimal('100'))]
+    return Product(
+        1, 'Adaptil', 'Description', 'cat.png', 'Title',
+        'Cat Food', 3.43, 7, url, options
+    )
+
+
+class TestProduct(unittest.TestCase):
+
+    def test_products_compared_by_url(self):
+        """Tests that scraped product equals old one despite changes"""
+        old = make_product()
+        scraped = old._replace(id=None, img='dog.png')
+        self.assertTrue(old == scraped)
+        self.assertFalse(old != scraped)
+        self.assertTrue(old != make_product('https://www.dog.com'))
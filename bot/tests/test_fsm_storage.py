@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+
+from aiogram.dispatcher.storage import FSMContext
+
+from bot.tests.fake_redis import FakeRedis
+from bot.utils.fsm_storage import RedisHashStorage, get_fields, set_fields
+from bot.utils.handlers import change_page, select_product, start_paging
+from bot.utils.keyboard import CHECKED_MARK, page_keyboards
+
+
+PRODUCTS = [{'id': id, 'title': f'Product {id}'} for id in range(1, 13)]
+
+
+class TestRedisHashStorage(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.redis = FakeRedis()
+        self.storage = RedisHashStorage(redis=self.redis)
+        self.state = FSMContext(self.storage, chat=1, user=1)
+
+    def test_data_is_stored_by_fields(self):
+        """Tests that fields are read and updated without the rest of data"""
+        async def run():
+            await self.state.set_data({'products': PRODUCTS, 'current_page': 1})
+            self.assertEqual(
+                await self.state.get_data(),
+                {'products': PRODUCTS, 'current_page': 1}
+            )
+
+            self.redis.round_trips = 0
+            await self.state.update_data(current_page=2)
+            data = await set_fields(self.state, {'checked_products': [1]}, 'current_page')
+            self.assertEqual(data, {'current_page': 2})
+            self.assertEqual(self.redis.round_trips, 2)
+
+            self.assertEqual(
+                await get_fields(self.state, 'checked_products', 'missing'),
+                {'checked_products': [1], 'missing': None}
+            )
+
+            await self.state.set_data({})
+            self.assertEqual(await self.state.get_data(), {})
+        asyncio.run(run())
+
+    def test_state(self):
+        """Tests that state is set and reset"""
+        async def run():
+            await self.state.set_state('MonitorProducts:on_adding_product')
+            self.assertEqual(
+                await self.state.get_state(), 'MonitorProducts:on_adding_product'
+            )
+            await self.state.reset_state(with_data=False)
+            self.assertIsNone(await self.state.get_state())
+        asyncio.run(run())
+
+
+class TestPagingState(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.redis = FakeRedis()
+        self.state = FSMContext(RedisHashStorage(redis=self.redis), chat=1, user=1)
+        asyncio.run(self.state.set_data({'products': PRODUCTS}))
+        self.addCleanup(page_keyboards.clear, 1)
+
+    def test_select_takes_two_round_trips(self):
+        """Tests that select reads and updates only fields of paging"""
+        async def run():
+            await start_paging(1, self.state)
+            await change_page(1, 2, self.state)
+
+            self.redis.round_trips = 0
+            keyboard = await select_product(1, 7, self.state)
+            self.assertEqual(self.redis.round_trips, 2)
+            self.assertEqual(keyboard.inline_keyboard[1][0].text, CHECKED_MARK + 'Product 7')
+
+            # Keyboard isn't cached, so products are read with update
+            page_keyboards.clear(1)
+            self.redis.round_trips = 0
+            keyboard = await select_product(1, 8, self.state)
+            self.assertEqual(self.redis.round_trips, 2)
+            self.assertEqual(
+                [row[0].text for row in keyboard.inline_keyboard[1:3]],
+                [CHECKED_MARK + 'Product 7', CHECKED_MARK + 'Product 8']
+            )
+
+            data = await get_fields(self.state, 'checked_products', 'current_page')
+            self.assertEqual(set(data['checked_products']), {7, 8})
+            self.assertEqual(data['current_page'], 2)
+        asyncio.run(run())
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import aiohttp
+
+from bot.exceptions import ProductNotFoundError, RequestFailedError
+from bot.scraper import Scraper
+from bot.utils.http_archive import HttpArchive, ReplaySession
+
+
+URL = 'https://www.petheaven.co.za/dog-food.html'
+MISSING_URL = 'https://www.petheaven.co.za/cat-food.html'
+
+
+class TestHttpArchive(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.archive = HttpArchive()
+        self.archive.add(URL, 200, '<h1>Dog Food</h1>')
+        self.archive.add(MISSING_URL, 404, '')
+
+    def get_html(self, session: ReplaySession, url: str) -> str:
+        return asyncio.run(Scraper(url).get_html(session))
+
+    def test_save_and_load(self):
+        """Tests that archive is the same after saving and loading"""
+        path = os.path.join(tempfile.mkdtemp(), 'archive.json.gz')
+        self.archive.save(path)
+        self.assertEqual(HttpArchive.load(path).responses, self.archive.responses)
+
+    def test_replay(self):
+        """Tests that scraper gets recorded responses"""
+        session = ReplaySession(self.archive)
+        self.assertEqual(self.get_html(session, URL), '<h1>Dog Food</h1>')
+        with self.assertRaises(ProductNotFoundError):
+            self.get_html(session, MISSING_URL)
+        with self.assertRaises(aiohttp.ClientConnectionError):
+            self.get_html(session, 'https://www.petheaven.co.za/not-recorded.html')
+
+    def test_injected_errors(self):
+        """Tests that injected errors are reproducible with the same seed"""
+        def run(seed: int) -> list:
+            session = ReplaySession(self.archive, error_rate=0.5, seed=seed)
+            errors = []
+            for _ in range(20):
+                try:
+                    self.get_html(session, URL)
+                    errors.append(None)
+                except (asyncio.TimeoutError, aiohttp.ClientError, RequestFailedError) as e:
+                    errors.append(type(e).__name__)
+            return errors
+
+        errors = run(seed=1)
+        self.assertEqual(errors, run(seed=1))
+        self.assertIn(None, errors)
+        self.assertEqual(
+            {e for e in errors if e},
+            {'TimeoutError', 'ClientConnectionError', 'RequestFailedError'}
+        )
@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from bot.entities import Product
+from bot.tasks import importing
+from bot.utils.scrape_pool import ScrapePool
+
+
+def make_product(url: str) -> Product:
+    return Product(
+        None, 'Adaptil', 'Description', 'cat.png', 'Title',
+        'Cat Food', 3.43, 7, url, []
+    )
+
+
+URLS = [f'https://www.petheaven.co.za/product-{i}.html' for i in range(5)]
+
+
+class TestImportProducts(unittest.TestCase):
+
+    def setUp(self) -> None:
+        gateway = 'bot.tasks.importing.product_gateway'
+        self.find_ids = patch(f'{gateway}.find_ids_by_urls').start()
+        self.insert_many = patch(f'{gateway}.insert_many').start()
+        self.add_many = patch(f'{gateway}.add_many_to_monitoring_list').start()
+        self.scrape = patch.object(importing.scrape_pool, 'scrape').start()
+        patch.object(importing.product_cache, 'get', AsyncMock(return_value=None)).start()
+        patch.object(importing.product_cache, 'set', AsyncMock()).start()
+        patch.object(importing, 'IMPORT_BATCH_SIZE', 2).start()
+        self.addCleanup(patch.stopall)
+
+        # Products 0 and 1 exist, product 0 is already in user's list
+        self.find_ids.return_value = {URLS[0]: 1, URLS[1]: 2}
+        self.add_many.side_effect = lambda user_id, ids: len(set(ids) - {1})
+        self.insert_many.side_effect = lambda products: {
+            p.url: URLS.index(p.url) + 1 for p in products
+        }
+
+        async def scrape(url, session=None):
+            if url == URLS[4]:
+                raise ValueError('Cannot parse page')
+            return make_product(url)
+        self.scrape.side_effect = scrape
+
+        self.message = AsyncMock()
+
+    def test_import(self):
+        """Tests that existing products are reused and the rest are scraped"""
+        progress = asyncio.run(importing.import_products(self.message, 1, URLS))
+
+        self.assertEqual(
+            (progress.added, progress.existing, progress.failed), (3, 1, 1)
+        )
+        self.assertEqual(self.find_ids.call_count, 1)
+        scraped_urls = {call.args[0] for call in self.scrape.call_args_list}
+        self.assertEqual(scraped_urls, set(URLS[2:]))
+        for call in self.insert_many.call_args_list:
+            self.assertLessEqual(len(call.args[0]), 2)
+        self.assertIn('5/5', self.message.edit_text.call_args.args[0])
+
+    def test_scrapes_are_bounded(self):
+        """Tests that urls are scraped by slices of batch size"""
+        running = max_running = 0
+
+        async def scrape(url, session=None):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return make_product(url)
+        self.scrape.side_effect = scrape
+
+        progress = asyncio.run(importing.import_products(self.message, 1, URLS))
+        self.assertEqual(progress.added, 4)
+        self.assertEqual(max_running, 2)
+
+    def test_failed_insert(self):
+        """Tests that products are counted as failed if batch isn't saved"""
+        self.insert_many.side_effect = lambda products: {}
+        progress = asyncio.run(importing.import_products(self.message, 1, URLS))
+        self.assertEqual(
+            (progress.added, progress.existing, progress.failed), (1, 1, 3)
+        )
+
+
+class TestScrapePool(unittest.TestCase):
+
+    def test_concurrency_is_limited(self):
+        """Tests that pool doesn't scrape more pages than its size at once"""
+        running, max_running = 0, 0
+
+        async def scrape_product():
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        async def run():
+            pool = ScrapePool(3)
+            with patch('bot.utils.scrape_pool.Scraper') as scraper:
+                scraper.return_value.scrape_product = scrape_product
+                await asyncio.gather(*(pool.scrape(url) for url in URLS * 2))
+
+        asyncio.run(run())
+        self.assertEqual(max_running, 3)
@@ -0,0 +1,71 @@
+import unittest
+
+from bot.utils.keyboard import (
+    CHECKED_MARK,
+    PageKeyboards,
+    get_keyboard_for_page,
+    get_page,
+    get_pages_count,
+    toggle_button
+)
+
+
+PRODUCTS = [{'id': id, 'title': f'Product {id}'} for id in range(1, 13)]
+
+
+def button_texts(keyboard) -> list:
+    return [row[0].text for row in keyboard.inline_keyboard]
+
+
+class TestPaging(unittest.TestCase):
+
+    def test_get_page(self):
+        """Tests slicing of products to pages"""
+        self.assertEqual(get_pages_count(PRODUCTS), 3)
+        self.assertEqual(get_pages_count([]), 1)
+        self.assertEqual([p['id'] for p in get_page(PRODUCTS, 3)], [11, 12])
+        self.assertEqual(get_page(PRODUCTS, 2), PRODUCTS[5:10])
+
+    def test_keyboard_for_page(self):
+        """Tests that checked products and navigation are rendered"""
+        texts = button_texts(get_keyboard_for_page(PRODUCTS, 2, {7}))
+        self.assertEqual(texts[:5], [
+            'Product 6', CHECKED_MARK + 'Product 7', 'Product 8',
+            'Product 9', 'Product 10'
+        ])
+        self.assertEqual(len(texts), 8)
+
+    def test_toggle_button(self):
+        """Tests that toggled keyboard equals rendered one and shares other buttons"""
+        keyboard = get_keyboard_for_page(PRODUCTS, 1, {2})
+        checked = toggle_button(keyboard, 3, True)
+        self.assertEqual(
+            checked.to_python(),
+            get_keyboard_for_page(PRODUCTS, 1, {2, 3}).to_python()
+        )
+        self.assertIs(checked.inline_keyboard[0][0], keyboard.inline_keyboard[0][0])
+
+        unchecked = toggle_button(checked, 2, False)
+        self.assertEqual(
+            unchecked.to_python(),
+            get_keyboard_for_page(PRODUCTS, 1, {3}).to_python()
+        )
+
+
+class TestPageKeyboards(unittest.TestCase):
+
+    def test_least_recently_used_keyboard_is_evicted(self):
+        """Tests eviction and clearing of cached keyboards"""
+        keyboards = PageKeyboards(maxsize=2)
+        keyboard = get_keyboard_for_page(PRODUCTS)
+        keyboards.set(1, 1, 0, keyboard)
+        keyboards.set(1, 2, 0, keyboard)
+        keyboards.get(1, 1, 0)
+        keyboards.set(2, 1, 0, keyboard)
+
+        self.assertIs(keyboards.get(1, 1, 0), keyboard)
+        self.assertIsNone(keyboards.get(1, 2, 0))
+
+        keyboards.clear(1)
+        self.assertIsNone(keyboards.get(1, 1, 0))
+        self.assertIs(keyboards.get(2, 1, 0), keyboard)
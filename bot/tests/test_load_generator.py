@@ -0,0 +1,76 @@
+import unittest
+from collections import Counter
+
+from benchmarks.fake_petheaven import FakePetHeaven, render_page
+from benchmarks.load_generator import generate_subscriptions
+from bot.scraper import Scraper, make_soup
+
+
+BASE_URL = 'http://127.0.0.1:8089'
+
+
+class TestFakePetHeaven(unittest.TestCase):
+
+    def scrape(self, site: FakePetHeaven, index: int) -> tuple:
+        product = site.product(index)
+        scraper = Scraper(product.url)
+        soup = make_soup(render_page(product, site.is_on_sale(index)))
+        return product, scraper.get_descriptive_data(soup), scraper.get_product_options(soup)
+
+    def test_scraper_parses_pages(self):
+        """Tests that scraped pages match products with one and many options"""
+        site = FakePetHeaven(BASE_URL)
+        options_counts = set()
+        for index in range(1, 40):
+            product, data, options = self.scrape(site, index)
+            options_counts.add(len(options))
+            self.assertEqual(data['title'], product.title)
+            self.assertEqual(data['rating'], product.rating)
+            self.assertEqual(options, product.product_options)
+
+        self.assertIn(1, options_counts)
+        self.assertTrue(max(options_counts) > 1)
+
+    def test_churn_is_repeatable(self):
+        """Tests that products don't depend on order of requests"""
+        site = FakePetHeaven(BASE_URL, price_churn=0.5, stock_churn=0.5)
+        other_site = FakePetHeaven(BASE_URL, price_churn=0.5, stock_churn=0.5)
+        for _ in range(3):
+            site.next_cycle()
+            other_site.next_cycle()
+            # Product is also requested in intermediate cycles
+            site.product(1)
+
+        # Products are equal by url, so their options are compared
+        self.assertEqual(
+            [site.product(index).options_fingerprint for index in range(1, 50)],
+            [
+                other_site.product(index).options_fingerprint
+                for index in reversed(range(1, 50))
+            ][::-1]
+        )
+        changed = [
+            index for index in range(1, 50)
+            if site.product(index).options_fingerprint
+            != FakePetHeaven(BASE_URL).product(index).options_fingerprint
+        ]
+        self.assertTrue(changed)
+
+
+class TestSubscriptions(unittest.TestCase):
+
+    def test_subscriptions(self):
+        """Tests that pairs are unique and every product is watched"""
+        subscriptions = list(generate_subscriptions(0, 1000, 5000, 10000))
+        self.assertEqual(len(subscriptions), 10000)
+        self.assertEqual(len(set(subscriptions)), 10000)
+
+        watchers = Counter(product_id for _, product_id in subscriptions)
+        self.assertEqual(len(watchers), 1000)
+        # Popularity is skewed, the top product has far more than average
+        self.assertTrue(watchers.most_common(1)[0][1] > 10 * 10)
+
+    def test_too_few_subscriptions(self):
+        """Tests that subscriptions must cover every product"""
+        with self.assertRaises(ValueError):
+            list(generate_subscriptions(0, 1000, 500, 999))
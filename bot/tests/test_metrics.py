@@ -0,0 +1,37 @@
+import asyncio
+import unittest
+
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram
+
+from bot.metrics import metrics_handler, timed
+from bot.utils.cache import ProductCache
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_timed_is_labeled_by_function(self):
+        """Tests that timed decorator observes calls by module and function name"""
+        registry = CollectorRegistry()
+        histogram = Histogram('test_seconds', 'Test.', ('function',), registry=registry)
+
+        @timed(histogram)
+        def query():
+            return 1
+
+        self.assertEqual(query(), 1)
+        self.assertEqual(
+            registry.get_sample_value('test_seconds_count', {'function': 'test_metrics.query'}),
+            1
+        )
+
+    def test_cache_lookups_are_counters(self):
+        """Tests that cache hits and misses are exported as counters"""
+        def value(name):
+            return REGISTRY.get_sample_value(f'{name}_total') or 0
+
+        misses = value('scrape_cache_misses')
+        asyncio.run(ProductCache(ttl=60).get('a'))
+        self.assertEqual(value('scrape_cache_misses'), misses + 1)
+
+        response = asyncio.run(metrics_handler(None))
+        self.assertIn(b'# TYPE scrape_cache_misses_total counter', response.body)
@@ -0,0 +1,51 @@
+import asyncio
+import unittest
+
+from bot.utils.pipeline import Stage, run_pipeline
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_items_pass_all_stages(self):
+        """Tests that items are handled by stages in batches and failed batches are dropped"""
+        results = []
+        batches = []
+
+        async def double(batch):
+            if batch == [3]:
+                raise ValueError('failed')
+            return [item * 2 for item in batch]
+
+        async def collect(batch):
+            batches.append(len(batch))
+            results.extend(batch)
+            return []
+
+        asyncio.run(run_pipeline(range(10), [
+            Stage('double', double, concurrency=3),
+            Stage('collect', collect, batch_size=4),
+        ]))
+        self.assertEqual(sorted(results), [0, 2, 4, 8, 10, 12, 14, 16, 18])
+        self.assertTrue(all(size <= 4 for size in batches))
+
+    def test_slow_stage_throttles_previous(self):
+        """Tests that items don't pile up in front of slow stage"""
+        produced = []
+        in_flight = []
+
+        async def produce(batch):
+            produced.extend(batch)
+            return batch
+
+        async def consume(batch):
+            in_flight.append(len(produced) - len(in_flight))
+            await asyncio.sleep(0.001)
+            return []
+
+        asyncio.run(run_pipeline(range(50), [
+            Stage('produce', produce),
+            Stage('consume', consume),
+        ], queue_size=2))
+        self.assertEqual(len(produced), 50)
+        # Queue, batch of consume and the one being put by produce
+        self.assertLessEqual(max(in_flight), 4)
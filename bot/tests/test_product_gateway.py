@@ -1,13 +1,18 @@
 from bot.tests.mock_db import MockDb # must be imported before tested functions
 from bot.database.product_gateway import (
     add,
+    find_all_from_monitoring_list,
     find_by_url,
+    find_descriptions,
+    find_monitoring_rows,
+    get_price_series,
+    get_products_page,
     update_products,
     remove_product_options_by_id,
     remove_from_monitoring_list_by_ids,
 )
-from bot.database.user_gateway import save # need to add user before connecting him with product
-from bot.entities import Product, ProductOption, User
+from bot.database.user_gateway import deactivate, save # need to add user before connecting him with product
+from bot.entities import Product, ProductOption, User, unpack_availability
 from copy import deepcopy
 
 
@@ -15,16 +20,16 @@ class TestDbProducts(MockDb):
 
     def setUp(self) -> None:
         self.options = [
-            ProductOption(None, 'In stock', '300g', 100),
-            ProductOption(None, 'In stock', '500g', 180),
-            ProductOption(None, 'Out of stock', '800g', 260)
+            ProductOption(None, unpack_availability('JHB:3'), '300g', 100),
+            ProductOption(None, unpack_availability('JHB:3'), '500g', 180),
+            ProductOption(None, unpack_availability('JHB:1'), '800g', 260)
         ]
 
         self.options2 = [
-            ProductOption(None, 'Out of stock', '100g', 100),
-            ProductOption(None, 'In stock', '200g', 200),
-            ProductOption(None, 'Low stock', '300g', 300),
-            ProductOption(None, 'Out of stock', '400g', 400),
+            ProductOption(None, unpack_availability('JHB:1'), '100g', 100),
+            ProductOption(None, unpack_availability('JHB:3'), '200g', 200),
+            ProductOption(None, unpack_availability('JHB:2'), '300g', 300),
+            ProductOption(None, unpack_availability('JHB:1'), '400g', 400),
         ]
 
         self.product = Product(
@@ -54,6 +59,19 @@ class TestDbProducts(MockDb):
             self.assertTrue(self.product_id)
             self.assertTrue(self.product2_id)
 
+    def test_find_descriptions(self):
+        """Tests that descriptions are loaded only when asked for"""
+        with self.mock_db_config:
+            products = find_all_from_monitoring_list(self.user.id)
+            self.assertTrue(products)
+            self.assertTrue(all(p.description is None for p in products))
+
+            descriptions = find_descriptions([self.product_id, self.product2_id])
+            self.assertEqual(descriptions, {
+                self.product_id: self.product.description,
+                self.product2_id: self.product2.description
+            })
+
     def test_find_product_by_url(self):
         """Tests find_products_by_url function"""
         def get_options_without_id(options):
@@ -62,7 +80,7 @@ class TestDbProducts(MockDb):
         with self.mock_db_config:
             product = find_by_url(self.product.url)
             self.assertIsInstance(product, Product)
-            self.assertEqual([*product][1:-1], [*self.product][1:-1])
+            self.assertEqual(product.to_storage_structure(), self.product.to_storage_structure())
 
             product = find_by_url(
                 self.product.url, with_product_options=True
@@ -72,13 +90,21 @@ class TestDbProducts(MockDb):
             found_options = get_options_without_id(product.product_options)
             self.assertEqual(test_options, found_options)
 
+    def test_get_price_series(self):
+        """Tests get_price_series function"""
+        with self.mock_db_config:
+            series = get_price_series(self.product_id)
+            self.assertEqual(len(series), len(self.product_options_ids))
+            prices = [points[0].price for points in series.values()]
+            self.assertEqual(prices, [opt.price for opt in self.options])
+
     def test_update_products(self):
         """Tests update_products function"""
         opt1 = deepcopy(self.options)
         opt1[0] = opt1[0]._replace(id=self.product_options_ids[0], price=50)
         opt1[1] = opt1[1]._replace(id=self.product_options_ids[1], title='Bruhhh', price=123)
         opt1[2] = opt1[2]._replace(id=self.product_options_ids[2], price=456)
-        opt1.append(ProductOption(None, 'In stock', '1100g', 320))
+        opt1.append(ProductOption(None, unpack_availability('JHB:3'), '1100g', 320))
 
         opt2 = deepcopy(self.options2)
         opt2[0] = opt2[0]._replace(id=self.product_options2_ids[0], price=40)
@@ -106,3 +132,49 @@ class TestDbProducts(MockDb):
             self.assertTrue(remove_from_monitoring_list_by_ids(
                 self.user.id, [self.product2_id, self.product_id]
             ))
+
+
+class TestDbProductPages(MockDb):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.active_user = User(1, 'jackdoe', 'Jack', 'Doe')
+        cls.inactive_user = User(2, 'janedoe', 'Jane', 'Doe')
+        options = [ProductOption(None, unpack_availability('JHB:3'), '1kg', 100)]
+        cls.urls = [f'https://www.dog.com/{i}' for i in range(4)]
+        with cls.mock_db_config:
+            save(cls.active_user)
+            save(cls.inactive_user)
+            for i, url in enumerate(cls.urls):
+                product = Product(
+                    None, 'Acana', 'Description', 'dog.png', f'Title {i}',
+                    'Dog Food', 4.5, 10, url, options
+                )
+                # Second product is watched by inactive user only
+                user = cls.inactive_user if i == 1 else cls.active_user
+                add(user.id, product)
+            deactivate(cls.inactive_user.id, 'blocked')
+            cls.ids = [find_by_url(url).id for url in cls.urls]
+
+    def test_products_are_paginated_by_id(self):
+        """Tests that pages continue after last id and skip unwatched products"""
+        with self.mock_db_config:
+            first_page = get_products_page(0, 2)
+            self.assertEqual(
+                [p.id for p in first_page], [self.ids[0], self.ids[2]]
+            )
+            self.assertTrue(all(p.product_options for p in first_page))
+
+            last_page = get_products_page(first_page[-1].id, 2)
+            self.assertEqual([p.id for p in last_page], [self.ids[3]])
+
+    def test_monitoring_rows_of_active_users(self):
+        """Tests that monitoring rows are found for given products of active users"""
+        with self.mock_db_config:
+            rows = find_monitoring_rows(self.ids[:2])
+            self.assertEqual(
+                [(user_id, product_id) for user_id, product_id, *_ in rows],
+                [(self.active_user.id, self.ids[0])]
+            )
+            self.assertEqual(find_monitoring_rows([]), [])
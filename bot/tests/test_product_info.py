@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bot.entities import Product, ProductOption, unpack_availability
+from bot.utils import handlers
+from bot.views.product_info import (
+    MAX_CAPTION_LENGTH,
+    render_availability,
+    render_product,
+    render_product_caption,
+    split_text,
+    text_length
+)
+
+
+def make_product(description: str) -> Product:
+    options = [ProductOption(1, unpack_availability('JHB:3'), '300g', Decimal('100'))]
+    return Product(
+        1, 'Adaptil', description, 'cat.png', 'Title',
+        'Cat Food', 3.43, 7, 'https://www.cat.com', options
+    )
+
+
+class TestProductCaption(unittest.TestCase):
+
+    def test_short_product_fits_caption(self):
+        """Tests that short product is rendered as caption only"""
+        product = make_product('Short description')
+        caption, extra = render_product_caption(product)
+        self.assertEqual(caption, render_product(product))
+        self.assertEqual(extra, [])
+
+    def test_long_description_is_sent_separately(self):
+        """Tests that long description is moved out of caption"""
+        product = make_product('x' * 2000)
+        caption, extra = render_product_caption(product)
+
+        self.assertLessEqual(len(caption), MAX_CAPTION_LENGTH)
+        self.assertNotIn('Description', caption)
+        self.assertIn('300g', caption)
+        self.assertEqual(len(extra), 1)
+        self.assertIn('x' * 2000, extra[0])
+
+    def test_not_loaded_description_is_skipped(self):
+        """Tests that product without loaded description has no description"""
+        caption, extra = render_product_caption(make_product(None))
+        self.assertNotIn('Description', caption)
+        self.assertEqual(extra, [])
+
+    def test_availability_is_rendered_from_codes(self):
+        """Tests that availability codes are rendered as text"""
+        self.assertEqual(
+            render_availability(unpack_availability('JHB:3;CPT:2')),
+            'JHB: In stock; CPT: Low stock'
+        )
+        self.assertEqual(render_availability(()), 'Unknown')
+
+
+class TestSplitText(unittest.TestCase):
+
+    def test_long_line_of_emoji_fits_limit(self):
+        """Tests that line is cut by UTF-16 length without splitting emoji"""
+        line = 'a' + '🐶' * 30
+        parts = list(split_text(line, 10))
+        self.assertEqual(''.join(parts), line)
+        for part in parts:
+            self.assertLessEqual(text_length(part), 10)
+        self.assertEqual(parts[0], 'a' + '🐶' * 4)
+
+
+class TestSendProductsInfo(unittest.TestCase):
+
+    def test_albums_are_sent_in_order(self):
+        """Tests that each album is followed by its extra messages"""
+        products = [make_product('x' * 2000)] + [
+            make_product('Short description')._replace(id=i) for i in range(2, 12)
+        ]
+        async def upload_album(media):
+            await asyncio.sleep(0.01)
+            return []
+
+        call = MagicMock()
+        call.message = AsyncMock()
+        call.message.answer_media_group.side_effect = upload_album
+        with patch.object(handlers.product_service, 'find_photo_file_ids', return_value={}):
+            with patch.object(handlers.chat_limiter, 'acquire', AsyncMock()):
+                asyncio.run(handlers.send_products_info(call, products))
+
+        self.assertEqual(
+            [name for name, _, _ in call.message.method_calls],
+            ['answer_media_group', 'answer', 'answer_photo']
+        )
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+import unittest
+
+from bot.entities import WarehouseStock
+from bot.scraper import PARSING_MODULES, Scraper
+from bot.utils.util import AVAILABILITY_IN_STOCK, AVAILABILITY_LOW_STOCK
+
+
+def make_availability_html(*rows) -> str:
+    return ''.join(
+        '<div class="stock-display">'
+        f'<span class="stock-warehouse">{warehouse}</span>'
+        f'<span style="color: green"><span>{value}</span></span>'
+        '</div>'
+        for warehouse, value in rows
+    )
+
+
+class TestParseAvailability(unittest.TestCase):
+
+    def test_one_warehouse(self):
+        """Tests parsing of availability with one warehouse"""
+        html = make_availability_html(('JHB', 'In stock'))
+        self.assertEqual(
+            Scraper.parse_availability(html),
+            (WarehouseStock('JHB', AVAILABILITY_IN_STOCK),)
+        )
+
+    def test_many_warehouses(self):
+        """Tests parsing of availability with many warehouses"""
+        html = make_availability_html(('JHB', 'In stock'), ('CPT:', 'Low stock'))
+        self.assertEqual(Scraper.parse_availability(html), (
+            WarehouseStock('JHB', AVAILABILITY_IN_STOCK),
+            WarehouseStock('CPT', AVAILABILITY_LOW_STOCK)
+        ))
+
+    def test_unknown_markup(self):
+        """Tests that unknown markup gives unknown availability"""
+        self.assertEqual(Scraper.parse_availability('<span></span>'), ())
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_parsing_modules_are_not_imported_with_scraper(self):
+        """Tests that parsing modules are imported on first scrape only"""
+        code = (
+            'import sys, bot.scraper; '
+            f'print(any(m in sys.modules for m in {PARSING_MODULES!r}))'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), 'False')
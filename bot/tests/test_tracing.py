@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from bot import tracing
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self) -> None:
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self._enabled, self._exporter = tracing.enabled, tracing.exporter
+        tracing.enabled = True
+        tracing.exporter = tracing.FileExporter(self.path)
+
+    def tearDown(self) -> None:
+        tracing.enabled, tracing.exporter = self._enabled, self._exporter
+        os.remove(self.path)
+
+    def _read_spans(self):
+        tracing.end_cycle()
+        with open(self.path) as f:
+            return {s['name']: s for s in map(json.loads, f)}
+
+    def test_nested_spans_share_trace(self):
+        """Tests parent-child relation of nested spans"""
+        with tracing.span('parent'):
+            with tracing.span('child', url='a'):
+                pass
+
+        spans = self._read_spans()
+        self.assertEqual(spans['child']['trace_id'], spans['parent']['trace_id'])
+        self.assertEqual(spans['child']['parent_id'], spans['parent']['span_id'])
+        self.assertEqual(spans['child']['attributes'], {'url': 'a'})
+
+    def test_product_trace(self):
+        """Tests that spans of one product get the same trace id"""
+        async def scrape():
+            with tracing.product_trace('url'), tracing.span('scrape'):
+                await asyncio.sleep(0)
+
+        asyncio.run(scrape())
+        with tracing.product_trace('url'), tracing.span('diff'):
+            pass
+
+        spans = self._read_spans()
+        self.assertEqual(spans['scrape']['trace_id'], spans['diff']['trace_id'])
+        self.assertIsNone(spans['diff']['parent_id'])
+
+    def test_error_status(self):
+        """Tests that span records raised error"""
+        with self.assertRaises(ValueError):
+            with tracing.span('failing'):
+                raise ValueError
+
+        self.assertEqual(self._read_spans()['failing']['status'], 'ERROR')
+
+    def test_disabled(self):
+        """Tests that nothing is exported when tracing is disabled"""
+        tracing.enabled = False
+        with tracing.span('noop') as span:
+            span.set_attribute('key', 'value')
+        self.assertIs(span, tracing._NOOP_SPAN)
+        self.assertEqual(os.path.getsize(self.path), 0)
@@ -1,6 +1,11 @@
 from bot.tests.mock_db import MockDb # must be imported before tested functions
-from bot.database.user_gateway import save
-from bot.entities import User
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from bot.database import product_gateway
+from bot.database.engine import connect
+from bot.database.user_gateway import activate, deactivate, save
+from bot.entities import Product, ProductOption, User, unpack_availability
 
 
 class TestDbUsers(MockDb):
@@ -10,3 +15,38 @@ class TestDbUsers(MockDb):
         user = User(123, 'johndoe', 'John', 'Doe')
         with self.mock_db_config:
             self.assertTrue(save(user))
+
+    def test_deactivate_and_activate(self):
+        """Tests deactivate and activate functions"""
+        user = User(124, 'janedoe', 'Jane', 'Doe')
+        with self.mock_db_config:
+            save(user)
+            self.assertFalse(activate(user.id))
+            self.assertTrue(deactivate(user.id, 'blocked'))
+            self.assertTrue(activate(user.id))
+
+    def test_subscriptions_of_inactive_user_are_kept(self):
+        """Tests that product watched only by inactive user isn't removed as orphaned"""
+        user = User(125, 'jimdoe', 'Jim', 'Doe')
+        product = Product(
+            None, 'Acana', 'Description', 'dog.png', 'Title', 'Dog Food',
+            4.5, 10, 'https://www.dog.com/inactive',
+            [ProductOption(None, unpack_availability('JHB:3'), '2kg', Decimal('199.90'))]
+        )
+        with self.mock_db_config:
+            save(user)
+            product_gateway.add(user.id, product)
+            product_id = product_gateway.find_by_url(product.url).id
+            self.assertTrue(deactivate(user.id, 'blocked'))
+            with connect() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'UPDATE products SET created_at = %s WHERE id = %s',
+                        (datetime(2022, 1, 1), product_id)
+                    )
+                connection.commit()
+
+            product_gateway.remove_orphaned_products(datetime.now() - timedelta(hours=1), 100)
+            self.assertTrue(activate(user.id))
+            products = product_gateway.find_all_from_monitoring_list(user.id)
+            self.assertEqual([p.url for p in products], [product.url])
@@ -0,0 +1,146 @@
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from bot.entities import (
+    Product,
+    ProductOption,
+    WarehouseStock,
+    pack_availability,
+    unpack_availability
+)
+from bot.utils.util import (
+    AVAILABILITY_IN_STOCK,
+    AVAILABILITY_LOW_STOCK,
+    AVAILABILITY_OUT_OF_STOCK,
+    AVAILABILITY_UNKNOWN,
+    availability_code,
+    get_option_history_rows,
+    get_options_fingerprint,
+    price_to_cents,
+    stock_code,
+    to_products
+)
+
+
+def make_product(options) -> Product:
+    return Product(
+        1, 'Adaptil', 'Description', 'cat.png', 'Title',
+        'Cat Food', 3.43, 7, 'https://www.cat.com', options
+    )
+
+
+class TestOptionHistory(unittest.TestCase):
+
+    def test_stock_code(self):
+        """Tests conversion of stock level text to code"""
+        self.assertEqual(stock_code('Out of stock'), AVAILABILITY_OUT_OF_STOCK)
+        self.assertEqual(stock_code(' Low Stock '), AVAILABILITY_LOW_STOCK)
+        self.assertEqual(stock_code('In stock'), AVAILABILITY_IN_STOCK)
+        self.assertEqual(stock_code('<span></span>'), AVAILABILITY_UNKNOWN)
+
+    def test_availability_code(self):
+        """Tests that availability code is the best code of warehouses"""
+        self.assertEqual(availability_code(unpack_availability('JHB:1')), AVAILABILITY_OUT_OF_STOCK)
+        self.assertEqual(availability_code(unpack_availability('JHB:1;CPT:2')), AVAILABILITY_LOW_STOCK)
+        self.assertEqual(availability_code(()), AVAILABILITY_UNKNOWN)
+
+    def test_price_to_cents(self):
+        """Tests conversion of price to cents"""
+        self.assertEqual(price_to_cents(Decimal('100.455')), 10046)
+        self.assertEqual(price_to_cents(260), 26000)
+
+    def test_only_changes_are_recorded(self):
+        """Tests that history rows are created only for changed options"""
+        now = datetime.now()
+        old = make_product([
+            ProductOption(1, unpack_availability('JHB:3'), '300g', Decimal('100')),
+            ProductOption(2, unpack_availability('JHB:3'), '500g', Decimal('180')),
+            ProductOption(3, unpack_availability('JHB:1'), '800g', Decimal('260')),
+        ])
+        # Saved options of new version, renamed option is a new one
+        new = make_product([
+            ProductOption(1, unpack_availability('JHB,CPT:3'), '300g', Decimal('100')),
+            ProductOption(2, unpack_availability('JHB:3'), '500g', Decimal('170')),
+            ProductOption(3, unpack_availability('JHB:2'), '800g', Decimal('260')),
+            ProductOption(4, unpack_availability('JHB:3'), '300g', Decimal('300')),
+        ])
+
+        self.assertEqual(get_option_history_rows(old, new, now), [
+            (1, 2, now, 17000, AVAILABILITY_IN_STOCK),
+            (1, 3, now, 26000, AVAILABILITY_LOW_STOCK),
+            (1, 4, now, 30000, AVAILABILITY_IN_STOCK),
+        ])
+
+
+class TestOptionsFingerprint(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.options = [
+            ProductOption(1, unpack_availability('JHB:3'), '300g', Decimal('100')),
+            ProductOption(2, unpack_availability('JHB:1'), '800g', Decimal('260')),
+        ]
+
+    def test_fingerprint_is_stable(self):
+        """Tests that fingerprint ignores option ids, order and price scale"""
+        reordered = [
+            ProductOption(None, unpack_availability('JHB:1'), '800g', Decimal('260.0000')),
+            ProductOption(None, unpack_availability('JHB:3'), '300g', Decimal('100.00')),
+        ]
+        self.assertEqual(
+            get_options_fingerprint(self.options),
+            get_options_fingerprint(reordered)
+        )
+
+    def test_fingerprint_detects_changes(self):
+        """Tests that changed availability or price changes fingerprint"""
+        fingerprint = get_options_fingerprint(self.options)
+        for changed in (
+            self.options[0]._replace(availability=unpack_availability('JHB:2')),
+            self.options[0]._replace(price=Decimal('99.99')),
+        ):
+            self.assertNotEqual(
+                fingerprint,
+                get_options_fingerprint([changed, self.options[1]])
+            )
+
+    def test_options_changed_by_fingerprint(self):
+        """Tests that products with fingerprints are compared by them"""
+        old = make_product(self.options)._replace(options_fingerprint='a')
+        self.assertFalse(old.are_product_options_changed(old))
+        self.assertTrue(old.are_product_options_changed(
+            old._replace(options_fingerprint='b')
+        ))
+        # Falls back to options when fingerprint is unknown
+        self.assertFalse(old.are_product_options_changed(
+            old._replace(options_fingerprint=None)
+        ))
+
+    def test_to_products(self):
+        """Tests that fingerprint column is read from rows"""
+        rows = [
+            (1, 'Adaptil', None, 'cat.png', 'Title', 'Cat Food', 3.43, 7,
+             'https://www.cat.com', 'a', *opt.to_tuple(with_id=True))
+            for opt in self.options
+        ]
+        product, = to_products(rows)
+        self.assertEqual(product.options_fingerprint, 'a')
+        self.assertEqual(product.product_options, self.options)
+
+
+class TestPackedAvailability(unittest.TestCase):
+
+    def test_pack_and_unpack(self):
+        """Tests that availability is restored from packed string"""
+        availability = (WarehouseStock('JHB', 3), WarehouseStock('CPT', 1))
+        packed = pack_availability(availability)
+        self.assertEqual(packed, 'JHB:3;CPT:1')
+        self.assertEqual(unpack_availability(packed), availability)
+        self.assertEqual(unpack_availability(''), ())
+
+    def test_unpack_joined_warehouses(self):
+        """Tests unpacking of warehouses sharing a code"""
+        self.assertEqual(
+            unpack_availability('JHB,CPT:2'),
+            (WarehouseStock('JHB', 2), WarehouseStock('CPT', 2))
+        )
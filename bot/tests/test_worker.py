@@ -0,0 +1,124 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bot.entities import Notification, Product
+from bot.tasks import outbox
+from bot.tasks.monitoring import MonitoringCycle
+from bot.tests.fake_redis import FakeRedis
+from bot.utils.coordinator import Coordinator
+from bot.utils.hash_ring import HashRing
+from bot.worker import CoordinatedWorker, Shard
+
+
+def make_products(count: int) -> list:
+    return [
+        Product(id, *[None] * 7, f'https://www.petheaven.co.za/{id}.html', [])
+        for id in range(1, count + 1)
+    ]
+
+
+class TestHashRing(unittest.TestCase):
+
+    def test_adding_node_moves_keys_only_to_it(self):
+        """Tests that keys of remaining nodes stay in place"""
+        keys = range(10000)
+        ring = HashRing(['w1', 'w2', 'w3'])
+        bigger_ring = HashRing(['w1', 'w2', 'w3', 'w4'])
+
+        moved = [k for k in keys if ring.node_for(k) != bigger_ring.node_for(k)]
+        self.assertTrue(all(bigger_ring.node_for(k) == 'w4' for k in moved))
+        self.assertAlmostEqual(len(moved) / len(keys), 0.25, delta=0.07)
+
+    def test_shards_split_products(self):
+        """Tests that every product is monitored by exactly one worker"""
+        workers = ['w1', 'w2', 'w3']
+        shards = [Shard(worker, workers) for worker in workers]
+        products = make_products(3000)
+
+        counts = [len(list(filter(shard, products))) for shard in shards]
+        self.assertEqual(sum(counts), len(products))
+        self.assertTrue(all(count > 700 for count in counts))
+
+    def test_unknown_worker(self):
+        """Tests that worker must be one of workers"""
+        with self.assertRaises(ValueError):
+            Shard('w4', ['w1', 'w2'])
+
+
+class TestOutbox(unittest.TestCase):
+
+    def setUp(self) -> None:
+        patch.object(outbox, 'defer_digest_notifications', lambda n, digest_users: n).start()
+        patch.object(outbox, 'MIN_SECONDS_DELAY', 0).start()
+        patch.object(outbox, 'MAX_SECONDS_DELAY', 0).start()
+        self.gateway = patch.object(outbox, 'notification_gateway').start()
+        self.addCleanup(patch.stopall)
+
+    def test_worker_puts_notifications_to_outbox(self):
+        """Tests that notifications without bot are put to outbox"""
+        notifications = [Notification(1, None, 'Price dropped', 'a' * 32)]
+        asyncio.run(outbox.deliver_notifications(None, notifications))
+        self.gateway.add_to_outbox.assert_called_once_with(
+            [(1, 'Price dropped', 'a' * 32)]
+        )
+
+    def test_outbox_batch_is_sent_and_removed(self):
+        """Tests that sent and failed notifications are removed from outbox"""
+        self.gateway.find_outbox.return_value = [
+            (10, 1, 'Price dropped', None), (11, 2, 'In stock', None)
+        ]
+        bot = MagicMock()
+        bot.send_message = AsyncMock(side_effect=[None, Exception('Bad Request')])
+
+        self.assertEqual(asyncio.run(outbox._send_outbox_batch(bot)), 2)
+        self.assertEqual(bot.send_message.call_count, 2)
+        self.gateway.remove_from_outbox.assert_called_once_with([10, 11])
+
+
+class TestCoordinatedWorker(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.redis = FakeRedis()
+
+    def test_heartbeats_track_live_workers(self):
+        """Tests that workers without heartbeats are dropped"""
+        async def run():
+            w1 = Coordinator('w1', ttl=60, redis=self.redis)
+            w2 = Coordinator('w2', ttl=60, redis=self.redis)
+            await w1.heartbeat()
+            self.assertEqual(await w2.heartbeat(), ['w1', 'w2'])
+
+            with patch('bot.utils.coordinator.time.time', return_value=time.time() + 61):
+                self.assertEqual(await w2.heartbeat(), ['w2'])
+
+            await w2.leave()
+            self.assertEqual(await w1.members(), [])
+        asyncio.run(run())
+
+    def test_gone_worker_products_are_taken_over(self):
+        """Tests that only products of gone worker are monitored on rebalance"""
+        shard = Shard('w1', ['w1', 'w2', 'w3'])
+        products = make_products(3000)
+        owners = {p.id: shard.ring.node_for(p.id) for p in products}
+
+        self.assertIsNone(shard.update(['w1', 'w2', 'w3']))
+        taken_over = shard.update(['w1', 'w3'])
+        taken_over_ids = {p.id for p in products if taken_over(p)}
+        self.assertTrue(taken_over_ids)
+        self.assertTrue(all(owners[id] == 'w2' for id in taken_over_ids))
+        self.assertTrue(all(shard(p) for p in products if p.id in taken_over_ids))
+
+    def test_cycle_stats_are_reported(self):
+        """Tests that stats of cycle are available to other workers"""
+        cycle = MonitoringCycle(10, 9, 1, 3, 12.5, time.time())
+
+        async def run():
+            worker = CoordinatedWorker(Coordinator('w1', redis=self.redis))
+            worker._lock = asyncio.Lock()
+            with patch('bot.worker.run_monitoring_cycle', AsyncMock(return_value=cycle)):
+                await worker._run_cycle(lambda p: True)
+            return await Coordinator('w2', redis=self.redis).find_cycles()
+
+        self.assertEqual(asyncio.run(run()), {'w1': cycle._asdict()})
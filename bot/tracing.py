@@ -0,0 +1,206 @@
+import atexit
+import inspect
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Union
+
+
+TRACE_FILE = os.getenv('TRACE_FILE')
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', 1000))
+
+
+class Span:
+    """
+    Timed operation within a trace. Ids use OpenTelemetry format:
+    32 hex digits for trace id and 16 hex digits for span id.
+    """
+    __slots__ = (
+        'name', 'trace_id', 'span_id', 'parent_id', 'attributes',
+        'start_ns', 'end_ns', 'status', '_token'
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Union[str, None], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = 'OK'
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> 'Span':
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.status = 'ERROR'
+            self.attributes['error'] = repr(exc)
+        exporter.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_time_unix_nano': self.start_ns,
+            'end_time_unix_nano': self.end_ns,
+            'duration_ms': (self.end_ns - self.start_ns) / 1e6,
+            'status': self.status,
+            'attributes': self.attributes
+        }
+
+
+class _NoopSpan:
+    """Span returned when tracing is disabled, it does nothing."""
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+class FileExporter:
+    """Buffers finished spans and appends them to file as JSON lines."""
+
+    def __init__(self, path: str, buffer_size: int = TRACE_BUFFER_SIZE):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        self._buffer.append(span)
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+            if not spans:
+                return
+            try:
+                with open(self.path, 'a') as f:
+                    f.writelines(
+                        json.dumps(span.to_dict(), default=str) + '\n'
+                        for span in spans
+                    )
+            except OSError as e:
+                logging.error(f'Failed to export spans to {self.path}: {e}')
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Union[Span, None]] = ContextVar('current_span', default=None)
+_current_trace_id: ContextVar[Union[str, None]] = ContextVar('current_trace_id', default=None)
+
+# Trace ids of products within current monitoring cycle
+_product_trace_ids: Dict[str, str] = {}
+
+enabled = bool(TRACE_FILE)
+exporter = FileExporter(TRACE_FILE) if enabled else None
+if enabled:
+    atexit.register(exporter.flush)
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def span(name: str, **attributes) -> Union[Span, _NoopSpan]:
+    """
+    Returns context manager of span which is a child of current span.
+    Span starts new trace if there is no current one.
+    """
+    if not enabled:
+        return _NOOP_SPAN
+
+    parent = _current_span.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+
+    trace_id = _current_trace_id.get() or new_trace_id()
+    return Span(name, trace_id, None, attributes)
+
+
+@contextmanager
+def use_trace(trace_id: Union[str, None]) -> Iterator[None]:
+    """Makes spans opened within block belong to trace with given id."""
+    if not enabled or trace_id is None:
+        yield
+        return
+
+    trace_token = _current_trace_id.set(trace_id)
+    span_token = _current_span.set(None)
+    try:
+        yield
+    finally:
+        _current_span.reset(span_token)
+        _current_trace_id.reset(trace_token)
+
+
+def product_trace_id(product_url: str) -> Union[str, None]:
+    """Returns id of trace that follows product through monitoring cycle."""
+    if not enabled:
+        return None
+    trace_id = _product_trace_ids.get(product_url)
+    if trace_id is None:
+        trace_id = _product_trace_ids[product_url] = new_trace_id()
+    return trace_id
+
+
+def product_trace(product_url: str):
+    """Makes spans opened within block belong to product's trace."""
+    return use_trace(product_trace_id(product_url))
+
+
+def end_cycle() -> None:
+    """Forgets product traces of finished cycle and flushes spans."""
+    if not enabled:
+        return
+    _product_trace_ids.clear()
+    exporter.flush()
+
+
+def traced(name: str = None) -> Callable:
+    """
+    Decorator wrapping sync or async function calls in spans.
+    Function is returned as is when tracing is disabled.
+    """
+    def decorator(func: Callable) -> Callable:
+        if not enabled:
+            return func
+
+        module = func.__module__.rsplit('.', 1)[-1]
+        span_name = name or f'{module}.{func.__name__}'
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,94 @@
+from bisect import bisect_right
+from decimal import Decimal
+from typing import Dict, Iterable, List, Set, Tuple
+
+from bot.entities import AlertRule, Product
+from bot.utils.util import AVAILABILITY_LOW_STOCK, availability_code
+
+
+ALERT_ANY = 'any'
+ALERT_PRICE_BELOW = 'below'
+ALERT_PRICE_DROP = 'drop_pct'
+ALERT_IN_STOCK = 'in_stock'
+
+ALERT_TYPES = (ALERT_ANY, ALERT_PRICE_BELOW, ALERT_PRICE_DROP, ALERT_IN_STOCK)
+
+
+class _ThresholdIndex:
+    """Thresholds of one alert type sorted for binary search."""
+    __slots__ = ('thresholds', 'user_ids')
+
+    def __init__(self, rules: List[Tuple[Decimal, int]]):
+        rules.sort()
+        self.thresholds = [threshold for threshold, _ in rules]
+        self.user_ids = [user_id for _, user_id in rules]
+
+    def between(self, low: Decimal, high: Decimal) -> List[int]:
+        """Returns users whose threshold is in (low, high]."""
+        start = bisect_right(self.thresholds, low)
+        end = bisect_right(self.thresholds, high)
+        return self.user_ids[start:end]
+
+    def up_to(self, value: Decimal) -> List[int]:
+        """Returns users whose threshold is not greater than value."""
+        return self.user_ids[:bisect_right(self.thresholds, value)]
+
+
+class ProductAlertIndex:
+    """
+    Alert rules of one product. Matching a change costs O(log n + k)
+    for n rules and k matched users.
+    """
+
+    def __init__(self, rules: Iterable[AlertRule]):
+        below, drop = [], []
+        self.any_user_ids: List[int] = []
+        self.in_stock_user_ids: List[int] = []
+        for rule in rules:
+            if rule.alert_type == ALERT_PRICE_BELOW:
+                below.append((Decimal(rule.threshold), rule.user_id))
+            elif rule.alert_type == ALERT_PRICE_DROP:
+                drop.append((Decimal(rule.threshold), rule.user_id))
+            elif rule.alert_type == ALERT_IN_STOCK:
+                self.in_stock_user_ids.append(rule.user_id)
+            else:
+                self.any_user_ids.append(rule.user_id)
+        self.below = _ThresholdIndex(below)
+        self.drop = _ThresholdIndex(drop)
+
+    def match(self, old: Product, new: Product) -> Set[int]:
+        """Returns ids of users whose rules are triggered by product change."""
+        user_ids = set(self.any_user_ids)
+        old_options = {opt.title: opt for opt in old.product_options}
+        for new_option in new.product_options:
+            old_option = old_options.get(new_option.title)
+            if old_option is None:
+                continue
+
+            old_price, new_price = old_option.price, new_option.price
+            if new_price < old_price:
+                # Price crossed threshold: new price < threshold <= old price
+                user_ids.update(self.below.between(new_price, old_price))
+                if old_price:
+                    drop_pct = (old_price - new_price) / old_price * 100
+                    user_ids.update(self.drop.up_to(drop_pct))
+
+            if (
+                availability_code(old_option.availability) < AVAILABILITY_LOW_STOCK and
+                availability_code(new_option.availability) >= AVAILABILITY_LOW_STOCK
+            ):
+                user_ids.update(self.in_stock_user_ids)
+        return user_ids
+
+
+def build_alert_indexes(monitoring_list: Iterable[Tuple]) -> Dict[int, ProductAlertIndex]:
+    """Groups rows of monitoring_list by product and indexes their rules."""
+    rules_by_product: Dict[int, List[AlertRule]] = {}
+    for row in monitoring_list:
+        rule = AlertRule._make(row)
+        rules_by_product.setdefault(rule.product_id, []).append(rule)
+
+    return {
+        product_id: ProductAlertIndex(rules)
+        for product_id, rules in rules_by_product.items()
+    }
@@ -0,0 +1,216 @@
+import json
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, NamedTuple, Tuple, Union
+
+from bot.entities import Product, ProductOption, WarehouseStock
+from bot.metrics import (
+    SCRAPE_CACHE_BYTES,
+    SCRAPE_CACHE_EVICTIONS,
+    SCRAPE_CACHE_HITS,
+    SCRAPE_CACHE_MISSES
+)
+
+
+CACHE_TTL = int(os.getenv('SCRAPE_CACHE_TTL', 600))
+CACHE_MAX_ENTRIES = int(os.getenv('SCRAPE_CACHE_MAX_ENTRIES', 1000))
+CACHE_MAX_BYTES = int(os.getenv('SCRAPE_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+CACHE_REDIS_URL = os.getenv('SCRAPE_CACHE_REDIS_URL')
+CACHE_DISABLED = os.getenv('SCRAPE_CACHE_DISABLED', '').lower() in ('1', 'true', 'yes')
+
+REDIS_KEY_PREFIX = 'scrape_cache:'
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ProductCache:
+    """
+    LRU cache of recently scraped products with time to live, bounded both
+    by number of entries and by estimated size of cached products.
+    If redis_url is given, entries are also shared through Redis.
+    """
+
+    def __init__(self, ttl: int = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES, redis_url: str = None,
+                 disabled: bool = False):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disabled = disabled
+        self._redis_url = redis_url
+        self._redis = None
+        # url -> (expiration time, estimated size, product)
+        self._entries: OrderedDict[str, Tuple[float, int, Product]] = OrderedDict()
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            self._hits, self._misses, self._evictions,
+            len(self._entries), self._size_bytes
+        )
+
+    async def get(self, url: str, bypass: bool = False) -> Union[Product, None]:
+        """Returns fresh cached product by normalized url or None."""
+        if self.disabled or bypass:
+            return None
+
+        product = self._get_local(url)
+        if product is None and self._redis_url:
+            product = await self._get_remote(url)
+            if product is not None:
+                self._set_local(url, product)
+
+        if product is None:
+            self._misses += 1
+            SCRAPE_CACHE_MISSES.inc()
+        else:
+            self._hits += 1
+            SCRAPE_CACHE_HITS.inc()
+        return product
+
+    async def set(self, product: Product) -> None:
+        """Puts product to cache by its url."""
+        if self.disabled:
+            return
+
+        self._set_local(product.url, product)
+        if self._redis_url:
+            await self._set_remote(product)
+
+    async def invalidate(self, url: str) -> None:
+        """Removes product with given url from cache."""
+        self._pop_local(url)
+        if self._redis_url:
+            try:
+                redis = await self._get_redis()
+                await redis.delete(REDIS_KEY_PREFIX + url)
+            except Exception as e:
+                logging.error(f'Failed to invalidate {url} in Redis: {e}')
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size_bytes = 0
+
+    def _get_local(self, url: str) -> Union[Product, None]:
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+
+        expires_at, _, product = entry
+        if expires_at <= time.monotonic():
+            self._pop_local(url)
+            return None
+
+        self._entries.move_to_end(url)
+        return product
+
+    def _set_local(self, url: str, product: Product) -> None:
+        self._pop_local(url)
+
+        size = _estimate_size(product)
+        if size > self.max_bytes:
+            return
+
+        self._entries[url] = (time.monotonic() + self.ttl, size, product)
+        self._size_bytes += size
+
+        while (
+            len(self._entries) > self.max_entries or
+            self._size_bytes > self.max_bytes
+        ):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._size_bytes -= evicted_size
+            self._evictions += 1
+            SCRAPE_CACHE_EVICTIONS.inc()
+
+    def _pop_local(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._size_bytes -= entry[1]
+
+    async def _get_redis(self):
+        if self._redis is None:
+            import aioredis
+            self._redis = aioredis.from_url(self._redis_url)
+        return self._redis
+
+    async def _get_remote(self, url: str) -> Union[Product, None]:
+        try:
+            redis = await self._get_redis()
+            data = await redis.get(REDIS_KEY_PREFIX + url)
+        except Exception as e:
+            logging.error(f'Failed to get {url} from Redis cache: {e}')
+            return None
+        return _loads_product(data) if data else None
+
+    async def _set_remote(self, product: Product) -> None:
+        try:
+            redis = await self._get_redis()
+            await redis.set(
+                REDIS_KEY_PREFIX + product.url,
+                _dumps_product(product),
+                ex=self.ttl
+            )
+        except Exception as e:
+            logging.error(f'Failed to put {product.url} to Redis cache: {e}')
+
+
+def _estimate_size(product: Product) -> int:
+    size = sys.getsizeof(product)
+    size += sum(
+        sys.getsizeof(value)
+        for value in product._replace(product_options=None)
+        if value is not None
+    )
+    for option in product.product_options or []:
+        size += sys.getsizeof(option) + sum(map(sys.getsizeof, option))
+        size += sum(map(sys.getsizeof, option.availability))
+    return size
+
+
+def _dumps_product(product: Product) -> str:
+    data = product._asdict()
+    data['product_options'] = [
+        {**opt._asdict(), 'price': str(opt.price)}
+        for opt in product.product_options or []
+    ]
+    return json.dumps(data)
+
+
+def _loads_product(data: Union[str, bytes]) -> Product:
+    data: Dict = json.loads(data)
+    data['product_options'] = [
+        ProductOption(**{
+            **opt,
+            'availability': tuple(map(WarehouseStock._make, opt['availability'])),
+            'price': Decimal(opt['price'])
+        })
+        for opt in data['product_options']
+    ]
+    return Product(**data)
+
+
+product_cache = ProductCache(
+    redis_url=CACHE_REDIS_URL, disabled=CACHE_DISABLED
+)
+
+SCRAPE_CACHE_BYTES.set_function(lambda: product_cache.stats.size_bytes)
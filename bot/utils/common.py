@@ -1,8 +1,14 @@
+import os
+import re
 from json import load
 from typing import Any, Dict, Callable, Iterable, List, Union
+from urllib.parse import urlsplit, urlunsplit
 
 
-bot_text_file = 'bot_text.json'
+# Found relative to project root, so bot can be started from any directory
+bot_text_file = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, 'bot_text.json'
+)
 
 
 def get_bot_text() -> Dict[str, str]:
@@ -14,6 +20,19 @@ bot_text = get_bot_text()
 MESSAGES = bot_text['messages']
 BUTTONS = bot_text['buttons']
 
+DEFAULT_SCHEME = 'https'
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+CANONICAL_HOSTS = {
+    'petheaven.co.za': 'www.petheaven.co.za',
+    'm.petheaven.co.za': 'www.petheaven.co.za'
+}
+
+# Product urls in pasted lists and csv files
+PRODUCT_URL_REGEXP = re.compile(
+    r'(?:https?://)?(?:[\w-]+\.)*petheaven\.co\.za\.?(?::\d+)?/[^\s,;"\'<>]+',
+    re.IGNORECASE
+)
+
 
 def find_item(func: Callable[[Any], bool], iterable: Iterable) -> Union[Any, None]:
     try:
@@ -27,3 +46,40 @@ def find_items(func: Callable[[Any], bool], iterable: Iterable) -> Union[List[An
         return list(filter(func, iterable))
     except StopIteration:
         return []
+
+
+def normalize_url(url: str) -> str:
+    """
+    Returns canonical form of product url: https scheme, lowercased
+    canonical host, no default port, no query string and no fragment.
+    """
+    url = url.strip()
+    if '://' not in url:
+        url = f'{DEFAULT_SCHEME}://{url}'
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme in DEFAULT_PORTS:
+        scheme = DEFAULT_SCHEME
+    host = (parts.hostname or '').rstrip('.')
+    host = CANONICAL_HOSTS.get(host, host)
+
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{host}:{parts.port}'
+
+    return urlunsplit((scheme, netloc, parts.path or '/', '', ''))
+
+
+def is_product_url(text: str) -> bool:
+    """Checks that text is a single product url."""
+    return PRODUCT_URL_REGEXP.fullmatch(text.strip()) is not None
+
+
+def extract_urls(text: str) -> List[str]:
+    """
+    Returns normalized product urls found in text without
+    duplicates in order of their first occurrence.
+    """
+    urls = map(normalize_url, PRODUCT_URL_REGEXP.findall(text))
+    return list(dict.fromkeys(urls))
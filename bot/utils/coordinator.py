@@ -0,0 +1,71 @@
+import json
+import os
+import time
+from typing import Dict, List
+
+
+COORDINATOR_REDIS_URL = os.getenv('COORDINATOR_REDIS_URL', 'redis://localhost:6379/0')
+HEARTBEAT_INTERVAL = int(os.getenv('HEARTBEAT_INTERVAL', 10))
+# Worker without heartbeat for this time is considered gone
+WORKER_TTL = int(os.getenv('WORKER_TTL', 60))
+
+
+class Coordinator:
+    """
+    Membership of monitoring workers in Redis: workers send heartbeats
+    to sorted set scored by time and report stats of their cycles.
+    """
+
+    def __init__(self, worker_id: str, redis_url: str = COORDINATOR_REDIS_URL,
+                 prefix: str = 'workers:', ttl: int = WORKER_TTL, redis=None):
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self._redis_url = redis_url
+        self._redis = redis
+        self._owns_redis = redis is None
+        self.members_key = f'{prefix}members'
+        self.cycles_key = f'{prefix}cycles'
+
+    async def heartbeat(self) -> List[str]:
+        """Marks worker alive and returns ids of live workers."""
+        redis = await self._get_redis()
+        now = time.time()
+        pipe = redis.pipeline(transaction=True)
+        pipe.zadd(self.members_key, {self.worker_id: now})
+        pipe.zremrangebyscore(self.members_key, '-inf', now - self.ttl)
+        pipe.zrangebyscore(self.members_key, now - self.ttl, '+inf')
+        *_, members = await pipe.execute()
+        return members
+
+    async def members(self) -> List[str]:
+        redis = await self._get_redis()
+        return await redis.zrangebyscore(
+            self.members_key, time.time() - self.ttl, '+inf'
+        )
+
+    async def leave(self) -> None:
+        redis = await self._get_redis()
+        await redis.zrem(self.members_key, self.worker_id)
+
+    async def report_cycle(self, stats: Dict) -> None:
+        redis = await self._get_redis()
+        await redis.hset(self.cycles_key, self.worker_id, json.dumps(stats))
+
+    async def find_cycles(self) -> Dict[str, Dict]:
+        """Returns stats of the last cycle of every worker by worker id."""
+        redis = await self._get_redis()
+        cycles = await redis.hgetall(self.cycles_key)
+        return {id: json.loads(stats) for id, stats in cycles.items()}
+
+    async def close(self) -> None:
+        if self._redis is not None and self._owns_redis:
+            await self._redis.close()
+            self._redis = None
+
+    async def _get_redis(self):
+        if self._redis is None:
+            import aioredis
+            self._redis = aioredis.from_url(
+                self._redis_url, decode_responses=True
+            )
+        return self._redis
@@ -0,0 +1,191 @@
+import json
+import os
+from typing import Any, Dict, Iterable, Optional, Union
+
+from aiogram.dispatcher.storage import BaseStorage, FSMContext
+
+
+FSM_REDIS_URL = os.getenv('FSM_REDIS_URL', 'redis://localhost:6379/0')
+FSM_DATA_TTL = int(os.getenv('FSM_DATA_TTL', 0)) or None
+
+STATE_KEY = 'state'
+# Differs from key of RedisStorage2, which keeps data as JSON string
+DATA_KEY = 'hdata'
+BUCKET_KEY = 'bucket'
+
+Address = Union[str, int, None]
+
+
+class RedisHashStorage(BaseStorage):
+    """
+    FSM storage keeping data of user in Redis hash with JSON encoded
+    value per field, so single fields are read and written without
+    loading and encoding the rest of data, e.g. list of products.
+    """
+
+    def __init__(self, redis_url: str = FSM_REDIS_URL, prefix: str = 'fsm',
+                 data_ttl: Optional[int] = FSM_DATA_TTL, redis=None):
+        self._redis_url = redis_url
+        self._prefix = prefix
+        self._data_ttl = data_ttl
+        self._redis = redis
+        self._owns_redis = redis is None
+
+    async def get_state(self, *, chat: Address = None, user: Address = None,
+                        default: Optional[str] = None) -> Optional[str]:
+        redis = await self._get_redis()
+        state = await redis.get(self._key(chat, user, STATE_KEY))
+        return state or self.resolve_state(default)
+
+    async def set_state(self, *, chat: Address = None, user: Address = None,
+                        state: Optional[str] = None) -> None:
+        redis = await self._get_redis()
+        key = self._key(chat, user, STATE_KEY)
+        if state is None:
+            await redis.delete(key)
+        else:
+            await redis.set(key, self.resolve_state(state))
+
+    async def get_data(self, *, chat: Address = None, user: Address = None,
+                       default: Optional[Dict] = None) -> Dict:
+        redis = await self._get_redis()
+        data = await redis.hgetall(self._key(chat, user, DATA_KEY))
+        if data:
+            return {field: json.loads(value) for field, value in data.items()}
+        return default or {}
+
+    async def set_data(self, *, chat: Address = None, user: Address = None,
+                       data: Dict = None) -> None:
+        redis = await self._get_redis()
+        key = self._key(chat, user, DATA_KEY)
+        pipe = redis.pipeline(transaction=True)
+        pipe.delete(key)
+        if data:
+            self._queue_hset(pipe, key, data)
+        await pipe.execute()
+
+    async def update_data(self, *, chat: Address = None, user: Address = None,
+                          data: Dict = None, **kwargs) -> None:
+        # Unlike RedisStorage2, data isn't read before update
+        await self.set_fields(chat=chat, user=user, data={**(data or {}), **kwargs})
+
+    async def get_fields(self, *, chat: Address = None, user: Address = None,
+                         fields: Iterable[str]) -> Dict[str, Any]:
+        """Returns values of fields of data, None for missing ones."""
+        fields = list(fields)
+        if not fields:
+            return {}
+
+        redis = await self._get_redis()
+        values = await redis.hmget(self._key(chat, user, DATA_KEY), fields)
+        return _decode_fields(fields, values)
+
+    async def set_fields(self, *, chat: Address = None, user: Address = None,
+                         data: Dict, read: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Updates fields of data and returns values of read fields,
+        both are done in one round trip.
+        """
+        read = list(read)
+        if not data and not read:
+            return {}
+
+        redis = await self._get_redis()
+        key = self._key(chat, user, DATA_KEY)
+        pipe = redis.pipeline(transaction=True)
+        if data:
+            self._queue_hset(pipe, key, data)
+        if read:
+            pipe.hmget(key, read)
+        results = await pipe.execute()
+        return _decode_fields(read, results[-1]) if read else {}
+
+    def has_bucket(self) -> bool:
+        return True
+
+    async def get_bucket(self, *, chat: Address = None, user: Address = None,
+                         default: Optional[Dict] = None) -> Dict:
+        redis = await self._get_redis()
+        bucket = await redis.get(self._key(chat, user, BUCKET_KEY))
+        return json.loads(bucket) if bucket else default or {}
+
+    async def set_bucket(self, *, chat: Address = None, user: Address = None,
+                         bucket: Dict = None) -> None:
+        redis = await self._get_redis()
+        key = self._key(chat, user, BUCKET_KEY)
+        if bucket:
+            await redis.set(key, json.dumps(bucket))
+        else:
+            await redis.delete(key)
+
+    async def update_bucket(self, *, chat: Address = None, user: Address = None,
+                            bucket: Dict = None, **kwargs) -> None:
+        temp_bucket = await self.get_bucket(chat=chat, user=user)
+        temp_bucket.update(bucket or {}, **kwargs)
+        await self.set_bucket(chat=chat, user=user, bucket=temp_bucket)
+
+    async def reset_all(self, full: bool = True) -> None:
+        redis = await self._get_redis()
+        if full:
+            await redis.flushdb()
+            return
+
+        keys = await redis.keys(f'{self._prefix}:*')
+        if keys:
+            await redis.delete(*keys)
+
+    async def close(self) -> None:
+        if self._redis is not None and self._owns_redis:
+            await self._redis.close()
+            self._redis = None
+
+    async def wait_closed(self) -> bool:
+        return True
+
+    def _key(self, chat: Address, user: Address, suffix: str) -> str:
+        chat, user = self.check_address(chat=chat, user=user)
+        return f'{self._prefix}:{chat}:{user}:{suffix}'
+
+    def _queue_hset(self, pipe, key: str, data: Dict) -> None:
+        pipe.hset(key, mapping={
+            field: json.dumps(value) for field, value in data.items()
+        })
+        if self._data_ttl:
+            pipe.expire(key, self._data_ttl)
+
+    async def _get_redis(self):
+        if self._redis is None:
+            import aioredis
+            self._redis = aioredis.from_url(
+                self._redis_url, decode_responses=True
+            )
+        return self._redis
+
+
+async def get_fields(state: FSMContext, *fields: str) -> Dict[str, Any]:
+    """Reads only given fields of state data if storage supports it."""
+    if isinstance(state.storage, RedisHashStorage):
+        return await state.storage.get_fields(
+            chat=state.chat, user=state.user, fields=fields
+        )
+
+    data = await state.get_data()
+    return {field: data.get(field) for field in fields}
+
+
+async def set_fields(state: FSMContext, data: Dict, *read: str) -> Dict[str, Any]:
+    """Updates fields of state data and returns values of read fields."""
+    if isinstance(state.storage, RedisHashStorage):
+        return await state.storage.set_fields(
+            chat=state.chat, user=state.user, data=data, read=read
+        )
+
+    await state.update_data(data)
+    return await get_fields(state, *read) if read else {}
+
+
+def _decode_fields(fields: Iterable[str], values: Iterable[Optional[str]]) -> Dict[str, Any]:
+    return {
+        field: json.loads(value) if value is not None else None
+        for field, value in zip(fields, values)
+    }
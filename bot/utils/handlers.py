@@ -1,14 +1,30 @@
+import logging
 from typing import Dict, List, Tuple
 
 from aiogram.dispatcher.storage import FSMContext
-from aiogram.types import CallbackQuery, Message, ParseMode
-from aiogram.utils.exceptions import WrongFileIdentifier
+from aiogram.types import (
+    CallbackQuery,
+    InlineKeyboardMarkup,
+    InputMediaPhoto,
+    MediaGroup,
+    Message,
+    ParseMode
+)
+from aiogram.utils.exceptions import BadRequest
 
 from bot.entities import Product
+from bot.metrics import PHOTO_SEND_SECONDS
+from bot.services import product_service
 from bot.states import MonitorProducts
-from bot.views.product_info import render_product, render_product_list
-from .keyboard import create_pages_from_products, get_keyboard_for_page
+from bot.views.product_info import render_product_caption, render_product_list
+from .keyboard import get_keyboard_for_page, page_keyboards, toggle_button
 from .common import BUTTONS, MESSAGES
+from .fsm_storage import get_fields, set_fields
+from .rate_limiter import chat_limiter
+
+
+# Telegram accepts from 2 to 10 media in one album
+MAX_MEDIA_GROUP_SIZE = 10
 
 
 def get_ui_for_monitor_command(products: List[Product]) -> Tuple[str, Tuple[str]]:
@@ -20,36 +36,162 @@ def get_ui_for_monitor_command(products: List[Product]) -> Tuple[str, Tuple[str]
 
 
 async def send_products_info(call: CallbackQuery, products: List[Product]) -> None:
-    for product in products:
-        await call.message.answer(
-            render_product(product),
+    """
+    Sends products as albums of photos with captions, the rest of
+    product info that doesn't fit into caption is sent after album.
+    Messages are sent in order and paced by chat_limiter.
+    """
+    # Telegram file ids of already uploaded product images by image urls
+    file_ids = product_service.find_photo_file_ids(products)
+
+    items = [(product, *render_product_caption(product)) for product in products]
+    for i in range(0, len(items), MAX_MEDIA_GROUP_SIZE):
+        chunk = items[i:i+MAX_MEDIA_GROUP_SIZE]
+        await _send_album(call.message, chunk, file_ids)
+
+        for _, _, extra_messages in chunk:
+            for text in extra_messages:
+                await chat_limiter.acquire(call.message.chat.id)
+                await call.message.answer(
+                    text,
+                    parse_mode=ParseMode.HTML,
+                    disable_web_page_preview=True,
+                )
+
+
+async def _send_album(message: Message, items: List[Tuple[Product, str, List[str]]],
+                      file_ids: Dict[str, str]) -> None:
+    if len(items) == 1:
+        product, caption, _ = items[0]
+        return await _send_photo(message, product, caption, file_ids)
+
+    media = MediaGroup()
+    for product, caption, _ in items:
+        media.attach_photo(InputMediaPhoto(
+            file_ids.get(product.img, product.img),
+            caption=caption,
+            parse_mode=ParseMode.HTML
+        ))
+
+    source = _photo_source(file_ids, *(product for product, _, _ in items))
+    await chat_limiter.acquire(message.chat.id)
+    try:
+        with PHOTO_SEND_SECONDS.labels(source).time():
+            sent_messages = await message.answer_media_group(media)
+    except BadRequest as e:
+        # One of images can't be fetched, so products are sent one by one
+        logging.error(f'Failed to send album of products: {e}')
+        for product, caption, _ in items:
+            await _send_photo(message, product, caption, file_ids)
+        return
+
+    for (product, _, _), sent in zip(items, sent_messages):
+        _remember_file_id(product, sent, file_ids)
+
+
+async def _send_photo(message: Message, product: Product, caption: str,
+                      file_ids: Dict[str, str]) -> None:
+    await chat_limiter.acquire(message.chat.id)
+    try:
+        with PHOTO_SEND_SECONDS.labels(_photo_source(file_ids, product)).time():
+            sent = await message.answer_photo(
+                file_ids.get(product.img, product.img),
+                caption,
+                parse_mode=ParseMode.HTML
+            )
+    except BadRequest as e:
+        logging.error(f'Failed to send photo of {product.url}: {e}')
+        if product.img in file_ids:
+            # Stored file id is no longer valid, the image is sent by url
+            del file_ids[product.img]
+            product_service.save_photo_file_id(product, None)
+            return await _send_photo(message, product, caption, file_ids)
+
+        await chat_limiter.acquire(message.chat.id)
+        await message.answer(
+            f'{caption}\n{MESSAGES["info_photo_error"].format(product.title)}',
             parse_mode=ParseMode.HTML,
             disable_web_page_preview=True,
         )
-        try:
-            await call.message.answer_photo(product.img, product.title)
-        except WrongFileIdentifier:
-            await call.message.answer(
-                MESSAGES['info_photo_error'].format(product.title)
-            )
+    else:
+        _remember_file_id(product, sent, file_ids)
 
 
-async def get_pages(state: FSMContext) -> List[List[Dict]]:
-    async with state.proxy() as data:
-        products = data['products']
+def _photo_source(file_ids: Dict[str, str], *products: Product) -> str:
+    """Returns 'file_id' if all photos were uploaded earlier, else 'url'."""
+    return 'file_id' if all(p.img in file_ids for p in products) else 'url'
 
-    return create_pages_from_products(products)
 
+def _remember_file_id(product: Product, sent: Message, file_ids: Dict[str, str]) -> None:
+    if not sent.photo:
+        return
 
-async def monitor_info_button_handler(message: Message, state: FSMContext) -> None:
-    pages = await get_pages(state)
-    await state.update_data(current_page=1, checked_products=[])
+    # The last size is the original one
+    file_id = sent.photo[-1].file_id
+    if file_ids.get(product.img) != file_id:
+        file_ids[product.img] = file_id
+        product_service.save_photo_file_id(product, file_id)
 
-    await message.answer(
-        MESSAGES['info_start'],
-        reply_markup=get_keyboard_for_page(pages)
+
+async def start_paging(user_id: int, state: FSMContext) -> InlineKeyboardMarkup:
+    """Resets checked products and returns keyboard of the first page."""
+    data = await set_fields(
+        state, {'current_page': 1, 'checked_products': [], 'checked_version': 0},
+        'products'
     )
 
+    # Products could change since keyboards of user were cached
+    page_keyboards.clear(user_id)
+    keyboard = get_keyboard_for_page(data['products'])
+    page_keyboards.set(user_id, 1, 0, keyboard)
+    return keyboard
+
+
+async def select_product(user_id: int, product_id: int, state: FSMContext) -> InlineKeyboardMarkup:
+    """
+    Toggles checked product and returns keyboard of current page,
+    only button of toggled product is re-rendered if keyboard is cached.
+    """
+    data = await get_fields(
+        state, 'current_page', 'checked_products', 'checked_version'
+    )
+    checked_ids = set(data['checked_products'] or ())
+    checked = product_service.toggle_checked_id(product_id, checked_ids)
+    version = (data['checked_version'] or 0) + 1
+    page_num = data['current_page']
+    update = {'checked_products': list(checked_ids), 'checked_version': version}
+
+    keyboard = page_keyboards.get(user_id, page_num, version-1)
+    if keyboard is None:
+        # Products are read in the same round trip as update
+        products = (await set_fields(state, update, 'products'))['products']
+        keyboard = get_keyboard_for_page(products, page_num, checked_ids)
+    else:
+        await set_fields(state, update)
+        keyboard = toggle_button(keyboard, product_id, checked)
+
+    page_keyboards.set(user_id, page_num, version, keyboard)
+    return keyboard
+
+
+async def change_page(user_id: int, page_num: int, state: FSMContext) -> InlineKeyboardMarkup:
+    data = await set_fields(state, {'current_page': page_num}, 'checked_version')
+    version = data['checked_version'] or 0
+    keyboard = page_keyboards.get(user_id, page_num, version)
+    if keyboard is None:
+        data = await get_fields(state, 'products', 'checked_products')
+        keyboard = get_keyboard_for_page(
+            data['products'], page_num, set(data['checked_products'] or ())
+        )
+
+    page_keyboards.set(user_id, page_num, version, keyboard)
+    return keyboard
+
+
+async def monitor_info_button_handler(message: Message, state: FSMContext) -> None:
+    keyboard = await start_paging(message.from_user.id, state)
+    await message.answer(MESSAGES['info_start'], reply_markup=keyboard)
+
     await MonitorProducts.on_getting_product_info.set()
 
 
@@ -59,13 +201,8 @@ async def monitor_add_button_handler(message: Message, state: FSMContext) -> Non
 
 
 async def monitor_remove_button_handler(message: Message, state: FSMContext) -> None:
-    pages = await get_pages(state)
-    await state.update_data(current_page=1, checked_products=[])
-
-    await message.answer(
-        MESSAGES['remove_start'],
-        reply_markup=get_keyboard_for_page(pages)
-    )
+    keyboard = await start_paging(message.from_user.id, state)
+    await message.answer(MESSAGES['remove_start'], reply_markup=keyboard)
     await MonitorProducts.on_removing_product.set()
 
 
@@ -0,0 +1,35 @@
+import hashlib
+from bisect import bisect
+from typing import Hashable, Iterable, List
+
+
+# Virtual nodes per worker smooth out distribution of keys
+REPLICAS = 100
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Consistent hashing of keys to nodes, so adding or removing a node
+    moves only keys of its neighbours on the ring.
+    """
+
+    def __init__(self, nodes: Iterable[str], replicas: int = REPLICAS):
+        self.nodes = sorted(set(nodes))
+        if not self.nodes:
+            raise ValueError('Hash ring needs at least one node')
+
+        points = sorted(
+            (_hash(f'{node}#{i}'), node)
+            for node in self.nodes for i in range(replicas)
+        )
+        self._hashes: List[int] = [h for h, _ in points]
+        self._owners: List[str] = [node for _, node in points]
+
+    def node_for(self, key: Hashable) -> str:
+        """Returns node owning key, the first one clockwise on the ring."""
+        index = bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._owners[index]
@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+import json
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import aiohttp
+
+
+ERROR_KINDS = ('timeout', 'network', 'http_status')
+# Status of injected http_status errors
+ERROR_STATUS = 503
+
+
+class HttpArchive:
+    """Recorded responses by url, saved as gzip compressed JSON."""
+
+    def __init__(self, responses: Dict[str, Tuple[int, str]] = None):
+        self.responses = responses or {}
+
+    def __len__(self) -> int:
+        return len(self.responses)
+
+    def add(self, url: str, status: int, body: str) -> None:
+        self.responses[url] = (status, body)
+
+    def get(self, url: str) -> Optional[Tuple[int, str]]:
+        return self.responses.get(url)
+
+    def save(self, path: str) -> None:
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(self.responses, f)
+
+    @classmethod
+    def load(cls, path: str) -> 'HttpArchive':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return cls({url: tuple(r) for url, r in json.load(f).items()})
+
+
+class RecordedResponse:
+    """Subset of aiohttp.ClientResponse used by scraper."""
+
+    def __init__(self, url: str, status: int, body: str):
+        self.url = url
+        self.status = status
+        self._body = body
+
+    async def text(self) -> str:
+        return self._body
+
+    def __repr__(self) -> str:
+        return f'<RecordedResponse({self.url}) [{self.status}]>'
+
+
+class RecordingSession:
+    """Session passing requests to aiohttp session and recording responses."""
+
+    def __init__(self, archive: HttpArchive, session: aiohttp.ClientSession):
+        self.archive = archive
+        self._session = session
+
+    @asynccontextmanager
+    async def get(self, url: str) -> AsyncIterator[RecordedResponse]:
+        async with self._session.get(url) as response:
+            body = await response.text()
+        self.archive.add(url, response.status, body)
+        yield RecordedResponse(url, response.status, body)
+
+    async def close(self) -> None:
+        await self._session.close()
+
+    async def __aenter__(self) -> 'RecordingSession':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+
+class ReplaySession:
+    """
+    Session answering requests from archive after given latency,
+    some requests fail with injected errors. Urls missing in archive
+    fail like unreachable ones.
+    """
+
+    def __init__(self, archive: HttpArchive, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = None):
+        self.archive = archive
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    @asynccontextmanager
+    async def get(self, url: str) -> AsyncIterator[RecordedResponse]:
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        error = (
+            self._random.choice(ERROR_KINDS)
+            if self._random.random() < self.error_rate else None
+        )
+        await asyncio.sleep(max(delay, 0))
+
+        if error == 'timeout':
+            raise asyncio.TimeoutError(f'Injected timeout of {url}')
+        if error == 'network':
+            raise aiohttp.ClientConnectionError(f'Injected network error of {url}')
+        if error == 'http_status':
+            yield RecordedResponse(url, ERROR_STATUS, '')
+            return
+
+        recorded = self.archive.get(url)
+        if recorded is None:
+            raise aiohttp.ClientConnectionError(f'{url} is not recorded')
+        yield RecordedResponse(url, *recorded)
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> 'ReplaySession':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
@@ -0,0 +1,147 @@
+import logging
+import os
+import time
+import uuid
+from typing import List, NamedTuple, Union
+
+
+JOB_QUEUE_REDIS_URL = os.getenv('JOB_QUEUE_REDIS_URL', 'redis://localhost:6379/0')
+# Jobs are kept for status tracking, TTL is set when job is queued
+# and renewed when it's finished
+JOB_TTL = int(os.getenv('JOB_TTL', 24 * 60 * 60))
+USER_JOBS_LIMIT = 10
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class AddJob(NamedTuple):
+    id: str
+    user_id: int
+    url: str
+    status: str = JOB_QUEUED
+    error: str = ''
+    created_at: float = 0.0
+
+
+class AddJobQueue:
+    """
+    Reliable queue of product adding jobs stored in Redis. Taken jobs
+    stay in processing list until they are finished, so jobs taken
+    before restart are returned to queue by requeue_unfinished.
+    """
+
+    def __init__(self, redis_url: str = JOB_QUEUE_REDIS_URL, prefix: str = 'add_jobs:',
+                 redis=None):
+        self._redis_url = redis_url
+        self._redis = redis
+        self._owns_redis = redis is None
+        self.queue_key = f'{prefix}queue'
+        self.processing_key = f'{prefix}processing'
+        self.job_key_prefix = f'{prefix}job:'
+        self.user_key_prefix = f'{prefix}user:'
+
+    async def put(self, user_id: int, url: str) -> AddJob:
+        """Enqueues job and returns it."""
+        job = AddJob(uuid.uuid4().hex, user_id, url, created_at=time.time())
+        redis = await self._get_redis()
+        user_key = f'{self.user_key_prefix}{user_id}'
+        # Job is either saved with its queue entry or not saved at all
+        pipe = redis.pipeline(transaction=True)
+        pipe.hset(self._job_key(job.id), mapping=_dump_job(job))
+        pipe.expire(self._job_key(job.id), JOB_TTL)
+        pipe.lpush(user_key, job.id)
+        pipe.ltrim(user_key, 0, USER_JOBS_LIMIT - 1)
+        pipe.expire(user_key, JOB_TTL)
+        pipe.lpush(self.queue_key, job.id)
+        await pipe.execute()
+        return job
+
+    async def take(self, timeout: int = 5) -> Union[AddJob, None]:
+        """
+        Waits at most timeout seconds for next job and marks it as running.
+        """
+        redis = await self._get_redis()
+        job_id = await redis.brpoplpush(self.queue_key, self.processing_key, timeout)
+        if job_id is None:
+            return None
+
+        job = await self.get(job_id)
+        if job is None:
+            # Job data expired, nothing to do
+            await redis.lrem(self.processing_key, 0, job_id)
+            return None
+
+        await redis.hset(self._job_key(job_id), 'status', JOB_RUNNING)
+        return job._replace(status=JOB_RUNNING)
+
+    async def finish(self, job: AddJob, error: str = '') -> None:
+        """Marks job as done or failed with error and removes it from processing."""
+        redis = await self._get_redis()
+        status = JOB_FAILED if error else JOB_DONE
+        await redis.hset(
+            self._job_key(job.id), mapping={'status': status, 'error': error}
+        )
+        await redis.expire(self._job_key(job.id), JOB_TTL)
+        await redis.lrem(self.processing_key, 0, job.id)
+
+    async def get(self, job_id: str) -> Union[AddJob, None]:
+        redis = await self._get_redis()
+        data = await redis.hgetall(self._job_key(job_id))
+        return _load_job(data) if data else None
+
+    async def find_user_jobs(self, user_id: int) -> List[AddJob]:
+        """Returns recent jobs of user, newest first."""
+        redis = await self._get_redis()
+        job_ids = await redis.lrange(f'{self.user_key_prefix}{user_id}', 0, -1)
+        jobs = [await self.get(job_id) for job_id in job_ids]
+        return [job for job in jobs if job is not None]
+
+    async def requeue_unfinished(self) -> int:
+        """
+        Returns jobs left in processing list, e.g. by crash, to queue.
+        Must be called before workers start taking jobs.
+        """
+        redis = await self._get_redis()
+        count = 0
+        while await redis.rpoplpush(self.processing_key, self.queue_key):
+            count += 1
+        if count:
+            logging.info(f'{count} unfinished add jobs are queued again')
+        return count
+
+    async def close(self) -> None:
+        if self._redis is not None and self._owns_redis:
+            await self._redis.close()
+            self._redis = None
+
+    def _job_key(self, job_id: str) -> str:
+        return f'{self.job_key_prefix}{job_id}'
+
+    async def _get_redis(self):
+        if self._redis is None:
+            import aioredis
+            self._redis = aioredis.from_url(
+                self._redis_url, decode_responses=True
+            )
+        return self._redis
+
+
+def _dump_job(job: AddJob) -> dict:
+    return {key: str(value) for key, value in job._asdict().items()}
+
+
+def _load_job(data: dict) -> AddJob:
+    return AddJob(
+        id=data['id'],
+        user_id=int(data['user_id']),
+        url=data['url'],
+        status=data['status'],
+        error=data.get('error', ''),
+        created_at=float(data['created_at'])
+    )
+
+
+add_job_queue = AddJobQueue()
@@ -1,40 +1,39 @@
+from collections import OrderedDict
 from math import ceil
-from typing import List, Dict
+from typing import Collection, Dict, List, Optional, Tuple
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.callback_data import CallbackData
 
+from bot.metrics import KEYBOARD_CACHE_LOOKUPS
+
 
 select_cb = CallbackData('product', 'product_id')
 navigation_cb = CallbackData('nav', 'page_num')
 confirm_cb = CallbackData('conf')
 
 elements_on_page = 5
+CHECKED_MARK = '☑️'
+KEYBOARD_CACHE_SIZE = 1000
 
 
-def create_pages_from_products(products: List[Dict]) -> List[List[Dict]]:
-    if len(products) < elements_on_page:
-        return [products]
+def get_pages_count(products: List[Dict]) -> int:
+    return max(ceil(len(products)/elements_on_page), 1)
 
-    pages_len = ceil(len(products)/elements_on_page)
-    pages = [[] for _ in range(pages_len)]
 
-    i = 0
-    for idx, product in enumerate(products):
-        if idx != 0 and idx % elements_on_page == 0:
-            i += 1
-        pages[i].append(product)
-    return pages
+def get_page(products: List[Dict], page_num: int = 1) -> List[Dict]:
+    start = (page_num-1) * elements_on_page
+    return products[start:start+elements_on_page]
 
 
-def get_keyboard_for_page(pages: List[List[Dict]], page_num: int = 1, checked_ids: List[int] = []) -> InlineKeyboardMarkup:
-    products = pages[page_num-1]
+def get_keyboard_for_page(products: List[Dict], page_num: int = 1,
+                          checked_ids: Collection[int] = frozenset()) -> InlineKeyboardMarkup:
     buttons = [
         InlineKeyboardButton(
-            '☑️' + p['title'] if p['id'] in checked_ids else p['title'],
+            CHECKED_MARK + p['title'] if p['id'] in checked_ids else p['title'],
             callback_data=select_cb.new(product_id=p['id'])
         )
-        for p in products
+        for p in get_page(products, page_num)
     ]
 
     if page_num > 1:
@@ -43,7 +42,7 @@ def get_keyboard_for_page(pages: List[List[Dict]], page_num: int = 1, checked_id
             callback_data=navigation_cb.new(page_num=page_num-1)
         ))
 
-    if 1 <= page_num < len(pages):
+    if 1 <= page_num < get_pages_count(products):
         buttons.append(InlineKeyboardButton(
             '➡️ Next',
             callback_data=navigation_cb.new(page_num=page_num+1)
@@ -56,3 +55,59 @@ def get_keyboard_for_page(pages: List[List[Dict]], page_num: int = 1, checked_id
         keyboard.add(btn)
 
     return keyboard
+
+
+def toggle_button(keyboard: InlineKeyboardMarkup, product_id: int, checked: bool) -> InlineKeyboardMarkup:
+    """
+    Returns copy of keyboard where only button of product is re-rendered,
+    the rest of buttons are shared with original keyboard.
+    """
+    callback_data = select_cb.new(product_id=product_id)
+    rows = []
+    for row in keyboard.inline_keyboard:
+        button, = row
+        if button.callback_data == callback_data:
+            title = button.text
+            if title.startswith(CHECKED_MARK):
+                title = title[len(CHECKED_MARK):]
+            button = InlineKeyboardButton(
+                CHECKED_MARK + title if checked else title,
+                callback_data=callback_data
+            )
+        rows.append([button])
+    return InlineKeyboardMarkup(row_width=1, inline_keyboard=rows)
+
+
+class PageKeyboards:
+    """
+    LRU cache of users' paging keyboards keyed by page number and
+    version of checked ids, which is bumped on every select.
+    """
+
+    def __init__(self, maxsize: int = KEYBOARD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._keyboards: OrderedDict[Tuple[int, int, int], InlineKeyboardMarkup] = OrderedDict()
+
+    def get(self, user_id: int, page_num: int, version: int) -> Optional[InlineKeyboardMarkup]:
+        keyboard = self._keyboards.get((user_id, page_num, version))
+        if keyboard is None:
+            KEYBOARD_CACHE_LOOKUPS.labels('miss').inc()
+            return None
+
+        KEYBOARD_CACHE_LOOKUPS.labels('hit').inc()
+        self._keyboards.move_to_end((user_id, page_num, version))
+        return keyboard
+
+    def set(self, user_id: int, page_num: int, version: int, keyboard: InlineKeyboardMarkup) -> None:
+        self._keyboards[(user_id, page_num, version)] = keyboard
+        self._keyboards.move_to_end((user_id, page_num, version))
+        while len(self._keyboards) > self.maxsize:
+            self._keyboards.popitem(last=False)
+
+    def clear(self, user_id: int) -> None:
+        """Drops keyboards of user, e.g. when list of products is reloaded."""
+        for key in [key for key in self._keyboards if key[0] == user_id]:
+            del self._keyboards[key]
+
+
+page_keyboards = PageKeyboards()
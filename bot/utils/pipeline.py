@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Iterable, List, NamedTuple, Optional
+
+from bot.metrics import PIPELINE_QUEUE_DEPTH, PIPELINE_STAGE_SECONDS
+
+
+# Items waiting for each stage, full queue pauses the previous stage
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 100))
+
+
+class Stage(NamedTuple):
+    """
+    Step of pipeline. Handler takes batch of up to batch_size waiting
+    items and returns items passed to the next stage.
+    """
+    name: str
+    handler: Callable[[List[Any]], Awaitable[List[Any]]]
+    concurrency: int = 1
+    batch_size: int = 1
+
+
+async def run_pipeline(items: Iterable[Any], stages: List[Stage],
+                       queue_size: int = PIPELINE_QUEUE_SIZE) -> None:
+    """
+    Passes items through stages connected by bounded queues. Stages run
+    at the same time, and slow stage makes previous ones wait instead of
+    piling up their results. Batches failed by handler are logged and dropped.
+    """
+    queues = [asyncio.Queue(queue_size) for _ in stages]
+    workers = []
+    for stage, queue, next_queue in zip(stages, queues, [*queues[1:], None]):
+        PIPELINE_QUEUE_DEPTH.labels(stage.name).set_function(queue.qsize)
+        workers.append([
+            asyncio.create_task(_run_stage(stage, queue, next_queue))
+            for _ in range(stage.concurrency)
+        ])
+
+    try:
+        for item in items:
+            await queues[0].put(item)
+
+        # Items are put to the next queue before they're marked as done,
+        # so queue is drained once previous ones are
+        for queue, stage_workers in zip(queues, workers):
+            await queue.join()
+            for worker in stage_workers:
+                worker.cancel()
+    finally:
+        tasks = [worker for stage_workers in workers for worker in stage_workers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _run_stage(stage: Stage, queue: asyncio.Queue, next_queue: Optional[asyncio.Queue]) -> None:
+    seconds = PIPELINE_STAGE_SECONDS.labels(stage.name)
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < stage.batch_size and not queue.empty():
+            batch.append(queue.get_nowait())
+
+        try:
+            with seconds.time():
+                results = await stage.handler(batch)
+            if next_queue is not None:
+                for result in results:
+                    await next_queue.put(result)
+        except Exception as e:
+            logging.exception(f'Stage {stage.name} failed to handle {len(batch)} items: {e}')
+        finally:
+            for _ in batch:
+                queue.task_done()
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+
+# Telegram allows about 30 messages per second to different chats
+TELEGRAM_MESSAGES_PER_SECOND = int(os.getenv('TELEGRAM_MESSAGES_PER_SECOND', 25))
+# and about one message per second to the same chat
+TELEGRAM_MESSAGES_PER_CHAT_PER_SECOND = float(os.getenv('TELEGRAM_MESSAGES_PER_CHAT_PER_SECOND', 1))
+TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', 3))
+
+
+class RateLimiter:
+    """
+    Token bucket limiting rate of operations to `rate` per `period`
+    seconds with bursts of at most `burst` operations.
+    """
+
+    def __init__(self, rate: float, period: float = 1.0, burst: int = None):
+        self.rate = rate / period
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = None
+
+    async def acquire(self) -> None:
+        """Waits until operation is allowed."""
+        if self._lock is None:
+            # Lock is created lazily to bind it to the running loop
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def __aenter__(self) -> 'RateLimiter':
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+
+class ChatRateLimiter:
+    """
+    Rate limiters of separate chats, each chat is limited like by
+    RateLimiter. Limiters of max_chats recently used chats are kept.
+    """
+
+    def __init__(self, rate: float, period: float = 1.0, burst: int = None,
+                 max_chats: int = 10000):
+        self.rate = rate
+        self.period = period
+        self.burst = burst
+        self.max_chats = max_chats
+        self._limiters: OrderedDict[int, RateLimiter] = OrderedDict()
+
+    def get(self, chat_id: int) -> RateLimiter:
+        """Returns limiter of chat, creating it on first use."""
+        limiter = self._limiters.get(chat_id)
+        if limiter is None:
+            limiter = self._limiters[chat_id] = RateLimiter(
+                self.rate, self.period, self.burst
+            )
+            if len(self._limiters) > self.max_chats:
+                self._limiters.popitem(last=False)
+        else:
+            self._limiters.move_to_end(chat_id)
+        return limiter
+
+    async def acquire(self, chat_id: int) -> None:
+        """Waits until message to chat is allowed by its and global limit."""
+        await self.get(chat_id).acquire()
+        await telegram_limiter.acquire()
+
+
+# Shared by everything that sends messages outside of update handlers
+telegram_limiter = RateLimiter(TELEGRAM_MESSAGES_PER_SECOND)
+# Limits messages to the same chat within global limit
+chat_limiter = ChatRateLimiter(TELEGRAM_MESSAGES_PER_CHAT_PER_SECOND, burst=TELEGRAM_CHAT_BURST)
@@ -0,0 +1,36 @@
+import asyncio
+import os
+
+import aiohttp
+
+from bot.entities import Product
+from bot.metrics import SCRAPES_IN_FLIGHT
+from bot.scraper import Scraper
+
+
+# Scrapes of monitoring, adding and importing products share this limit
+SCRAPE_CONCURRENCY = int(os.getenv('SCRAPE_CONCURRENCY', 10))
+
+
+class ScrapePool:
+    """Limits number of product pages scraped at the same time."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._semaphore = None
+
+    async def scrape(self, url: str, session: aiohttp.ClientSession = None) -> Product:
+        """Waits for free slot and scrapes product by url."""
+        if self._semaphore is None:
+            # Semaphore is created lazily to bind it to the running loop
+            self._semaphore = asyncio.Semaphore(self.size)
+
+        async with self._semaphore:
+            SCRAPES_IN_FLIGHT.inc()
+            try:
+                return await Scraper(url, session).scrape_product()
+            finally:
+                SCRAPES_IN_FLIGHT.dec()
+
+
+scrape_pool = ScrapePool(SCRAPE_CONCURRENCY)
@@ -0,0 +1,42 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key, so only the first
+    caller runs the coroutine and the rest await and share its result.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """Runs func once per key, other callers get the same result or error."""
+        future = self._in_flight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark exception as retrieved if nobody else is waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
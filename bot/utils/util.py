@@ -1,10 +1,24 @@
-from typing import Dict, List, Set
+import hashlib
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List, Set, Tuple
 
-from bot.entities import Notification, Product, ProductOption
+from bot.entities import Availability, Notification, Product, ProductOption, pack_availability
 
 
 MAX_MESSAGES_PER_SECOND = 30
 
+AVAILABILITY_UNKNOWN = 0
+AVAILABILITY_OUT_OF_STOCK = 1
+AVAILABILITY_LOW_STOCK = 2
+AVAILABILITY_IN_STOCK = 3
+
+AVAILABILITY_CODES = {
+    'out of stock': AVAILABILITY_OUT_OF_STOCK,
+    'low stock': AVAILABILITY_LOW_STOCK,
+    'in stock': AVAILABILITY_IN_STOCK
+}
+
 
 def group_product_options_by_ids(product_ids: List, data_to_group: List[List]) -> Dict[int, List[ProductOption]]:
     groups_from_data = set([item[-1] for item in data_to_group])
@@ -13,13 +27,23 @@ def group_product_options_by_ids(product_ids: List, data_to_group: List[List]) -
     }
 
     for item in data_to_group:
-        grouped_data[item[-1]].append(ProductOption._make(item[:-1]))
+        grouped_data[item[-1]].append(
+            ProductOption.from_storage_structure(item[:-1])
+        )
     
     return grouped_data
 
 
+def to_product(data: Tuple, product_options: List[ProductOption]) -> Product:
+    """
+    Makes product from row of product columns,
+    options fingerprint is the last of them.
+    """
+    return Product._make((*data[:-1], product_options, data[-1]))
+
+
 def to_products(data: List[List]) -> List[Product]:
-    product_option_start_index = 9
+    product_option_start_index = 10
 
     products_data = list(set(
         item[:product_option_start_index] for item in data
@@ -35,11 +59,24 @@ def to_products(data: List[List]) -> List[Product]:
     )
 
     return [
-        Product._make((*item, grouped_data[item[0]]))
+        to_product(item, grouped_data[item[0]])
         for item in products_data
     ]
 
 
+def get_options_fingerprint(product_options: List[ProductOption]) -> str:
+    """
+    Returns hash of sorted (title, availability, price) of options,
+    which doesn't depend on order of options and scale of prices.
+    """
+    lines = sorted(
+        f'{opt.title}\0{pack_availability(opt.availability)}\0'
+        f'{Decimal(str(opt.price)).normalize():f}'
+        for opt in product_options
+    )
+    return hashlib.sha1('\n'.join(lines).encode()).hexdigest()
+
+
 def choose_notifications(notifications: Set[Notification]) -> List[Notification]:
     notifications_to_send = []
     receivers = set()
@@ -53,3 +90,42 @@ def choose_notifications(notifications: Set[Notification]) -> List[Notification]
             return notifications_to_send
 
     return notifications_to_send
+
+
+def stock_code(text: str) -> int:
+    """Returns code of stock level text, e.g. "Low stock"."""
+    text = text.lower()
+    codes = [code for value, code in AVAILABILITY_CODES.items() if value in text]
+    return max(codes, default=AVAILABILITY_UNKNOWN)
+
+
+def availability_code(availability: Availability) -> int:
+    """Returns code of the best stock level among warehouses."""
+    return max((stock.code for stock in availability), default=AVAILABILITY_UNKNOWN)
+
+
+def price_to_cents(price: Decimal) -> int:
+    return int((Decimal(price) * 100).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def get_option_history_rows(old: Product, new: Product, recorded_at: datetime) -> List[Tuple]:
+    """
+    Returns history rows of saved new product's options whose price or
+    availability code differs from the old option with the same id,
+    including new options. Rows are in order of option_history columns.
+    """
+    old_options = {opt.id: opt for opt in old.product_options}
+    rows = []
+    for option in new.product_options:
+        price = price_to_cents(option.price)
+        code = availability_code(option.availability)
+
+        old_option = old_options.get(option.id)
+        if (
+            old_option is not None and
+            price_to_cents(old_option.price) == price and
+            availability_code(old_option.availability) == code
+        ):
+            continue
+        rows.append((new.id, option.id, recorded_at, price, code))
+    return rows
@@ -0,0 +1,26 @@
+import html
+from typing import List
+
+from bot.utils.job_queue import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    AddJob
+)
+
+
+JOB_STATUS_EMOJIS = {
+    JOB_QUEUED: '🕒',
+    JOB_RUNNING: '🕵🏻‍♂️',
+    JOB_DONE: '✅',
+    JOB_FAILED: '❌'
+}
+
+
+def render_add_jobs(jobs: List[AddJob]) -> str:
+    """Renders status and url of each add job."""
+    return ''.join([
+        f'{JOB_STATUS_EMOJIS.get(job.status, "")} {html.escape(job.url)}\n'
+        for job in jobs
+    ])
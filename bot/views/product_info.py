@@ -1,7 +1,24 @@
 from decimal import Decimal
-from typing import Callable, List
+from typing import Callable, Iterator, List, Tuple
 
-from bot.entities import Product, ProductOption
+from bot.entities import Availability, Product, ProductOption
+from bot.utils.util import (
+    AVAILABILITY_IN_STOCK,
+    AVAILABILITY_LOW_STOCK,
+    AVAILABILITY_OUT_OF_STOCK
+)
+
+
+# Telegram's limits of message and media caption length after entities parsing
+MAX_MESSAGE_LENGTH = 4096
+MAX_CAPTION_LENGTH = 1024
+
+AVAILABILITY_TEXTS = {
+    AVAILABILITY_OUT_OF_STOCK: 'Out of stock',
+    AVAILABILITY_LOW_STOCK: 'Low stock',
+    AVAILABILITY_IN_STOCK: 'In stock'
+}
+UNKNOWN_AVAILABILITY_TEXT = 'Unknown'
 
 
 def render_product_list(products: List[Product]) -> str:
@@ -20,18 +37,52 @@ def render_product(product: Product) -> str:
     )
 
 
+def render_product_caption(product: Product) -> Tuple[str, List[str]]:
+    """
+    Renders product as photo caption and messages with
+    the rest of product info that doesn't fit into caption.
+    """
+    text = render_product(product)
+    if text_length(text) <= MAX_CAPTION_LENGTH:
+        return text, []
+
+    short_text = (
+        f'{render_main_info(product)}\n'
+        f'{render_product_options(product.product_options)}'
+    )
+    if text_length(short_text) <= MAX_CAPTION_LENGTH:
+        return short_text, list(split_text(render_description(product)))
+
+    return render_title(product), list(split_text(text))
+
+
 def render_descriptive_info(product: Product) -> str:
     """Renders all product fields except of product options."""
+    return f'{render_main_info(product)}{render_description(product)}'
+
+
+def render_title(product: Product) -> str:
+    return f'<a href="{product.url}"><b>{product.title}</b></a>\n'
+
+
+def render_main_info(product: Product) -> str:
+    """Renders product fields except of description and product options."""
     return (
-        f'<a href="{product.url}"><b>{product.title}</b></a>\n'
+        f'{render_title(product)}'
         f'<b>Brand:</b> {product.brand}\n'
         f'<b>Product type:</b> {product.product_type}\n'
         f'<b>Rating:</b> {product.rating} / 5.0\n'
         f'<b>Reviews:</b> {product.reviews}\n'
-        f'<b>Description:</b> {product.description}\n\n'
     )
 
 
+def render_description(product: Product) -> str:
+    # Description isn't loaded with product lists
+    if not product.description:
+        return ''
+    return f'<b>Description:</b> {product.description}\n\n'
+
+
 def render_product_options(product_options: ProductOption) -> str:
     """Renders product options with standard renderer."""
     render_product_option = product_option_renderer_factory(
@@ -63,6 +114,55 @@ def standard_price_renderer(price: Decimal) -> str:
     return f'💰<b>Price:</b> R{price:.2f}\n'
 
 
-def standard_availability_renderer(availability: str) -> str:
+def standard_availability_renderer(availability: Availability) -> str:
     """Standard renderer for availability."""
-    return f'📦<b>Availability:</b> {availability}\n'
+    return f'📦<b>Availability:</b> {render_availability(availability)}\n'
+
+
+def render_availability(availability: Availability) -> str:
+    """Renders stock of warehouses, e.g. "JHB: In stock; CPT: Low stock"."""
+    if not availability:
+        return UNKNOWN_AVAILABILITY_TEXT
+    return '; '.join(
+        f'{stock.warehouse}: '
+        f'{AVAILABILITY_TEXTS.get(stock.code, UNKNOWN_AVAILABILITY_TEXT)}'
+        for stock in availability
+    )
+
+
+def split_text(message: str, limit: int = MAX_MESSAGE_LENGTH) -> Iterator[str]:
+    """
+    Splits message into parts not longer than limit. Message is split
+    only by lines, so HTML tags stay balanced if every line is balanced.
+    """
+    if text_length(message) <= limit:
+        yield message
+        return
+
+    part = ''
+    for line in message.split('\n'):
+        if part and text_length(part) + 1 + text_length(line) > limit:
+            yield part
+            part = ''
+        part = f'{part}\n{line}' if part else line
+        # Single line cannot be split without breaking HTML
+        while text_length(part) > limit:
+            head, part = _split_at(part, limit)
+            yield head
+    if part:
+        yield part
+
+
+def _split_at(text: str, limit: int) -> Tuple[str, str]:
+    """Splits text after limit UTF-16 code units, not inside surrogate pair."""
+    encoded = text.encode('utf-16-le')
+    end = limit * 2
+    # High surrogate is the first unit of character outside of BMP
+    if 0xD800 <= int.from_bytes(encoded[end-2:end], 'little') <= 0xDBFF:
+        end -= 2
+    return encoded[:end].decode('utf-16-le'), encoded[end:].decode('utf-16-le')
+
+
+def text_length(text: str) -> int:
+    """Returns length in UTF-16 code units as Telegram counts it."""
+    return len(text.encode('utf-16-le')) // 2
@@ -1,11 +1,23 @@
 from decimal import Decimal
-from typing import List
+from typing import List, Tuple
 
-from bot.entities import Product, ProductDifference, ProductOption
+from bot.entities import Availability, Product, ProductDifference, ProductOption
+from bot.tracing import traced
 from bot.utils.common import find_items
-from .product_info import product_option_renderer_factory
+from .product_info import (
+    MAX_MESSAGE_LENGTH,
+    product_option_renderer_factory,
+    render_availability,
+    split_text,
+    text_length
+)
 
 
+# Room left on each page for digest title
+DIGEST_TITLE_RESERVE = 64
+
+
+@traced()
 def render_notification_message(new: Product, old: Product) -> str:
     """High-level api for rendering notification's message."""
     message = _render_notification_title(new)
@@ -25,6 +37,37 @@ def render_unavailable_product(product: Product) -> str:
     return message
 
 
+def render_digest_pages(messages: List[str]) -> List[Tuple[str, int]]:
+    """
+    Joins notification messages into digest pages, each fits
+    into one Telegram message. Messages are split only by lines,
+    so HTML tags stay balanced. Every page is returned with number
+    of messages fully included in it and previous pages.
+    """
+    limit = MAX_MESSAGE_LENGTH - DIGEST_TITLE_RESERVE
+    pages = []
+    page = ''
+    for done, message in enumerate(messages):
+        for part in split_text(message.strip(), limit):
+            if page and text_length(page) + 2 + text_length(part) > limit:
+                pages.append((page, done))
+                page = ''
+            page = f'{page}\n\n{part}' if page else part
+    if page:
+        pages.append((page, len(messages)))
+
+    return [
+        (f'{_render_digest_title(i, len(pages))}{page}', done)
+        for i, (page, done) in enumerate(pages, 1)
+    ]
+
+
+def _render_digest_title(page_num: int, pages_count: int) -> str:
+    if pages_count == 1:
+        return '📰<b>Updates of your products</b>\n\n'
+    return f'📰<b>Updates of your products ({page_num}/{pages_count})</b>\n\n'
+
+
 def _render_notification_title(product: Product) -> str:
     return f'📬<a href="{product.url}"><b>{product.title}</b></a>\n\n'
 
@@ -122,10 +165,11 @@ def price_changed_renderer(new_price: Decimal, old_price: Decimal) -> str:
     return f'<b>Price:</b> <s>R{old_price:.2f}</s> R{new_price:.2f}\n'
 
 
-def availability_changed_renderer(new_availability: str, old_availability: str) -> str:
+def availability_changed_renderer(new_availability: Availability,
+                                  old_availability: Availability) -> str:
     return (
-        f'📦<b>Availability:</b> <s>{old_availability}</s> '
-        f'{new_availability}\n'
+        f'📦<b>Availability:</b> <s>{render_availability(old_availability)}</s> '
+        f'{render_availability(new_availability)}\n'
     )
 
 
@@ -0,0 +1,213 @@
+"""
+Monitoring worker running without Telegram polling. Notifications are
+put to outbox sent by bot process. Several workers split products
+by consistent hashing of product ids; live workers are tracked by
+heartbeats in Redis unless list of workers is given.
+
+Usage:
+    python -m bot.worker [--worker-id ID] [--workers ID,ID,...]
+    python -m bot.worker --status
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Callable, Iterable, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from bot.entities import Product
+from bot.metrics import METRICS_PORT, start_metrics_server
+from bot.tasks.monitoring import DELTA, monitor_products, run_monitoring_cycle
+from bot.utils.coordinator import HEARTBEAT_INTERVAL, Coordinator
+from bot.utils.hash_ring import HashRing
+
+
+# Process id tells apart workers started on one machine
+WORKER_ID = os.getenv('WORKER_ID', f'{socket.gethostname()}-{os.getpid()}')
+# Ids of all running workers, they are found by heartbeats if not set
+WORKER_IDS = [id.strip() for id in os.getenv('WORKER_IDS', '').split(',') if id.strip()]
+
+
+class Shard:
+    """Products monitored by worker."""
+
+    def __init__(self, worker_id: str, worker_ids: Iterable[str]):
+        worker_ids = set(worker_ids)
+        if worker_id not in worker_ids:
+            raise ValueError(f'Worker {worker_id} is not one of {sorted(worker_ids)}')
+        self.worker_id = worker_id
+        self.ring = HashRing(worker_ids)
+
+    def __call__(self, product: Product) -> bool:
+        return self.ring.node_for(product.id) == self.worker_id
+
+    def update(self, worker_ids: Iterable[str]) -> Optional[Callable[[Product], bool]]:
+        """
+        Rebuilds ring for live workers and returns filter of products
+        taken over by this worker, None if workers didn't change.
+        """
+        worker_ids = {*worker_ids, self.worker_id}
+        old_ring = self.ring
+        if sorted(worker_ids) == old_ring.nodes:
+            return None
+
+        self.ring = HashRing(worker_ids)
+        return lambda product: (
+            self(product) and old_ring.node_for(product.id) != self.worker_id
+        )
+
+
+class CoordinatedWorker:
+    """
+    Worker sending heartbeats and rebalancing its shard when workers
+    join or leave. Products taken over from gone workers are monitored
+    at once, cycles of one worker don't overlap.
+    """
+
+    def __init__(self, coordinator: Coordinator):
+        self.coordinator = coordinator
+        self.shard = None
+        self._lock = None
+        self._taken_over = None
+
+    async def run(self) -> None:
+        self._lock = asyncio.Lock()
+        self._taken_over = asyncio.Queue()
+        members = await self.coordinator.heartbeat()
+        self.shard = Shard(self.coordinator.worker_id, members)
+        logging.info((
+            f'Worker {self.coordinator.worker_id} joined, '
+            f'workers: {", ".join(self.shard.ring.nodes)}'
+        ))
+
+        try:
+            await asyncio.gather(
+                self._send_heartbeats(), self._monitor(), self._rebalance()
+            )
+        finally:
+            await self.coordinator.leave()
+
+    async def _send_heartbeats(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                members = await self.coordinator.heartbeat()
+            except Exception as e:
+                logging.exception(f'Failed to send heartbeat: {e}')
+                continue
+
+            taken_over = self.shard.update(members)
+            if taken_over is not None:
+                logging.info(f'Workers changed: {", ".join(self.shard.ring.nodes)}')
+                self._taken_over.put_nowait(taken_over)
+
+    async def _monitor(self) -> None:
+        while True:
+            await self._run_cycle(self.shard)
+            await asyncio.sleep(DELTA.total_seconds())
+
+    async def _rebalance(self) -> None:
+        while True:
+            taken_over = await self._taken_over.get()
+            await self._run_cycle(taken_over)
+
+    async def _run_cycle(self, shard: Callable[[Product], bool]) -> None:
+        async with self._lock:
+            try:
+                cycle = await run_monitoring_cycle(None, shard)
+            except Exception as e:
+                logging.exception(f'Monitoring cycle failed: {e}')
+                return
+
+        try:
+            await self.coordinator.report_cycle(cycle._asdict())
+        except Exception as e:
+            logging.exception(f'Failed to report monitoring cycle: {e}')
+
+
+async def run(worker_id: str, worker_ids: Iterable[str]) -> None:
+    runner = await start_metrics_server() if METRICS_PORT else None
+    coordinator = None
+    try:
+        if worker_ids:
+            shard = Shard(worker_id, worker_ids)
+            logging.info((
+                f'Worker {worker_id} monitors its shard of products, '
+                f'workers: {", ".join(shard.ring.nodes)}'
+            ))
+            await monitor_products(None, shard)
+        else:
+            coordinator = Coordinator(worker_id)
+            await CoordinatedWorker(coordinator).run()
+    finally:
+        if coordinator is not None:
+            await coordinator.close()
+        if runner is not None:
+            await runner.cleanup()
+
+
+async def print_status() -> None:
+    """Prints live workers and stats of their last cycles with totals."""
+    coordinator = Coordinator(WORKER_ID)
+    try:
+        members = await coordinator.members()
+        cycles = await coordinator.find_cycles()
+    finally:
+        await coordinator.close()
+
+    columns = ('products', 'scraped', 'unavailable', 'notifications', 'seconds')
+    print(f'{"worker":<32}' + ''.join(f'{c:>14}' for c in columns) + f'{"finished":>22}')
+    totals = dict.fromkeys(columns, 0)
+    for worker_id in sorted(set(members) | set(cycles)):
+        cycle = cycles.get(worker_id)
+        state = '' if worker_id in members else ' (gone)'
+        if cycle is None:
+            print(f'{worker_id + state:<32}' + f'{"no cycles yet":>14}')
+            continue
+
+        finished = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(cycle['finished_at']))
+        print(
+            f'{worker_id + state:<32}'
+            + ''.join(f'{cycle[c]:>14.0f}' for c in columns)
+            + f'{finished:>22}'
+        )
+        if worker_id in members:
+            for c in columns[:-1]:
+                totals[c] += cycle[c]
+            # Shards are monitored in parallel
+            totals['seconds'] = max(totals['seconds'], cycle['seconds'])
+
+    print(f'{"live workers total":<32}' + ''.join(f'{totals[c]:>14.0f}' for c in columns))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--worker-id', default=WORKER_ID)
+    parser.add_argument(
+        '--workers', default=','.join(WORKER_IDS),
+        help='comma separated ids of all workers, without Redis coordinator'
+    )
+    parser.add_argument(
+        '--status', action='store_true',
+        help='print live workers and their last monitoring cycles'
+    )
+    args = parser.parse_args()
+
+    if args.status:
+        asyncio.run(print_status())
+        return
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s]:%(levelname)s:%(name)s:%(module)s:%(message)s'
+    )
+    worker_ids = [id.strip() for id in args.workers.split(',') if id.strip()]
+    asyncio.run(run(args.worker_id, worker_ids))
+
+
+if __name__ == '__main__':
+    main()
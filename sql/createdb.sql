@@ -2,7 +2,12 @@ CREATE TABLE users (
     id INT PRIMARY KEY,
     username VARCHAR(35) UNIQUE NOT NULL,
     first_name VARCHAR(30),
-    last_name VARCHAR(30)
+    last_name VARCHAR(30),
+    delivery_mode ENUM('instant', 'hourly', 'daily') NOT NULL DEFAULT 'instant',
+    last_digest_at DATETIME,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    deactivation_reason VARCHAR(30),
+    deactivated_at DATETIME
 );
 
 CREATE TABLE products (
@@ -10,16 +15,27 @@ CREATE TABLE products (
     brand VARCHAR(30),
     description_ TEXT,
     img VARCHAR(255),
+    -- Telegram file id of uploaded img, reset when img changes
+    img_file_id VARCHAR(255),
     title VARCHAR(255),
     product_type VARCHAR(100),
     rating FLOAT(4, 3),
     reviews INT,
-    url VARCHAR(255)
+    url VARCHAR(255) NOT NULL UNIQUE,
+    -- SHA-1 of sorted options, computed by scraper
+    options_fingerprint CHAR(40),
+    options_changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- Number of active users watching product, maintained by gateways
+    watcher_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX products_watcher_count_index (watcher_count),
+    INDEX products_options_changed_at_index (options_changed_at)
 );
 
 CREATE TABLE product_options (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    availability VARCHAR(100) NOT NULL,
+    -- Stock code of each warehouse packed like "JHB:3;CPT:2"
+    availability VARCHAR(60) NOT NULL,
     title VARCHAR(30) NOT NULL,
     price DECIMAL(10,4) NOT NULL,
     product_id INT NOT NULL,
@@ -29,7 +45,45 @@ CREATE TABLE product_options (
 CREATE TABLE monitoring_list (
     user_id INT NOT NULL,
     product_id INT NOT NULL,
+    alert_type ENUM('any', 'below', 'drop_pct', 'in_stock') NOT NULL DEFAULT 'any',
+    threshold DECIMAL(10,4),
     FOREIGN KEY (user_id) REFERENCES users(id),
     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
     PRIMARY KEY (user_id, product_id)
 );
+
+-- Append-only history of options price and availability, a row
+-- is written only when price or availability code of option changes.
+-- Partitions are rotated monthly by events from events.sql.
+CREATE TABLE option_history (
+    product_id INT NOT NULL,
+    option_id INT NOT NULL,
+    recorded_at DATETIME NOT NULL,
+    price_cents INT UNSIGNED NOT NULL,
+    availability_code TINYINT UNSIGNED NOT NULL,
+    PRIMARY KEY (product_id, option_id, recorded_at)
+)
+PARTITION BY RANGE COLUMNS (recorded_at) (
+    PARTITION p_start VALUES LESS THAN ('2022-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+-- Notifications of users receiving hourly or daily digests
+CREATE TABLE pending_notifications (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    message TEXT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX pending_notifications_user_id_index (user_id, id)
+);
+
+-- Notifications created by monitoring workers, sent by bot process
+CREATE TABLE notification_outbox (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    message TEXT NOT NULL,
+    trace_id CHAR(32),
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
@@ -1,5 +1,96 @@
-CREATE EVENT IF NOT EXISTS unused_products_deletion
+-- Option history maintenance: monthly partitions, downsampling
+-- of old changes to the last change per option per day and
+-- retention of 24 months.
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS rotate_option_history_partitions //
+
+CREATE PROCEDURE rotate_option_history_partitions()
+BEGIN
+    DECLARE next_month DATE DEFAULT
+        DATE_ADD(DATE_FORMAT(CURDATE(), '%Y-%m-01'), INTERVAL 1 MONTH);
+    DECLARE retention_start DATE DEFAULT
+        DATE_SUB(DATE_FORMAT(CURDATE(), '%Y-%m-01'), INTERVAL 24 MONTH);
+    DECLARE month_start DATE;
+    DECLARE partition_name VARCHAR(64);
+    DECLARE done INT DEFAULT FALSE;
+    DECLARE expired_partitions CURSOR FOR
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = 'option_history'
+        AND PARTITION_NAME <> 'p_future'
+        AND DATE(TRIM(BOTH '''' FROM PARTITION_DESCRIPTION)) <= retention_start;
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = TRUE;
+
+    -- p_future holds everything after the upper bound of the last partition
+    SELECT IFNULL(MAX(DATE(TRIM(BOTH '''' FROM PARTITION_DESCRIPTION))), retention_start)
+    INTO month_start
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'option_history'
+    AND PARTITION_NAME <> 'p_future';
+
+    -- Splits a partition per month off p_future up to and including
+    -- the next month, pYYYYMM holds changes of that month only
+    WHILE month_start <= next_month DO
+        SET @query = CONCAT(
+            'ALTER TABLE option_history REORGANIZE PARTITION p_future INTO (',
+            'PARTITION p', DATE_FORMAT(month_start, '%Y%m'),
+            ' VALUES LESS THAN (''', DATE_ADD(month_start, INTERVAL 1 MONTH), '''), ',
+            'PARTITION p_future VALUES LESS THAN (MAXVALUE))'
+        );
+        PREPARE statement FROM @query;
+        EXECUTE statement;
+        DEALLOCATE PREPARE statement;
+        SET month_start = DATE_ADD(month_start, INTERVAL 1 MONTH);
+    END WHILE;
+
+    -- Drops partitions with changes older than retention period
+    OPEN expired_partitions;
+    drop_loop: LOOP
+        FETCH expired_partitions INTO partition_name;
+        IF done THEN
+            LEAVE drop_loop;
+        END IF;
+        SET @query = CONCAT(
+            'ALTER TABLE option_history DROP PARTITION ', partition_name
+        );
+        PREPARE statement FROM @query;
+        EXECUTE statement;
+        DEALLOCATE PREPARE statement;
+    END LOOP;
+    CLOSE expired_partitions;
+END //
+
+DROP PROCEDURE IF EXISTS downsample_option_history //
+
+CREATE PROCEDURE downsample_option_history()
+BEGIN
+    -- Keeps only the last change of each day for changes older than 90 days
+    DELETE h FROM option_history AS h
+    JOIN (
+        SELECT product_id, option_id, DATE(recorded_at) AS day_,
+               MAX(recorded_at) AS last_recorded_at
+        FROM option_history
+        WHERE recorded_at < DATE_SUB(CURDATE(), INTERVAL 90 DAY)
+        GROUP BY product_id, option_id, DATE(recorded_at)
+        HAVING COUNT(*) > 1
+    ) AS d
+    ON h.product_id = d.product_id
+    AND h.option_id = d.option_id
+    AND DATE(h.recorded_at) = d.day_
+    WHERE h.recorded_at < d.last_recorded_at;
+END //
+
+DELIMITER ;
+
+CREATE EVENT IF NOT EXISTS option_history_partitions_rotation
 ON SCHEDULE EVERY 1 DAY
 DO
-    DELETE FROM products
-    WHERE id NOT IN (SELECT product_id FROM monitoring_list);
\ No newline at end of file
+    CALL rotate_option_history_partitions();
+
+CREATE EVENT IF NOT EXISTS option_history_downsampling
+ON SCHEDULE EVERY 1 DAY
+DO
+    CALL downsample_option_history();
@@ -0,0 +1,31 @@
+-- Normalizes urls of existing products, merges products
+-- with the same url and makes products.url unique.
+
+UPDATE products
+SET url = SUBSTRING_INDEX(SUBSTRING_INDEX(url, '#', 1), '?', 1);
+
+UPDATE products
+SET url = CONCAT('https://', SUBSTRING(url, LENGTH('http://') + 1))
+WHERE url LIKE 'http://%';
+
+UPDATE products
+SET url = REPLACE(url, '://petheaven.co.za/', '://www.petheaven.co.za/');
+
+CREATE TEMPORARY TABLE kept_products
+SELECT url, MIN(id) AS id FROM products GROUP BY url;
+
+-- Moves subscriptions of duplicates to the oldest product with the same url
+INSERT IGNORE INTO monitoring_list (user_id, product_id)
+SELECT m.user_id, k.id
+FROM monitoring_list AS m
+JOIN products AS p ON m.product_id = p.id
+JOIN kept_products AS k ON p.url = k.url
+WHERE p.id <> k.id;
+
+DELETE p FROM products AS p
+JOIN kept_products AS k ON p.url = k.url
+WHERE p.id <> k.id;
+
+DROP TEMPORARY TABLE kept_products;
+
+ALTER TABLE products ADD UNIQUE INDEX products_url_uindex (url);
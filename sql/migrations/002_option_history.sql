@@ -0,0 +1,28 @@
+-- Creates option_history table, run sql/events.sql afterwards
+-- to create partitions maintenance events.
+
+CREATE TABLE option_history (
+    product_id INT NOT NULL,
+    option_id INT NOT NULL,
+    recorded_at DATETIME NOT NULL,
+    price_cents INT UNSIGNED NOT NULL,
+    availability_code TINYINT UNSIGNED NOT NULL,
+    PRIMARY KEY (product_id, option_id, recorded_at)
+)
+PARTITION BY RANGE COLUMNS (recorded_at) (
+    PARTITION p_start VALUES LESS THAN ('2022-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+-- Current state of options is the first point of their history
+INSERT INTO option_history
+    (product_id, option_id, recorded_at, price_cents, availability_code)
+SELECT
+    product_id, id, NOW(), ROUND(price * 100),
+    CASE
+        WHEN LOWER(availability) LIKE '%in stock%' THEN 3
+        WHEN LOWER(availability) LIKE '%low stock%' THEN 2
+        WHEN LOWER(availability) LIKE '%out of stock%' THEN 1
+        ELSE 0
+    END
+FROM product_options;
@@ -0,0 +1,8 @@
+-- Adds notification rules to subscriptions.
+-- any: every change, below: price drops below threshold,
+-- drop_pct: price drops by at least threshold percents,
+-- in_stock: option comes back in stock.
+
+ALTER TABLE monitoring_list
+    ADD COLUMN alert_type ENUM('any', 'below', 'drop_pct', 'in_stock') NOT NULL DEFAULT 'any',
+    ADD COLUMN threshold DECIMAL(10,4);
@@ -0,0 +1,15 @@
+-- Adds delivery modes of notifications and storage of
+-- notifications waiting for user's digest.
+
+ALTER TABLE users
+    ADD COLUMN delivery_mode ENUM('instant', 'hourly', 'daily') NOT NULL DEFAULT 'instant',
+    ADD COLUMN last_digest_at DATETIME;
+
+CREATE TABLE pending_notifications (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    message TEXT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX pending_notifications_user_id_index (user_id, id)
+);
@@ -0,0 +1,8 @@
+-- Users who blocked the bot, deactivated their account or whose
+-- chat was not found are marked inactive until their next /start.
+-- Subscriptions of inactive users are suspended.
+
+ALTER TABLE users
+    ADD COLUMN is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    ADD COLUMN deactivation_reason VARCHAR(30),
+    ADD COLUMN deactivated_at DATETIME;
@@ -0,0 +1,17 @@
+-- Replaces daily deletion of unused products with reference counting.
+-- Products with zero watchers are not monitored and are removed in
+-- small batches by the bot.
+
+ALTER TABLE products
+    ADD COLUMN watcher_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD INDEX products_watcher_count_index (watcher_count);
+
+UPDATE products AS p
+SET p.watcher_count = (
+    SELECT COUNT(*) FROM monitoring_list AS m
+    JOIN users AS u ON m.user_id = u.id
+    WHERE m.product_id = p.id AND u.is_active
+);
+
+DROP EVENT IF EXISTS unused_products_deletion;
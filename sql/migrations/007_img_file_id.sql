@@ -0,0 +1,4 @@
+-- Stores Telegram file id of product image uploaded once,
+-- so photo isn't fetched by Telegram from website every time.
+
+ALTER TABLE products ADD COLUMN img_file_id VARCHAR(255) AFTER img;
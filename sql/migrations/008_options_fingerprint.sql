@@ -0,0 +1,8 @@
+-- Options of product are compared by fingerprint instead of sets of
+-- options. Fingerprints of existing products are filled by the next
+-- monitoring cycle.
+
+ALTER TABLE products
+    ADD COLUMN options_fingerprint CHAR(40) AFTER url,
+    ADD COLUMN options_changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP AFTER options_fingerprint,
+    ADD INDEX products_options_changed_at_index (options_changed_at);
@@ -0,0 +1,19 @@
+-- Converts availability texts like "JHB: In stock; CPT: Low stock"
+-- to packed stock codes like "JHB:3;CPT:2". Texts that are not
+-- recognized (e.g. raw markup) become empty, i.e. unknown availability.
+
+UPDATE product_options
+SET availability = REPLACE(REPLACE(REPLACE(
+    REPLACE(REPLACE(REPLACE(availability,
+        'Out of stock', '1'), 'Low stock', '2'), 'In stock', '3'),
+    ': ', ':'), '; ', ';'), ', ', ',');
+
+UPDATE product_options
+SET availability = ''
+WHERE availability NOT REGEXP '^[^:;]+:[0-3](;[^:;]+:[0-3])*$';
+
+ALTER TABLE product_options MODIFY availability VARCHAR(60) NOT NULL;
+
+-- Fingerprints of texts differ from fingerprints of codes, so they
+-- are computed again by the next monitoring cycle
+UPDATE products SET options_fingerprint = NULL;
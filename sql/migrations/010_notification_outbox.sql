@@ -0,0 +1,11 @@
+-- Stores notifications created by monitoring workers until
+-- they are sent by bot process.
+
+CREATE TABLE notification_outbox (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    message TEXT NOT NULL,
+    trace_id CHAR(32),
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
@@ -0,0 +1,9 @@
+-- Merges option_history partitions created by the old rotation, which
+-- named them after the month following the one they held. Run
+-- sql/events.sql afterwards to split history into monthly partitions.
+
+ALTER TABLE option_history
+PARTITION BY RANGE COLUMNS (recorded_at) (
+    PARTITION p_start VALUES LESS THAN ('2022-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
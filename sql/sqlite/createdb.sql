@@ -0,0 +1,96 @@
+-- Schema of sql/createdb.sql for SQLite engine (DB_ENGINE=sqlite).
+-- Times are local like NOW() of MySQL, option history isn't
+-- partitioned and is compacted by bot instead of events.sql.
+
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    username VARCHAR(35) UNIQUE NOT NULL,
+    first_name VARCHAR(30),
+    last_name VARCHAR(30),
+    delivery_mode TEXT NOT NULL DEFAULT 'instant'
+        CHECK (delivery_mode IN ('instant', 'hourly', 'daily')),
+    last_digest_at DATETIME,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    deactivation_reason VARCHAR(30),
+    deactivated_at DATETIME
+);
+
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    brand VARCHAR(30),
+    description_ TEXT,
+    img VARCHAR(255),
+    -- Telegram file id of uploaded img, reset when img changes
+    img_file_id VARCHAR(255),
+    title VARCHAR(255),
+    product_type VARCHAR(100),
+    rating FLOAT,
+    reviews INT,
+    url VARCHAR(255) NOT NULL UNIQUE,
+    -- SHA-1 of sorted options, computed by scraper
+    options_fingerprint CHAR(40),
+    options_changed_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    -- Number of active users watching product, maintained by gateways
+    watcher_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX products_watcher_count_index ON products (watcher_count);
+CREATE INDEX products_options_changed_at_index ON products (options_changed_at);
+
+CREATE TABLE product_options (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    -- Stock code of each warehouse packed like "JHB:3;CPT:2"
+    availability VARCHAR(60) NOT NULL,
+    title VARCHAR(30) NOT NULL,
+    price DECIMAL(10,4) NOT NULL,
+    product_id INT NOT NULL REFERENCES products(id) ON DELETE CASCADE
+);
+
+-- MySQL indexes foreign keys implicitly
+CREATE INDEX product_options_product_id_index ON product_options (product_id);
+
+CREATE TABLE monitoring_list (
+    user_id INT NOT NULL REFERENCES users(id),
+    product_id INT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    alert_type TEXT NOT NULL DEFAULT 'any'
+        CHECK (alert_type IN ('any', 'below', 'drop_pct', 'in_stock')),
+    threshold DECIMAL(10,4),
+    PRIMARY KEY (user_id, product_id)
+);
+
+CREATE INDEX monitoring_list_product_id_index ON monitoring_list (product_id);
+
+-- Append-only history of options price and availability, a row
+-- is written only when price or availability code of option changes.
+CREATE TABLE option_history (
+    product_id INT NOT NULL,
+    option_id INT NOT NULL,
+    recorded_at DATETIME NOT NULL,
+    price_cents INT NOT NULL CHECK (price_cents >= 0),
+    availability_code TINYINT NOT NULL CHECK (availability_code >= 0),
+    PRIMARY KEY (product_id, option_id, recorded_at)
+) WITHOUT ROWID;
+
+-- Notifications of users receiving hourly or daily digests
+CREATE TABLE pending_notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    message TEXT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX pending_notifications_user_id_index ON pending_notifications (user_id, id);
+
+-- Notifications created by monitoring workers, sent by bot process
+CREATE TABLE notification_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    message TEXT NOT NULL,
+    trace_id CHAR(32),
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX notification_outbox_user_id_index ON notification_outbox (user_id);